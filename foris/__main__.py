@@ -8,6 +8,13 @@ import typing
 from foris import __version__
 from foris.state import current_state
 from foris.backend import Backend
+from foris.langs import translations
+from foris.utils import dynamic_assets, template_cache
+from foris.utils.entry_points import DEFAULT_CACHE_PATH as ENTRY_POINTS_CACHE_PATH
+from foris.utils.entry_points import registry as entry_points
+from foris.utils.startup import report as startup_report
+from foris.utils.static_manifest import manifest as static_manifest
+from foris.utils.translators import translations as catalogs
 
 
 def get_arg_parser():
@@ -24,7 +31,40 @@ def get_arg_parser():
     group.add_argument(
         "--session-timeout", type=int, default=900, help="session timeout (in seconds)"
     )
-    group.add_argument("-s", "--server", choices=["wsgiref", "flup", "cgi"], default="wsgiref")
+    group.add_argument(
+        "--session-store",
+        choices=["ubus", "memory", "file"],
+        default="ubus",
+        help="where the sessions are stored (memory store can't be used with cgi/prefork servers, "
+        "websocket permissions can be granted only to ubus sessions)",
+    )
+    group.add_argument(
+        "--session-dir",
+        default="/tmp/.foris_workdir/sessions",
+        help="directory where the sessions are stored (file session store only)",
+    )
+    group.add_argument(
+        "-s",
+        "--server",
+        choices=["wsgiref", "flup", "cgi", "threaded", "prefork", "asyncio"],
+        default="wsgiref",
+    )
+    group.add_argument(
+        "--threads",
+        default=4,
+        type=int,
+        help="number of threads which handle requests (threaded/prefork/asyncio servers)",
+    )
+    group.add_argument(
+        "--workers", default=2, type=int, help="number of worker processes (prefork server only)",
+    )
+    group.add_argument(
+        "--queue-size",
+        default=64,
+        type=int,
+        help="number of requests waiting for a free thread, other requests are refused "
+        "(threaded/prefork/asyncio servers)",
+    )
     group.add_argument("-d", "--debug", action="store_true")
     group.add_argument(
         "--noauth",
@@ -32,6 +72,11 @@ def get_arg_parser():
         help="disable authentication (available only in debug mode)",
     )
     parser.add_argument("-R", "--routes", action="store_true", help="print routes and exit")
+    parser.add_argument(
+        "--precompile-templates",
+        action="store_true",
+        help="compile all templates (including plugin templates) to the template cache and exit",
+    )
     group.add_argument(
         "-S",
         "--static",
@@ -65,7 +110,28 @@ def get_arg_parser():
         type=lambda x: re.match(r"[0-9a-zA-Z]{16}", x).group().upper(),
         help="sets which controller on the messages bus should be configured (8 bytes in hex)",
     )
+    group.add_argument(
+        "--bus-pool-size",
+        default=1,
+        type=int,
+        help="maximal number of parallel connections to the message bus (default 1)",
+    )
     group.add_argument("--bus-socket", default="/var/run/ubus/ubus.sock", help="message bus socket path")
+    group.add_argument(
+        "--backend-cache-ttl",
+        default=60,
+        type=int,
+        help="how long (in seconds) can be reused the responses of read-only backend actions "
+        "(0=disabled, the responses are dropped when a notification of the module arrives)",
+    )
+    group.add_argument(
+        "--backend-cache-module-ttl",
+        default=[],
+        action="append",
+        type=parse_module_ttl,
+        metavar="MODULE=TTL",
+        help="overrides the cache ttl of a backend module (e.g. 'lan=10')",
+    )
     group.add_argument(
         "--ws-port", default=0, help="websocket server port - insecure (0=autodetect)", type=int
     )
@@ -78,12 +144,69 @@ def get_arg_parser():
     group.add_argument(
         "--wss-path", default="/foris-ws", help="websocket server url path - secure", type=str
     )
+    group.add_argument(
+        "--backend-data-ttl",
+        default=60,
+        type=int,
+        help="how long (in seconds) can be the data obtained via web.get_data reused "
+        "(0=query the backend on every request)",
+    )
+    group.add_argument(
+        "--compression-level",
+        default=6,
+        type=int,
+        choices=range(10),
+        help="gzip/deflate compression level of html and json responses (0=disabled)",
+    )
+    group.add_argument(
+        "--compression-threshold",
+        default=1024,
+        type=int,
+        help="responses smaller than this (in bytes) are not compressed",
+    )
+    group.add_argument(
+        "--translations-memory-limit",
+        default=1024,
+        type=int,
+        help="memory limit of the loaded translations (in KiB), the least recently used "
+        "languages are dropped when it is exceeded (0=unlimited)",
+    )
+    group.add_argument(
+        "--template-cache",
+        default=template_cache.DEFAULT_CACHE_DIR,
+        help="persistent directory with precompiled templates",
+    )
+    group.add_argument(
+        "--entry-points-cache",
+        default=ENTRY_POINTS_CACHE_PATH,
+        help="persistent file with discovered entry points of the installed packages "
+        "(the assets path is used when it is not writable)",
+    )
     group.add_argument(
         "-A",
         "--assets",
         default="/tmp/.foris_workdir/dynamic_assets",
         help="Path where dynamic foris assets will be generated.",
     )
+    group.add_argument(
+        "--static-fingerprints",
+        action="store_true",
+        help="place hashes into the filenames of static files instead of the query string "
+        "(e.g. css/foris.0123456789ab.css), so they can be cached forever",
+    )
+    group.add_argument(
+        "--script-name",
+        default=None,
+        help="path where foris is placed on the web server (e.g. '/foris/config'); "
+        "it is used to generate the assets in advance (default is the last used path)",
+    )
+    group.add_argument(
+        "--startup-budget",
+        default=0.0,
+        type=float,
+        help="expected duration of the startup (in seconds), the startup report is logged "
+        "as a warning when it is exceeded (0=the report is logged in debug mode only)",
+    )
     parser.add_argument(
         "-l",
         "--log-file",
@@ -99,6 +222,9 @@ def main():
     parser = get_arg_parser()
     args = parser.parse_args()
 
+    if args.session_store == "memory" and args.server in ["cgi", "prefork"]:
+        parser.error("memory session store can't be shared between processes")
+
     # setup logging
     logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING)
     logger = logging.getLogger("foris")
@@ -124,33 +250,88 @@ def main():
         pass
 
     # set backend
-    if args.message_bus in ["ubus", "unix-socket"]:
-        current_state.set_backend(Backend(args.message_bus, path=args.bus_socket))
-    elif args.message_bus == "mqtt":
-        current_state.set_backend(
-            Backend(
-                args.message_bus,
-                host=args.mqtt_host,
-                port=args.mqtt_port,
-                credentials=args.mqtt_passwd_file,
-                controller_id=args.mqtt_controller_id,
+    # (cgi process handles a single request, so there is nothing to reuse)
+    cache_kwargs = {
+        "cache_ttl": args.backend_cache_ttl if args.server != "cgi" else 0,
+        "cache_ttls": dict(args.backend_cache_module_ttl),
+    }
+    with startup_report.phase("backend"):
+        if args.message_bus in ["ubus", "unix-socket"]:
+            current_state.set_backend(
+                Backend(
+                    args.message_bus,
+                    pool_size=args.bus_pool_size,
+                    path=args.bus_socket,
+                    **cache_kwargs,
+                )
+            )
+        elif args.message_bus == "mqtt":
+            current_state.set_backend(
+                Backend(
+                    args.message_bus,
+                    pool_size=args.bus_pool_size,
+                    **cache_kwargs,
+                    host=args.mqtt_host,
+                    port=args.mqtt_port,
+                    credentials=args.mqtt_passwd_file,
+                    controller_id=args.mqtt_controller_id,
+                )
             )
-        )
+
+    # catalogs of the languages are loaded when they are used
+    catalogs.set_memory_limit(args.translations_memory_limit * 1024)
 
     # update websocket
     current_state.set_websocket(args.ws_port, args.ws_path, args.wss_port, args.wss_path)
     # set assets path
     current_state.set_assets_path(args.assets)
+    # installed plugins and their entry points (cached until a package is installed)
+    with startup_report.phase("entry points"):
+        entry_points.build(
+            cache_path=args.entry_points_cache,
+            fallback_path=os.path.join(args.assets, "entry_points.json"),
+        )
 
-    if args.app == "config":
-        from foris.config_app import prepare_config_app
+    with startup_report.phase("app"):
+        if args.app == "config":
+            from foris.config_app import prepare_config_app
 
-        main_app = prepare_config_app(args)
+            main_app = prepare_config_app(args)
 
     if args.routes:
         # routes should be printed and we can safely exit
         return True
 
+    if args.precompile_templates:
+        count = template_cache.precompile_templates(
+            bottle.TEMPLATE_PATH,
+            args.template_cache,
+            bottle.Jinja2Template.settings.get("extensions", []),
+        )
+        print("%d templates compiled to '%s'" % (count, args.template_cache))
+        return True
+
+    if args.server != "cgi":
+        # cgi process handles only a single request
+        with startup_report.phase("templates"):
+            template_cache.prewarm_templates()
+        # no request should wait till an asset is generated
+        with startup_report.phase("dynamic assets"):
+            dynamic_assets.build(translations)
+        # hashes of static files used in urls
+        with startup_report.phase("static manifest"):
+            static_manifest.build(previous_path=os.path.join(args.assets, "static_manifest.json"))
+
+    if args.server not in ["cgi", "prefork"]:
+        # notifications are used to invalidate cached data
+        # (pointless in cgi mode - a new process is started for every request)
+        # (prefork workers start to listen after they are forked)
+        current_state.backend.start_listening()
+
+    # config pages, catalogs and data files are loaded on their first use
+    startup_report.finish(args.startup_budget)
+    logger.debug("Loaded translations:\n%s", catalogs.memory_report())
+
     # run the right server
     if args.server == "wsgiref":
         bottle.run(app=main_app, host=args.host, port=args.port, debug=args.debug)
@@ -159,6 +340,64 @@ def main():
         bottle.run(app=main_app, server="flup", debug=args.debug, bindAddress=None)
     elif args.server == "cgi":
         bottle.run(app=main_app, server="cgi", debug=args.debug)
+    elif args.server == "threaded":
+        from foris.servers import ThreadedServer
+
+        bottle.run(
+            app=main_app,
+            server=ThreadedServer,
+            host=args.host,
+            port=args.port,
+            debug=args.debug,
+            threads=args.threads,
+            queue_size=args.queue_size,
+        )
+    elif args.server == "prefork":
+        from foris.servers import PreforkServer
+
+        def after_fork():
+            # connections and threads can't be shared with the master process
+            if args.message_bus == "ubus" or args.session_store == "ubus":
+                from foris.ubus import reconnect
+
+                reconnect(args.bus_socket if args.message_bus == "ubus" else None)
+            current_state.backend.after_fork()
+            current_state.async_backend.after_fork()
+            current_state.backend.start_listening()
+
+        bottle.run(
+            app=main_app,
+            server=PreforkServer,
+            host=args.host,
+            port=args.port,
+            debug=args.debug,
+            threads=args.threads,
+            queue_size=args.queue_size,
+            workers=args.workers,
+            after_fork=after_fork,
+        )
+    elif args.server == "asyncio":
+        from foris.servers import AsyncioServer
+
+        bottle.run(
+            app=main_app,
+            server=AsyncioServer,
+            host=args.host,
+            port=args.port,
+            debug=args.debug,
+            threads=args.threads,
+            queue_size=args.queue_size,
+        )
+
+
+def parse_module_ttl(value: str) -> typing.Tuple[str, int]:
+    """ Parses module cache ttl in format MODULE=TTL
+    """
+    try:
+        module, ttl = value.split("=", 1)
+        return module.strip(), int(ttl)
+    except ValueError:
+        raise argparse.ArgumentTypeError("'%s' is not in format MODULE=TTL" % value)
 
 
 def read_passwd_file(path: str) -> typing.Tuple[str]:
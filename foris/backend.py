@@ -14,13 +14,40 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import asyncio
+import collections
+import contextlib
+import contextvars
+import copy
+import functools
+import json
 import logging
+import typing
+import threading
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+
 from foris_client.buses.base import ControllerError
 
+from foris.utils.caches import per_request, LRUExpiringCache
+
 logger = logging.getLogger("foris.backend")
 
+# actions with these prefixes only read the data
+READONLY_ACTION_PREFIXES = ("get", "list")
+
+
+def query_key(module, action, data=None):
+    """ Identifies a read-only backend query
+
+    :returns: hashable key or None if the action is not read-only
+    :rtype: tuple or NoneType
+    """
+    if not action.startswith(READONLY_ACTION_PREFIXES):
+        return None
+    return module, action, json.dumps(data, sort_keys=True) if data is not None else None
+
 
 class ExceptionInBackend(Exception):
     def __init__(self, query, remote_stacktrace, remote_description):
@@ -29,24 +56,174 @@ class ExceptionInBackend(Exception):
         self.remote_description = remote_description
 
 
+class SenderPool(object):
+    """ Pool of message bus senders (i.e. connections to the message bus)
+
+    Each call checks out a sender which is not used by any other thread.
+    Broken senders are discarded and replaced by new ones (reconnect)
+    and senders which were idle for too long are recreated before they are used.
+    """
+
+    def __init__(self, factory, size=1, max_idle=None, reconnect=True):
+        """
+        :param factory: callable which creates a new connected sender
+        :type factory: callable
+        :param size: maximal number of senders (i.e. of parallel calls)
+        :type size: int
+        :param max_idle: recreate senders which were not used for max_idle seconds (None=never)
+        :type max_idle: int
+        :param reconnect: replace senders which failed by new ones
+        :type reconnect: bool
+        """
+        self.factory = factory
+        self.size = max(size, 1)
+        self.max_idle = max_idle
+        self.reconnect = reconnect
+        self._idle = collections.deque()  # (sender, last used)
+        self._semaphore = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+
+        # connect right away to fail early when the bus is not available
+        self._idle.append((self.factory(), time.monotonic()))
+
+    def _get(self):
+        with self._lock:
+            while self._idle:
+                sender, last_used = self._idle.pop()
+                if self.max_idle is None or time.monotonic() - last_used < self.max_idle:
+                    return sender
+                logger.debug("Sender %r was idle for too long.", sender)
+                self._disconnect(sender)
+
+        logger.debug("Creating new sender (pool size %d).", self.size)
+        return self.factory()
+
+    def _put(self, sender):
+        with self._lock:
+            self._idle.append((sender, time.monotonic()))
+
+    @staticmethod
+    def _disconnect(sender):
+        try:
+            sender.disconnect()
+        except Exception:
+            pass  # the sender is being thrown away anyway
+
+    @contextlib.contextmanager
+    def checkout(self):
+        """ Obtains a sender for exclusive use, blocks when all senders are in use
+        """
+        with self._semaphore:
+            sender = self._get()
+            try:
+                yield sender
+            except (ControllerError, RuntimeError):
+                # failures reported by the controller - the connection itself is fine
+                self._put(sender)
+                raise
+            except Exception:
+                if not self.reconnect:
+                    self._put(sender)
+                    raise
+                # connection is probably broken - a new one will be created next time
+                logger.warning("Discarding sender %r.", sender)
+                self._disconnect(sender)
+                raise
+            else:
+                self._put(sender)
+
+
 class Backend(object):
     DEFAULT_TIMEOUT = 30000  # in ms
+    LISTENER_RECONNECT_DELAY = 5  # in s
+    POOL_MAX_IDLE = 300  # in s
 
-    def __init__(self, name, **kwargs):
+    # read-only queries which responses can be reused by the following requests
+    # (module -> actions), responses of the other queries are reused only within a request
+    # (e.g. remote.get_token is a secret and changes without a notification)
+    CACHEABLE_QUERIES = {
+        "about": ("get",),
+        "dns": ("get_settings",),
+        "guest": ("get_settings",),
+        "lan": ("get_settings",),
+        "networks": ("get_settings",),
+        "remote": ("get_settings",),
+        "router_notifications": ("get_settings",),
+        "updater": ("get_settings",),
+        "wan": ("get_settings",),
+        "wifi": ("get_settings",),
+    }
+    # how long (in s) can be reused the responses of modules which data
+    # change without a notification (default cache ttl is used for the other modules)
+    RESPONSE_CACHE_TTLS = {
+        "lan": 5,  # contains dhcp leases and states of the interfaces
+        "guest": 5,
+        "wan": 5,
+        "networks": 5,
+        "updater": 10,  # approvals
+    }
+    # actions of these modules alter the data of the other modules as well
+    DEPENDENT_MODULES = {
+        "networks": ("lan", "wan", "guest", "wifi"),  # interfaces were reassigned
+        "lan": ("guest", "networks", "wan"),  # lan mode and network ranges
+        "guest": ("networks", "wifi"),
+        "wan": ("networks",),
+        "wifi": ("guest", "networks"),
+    }
+    # actions of these modules (e.g. restore_backup) alter the data of all the modules
+    GLOBAL_MODULES = ("maintain",)
+
+    def __init__(self, name, pool_size=1, cache_ttl=0, cache_ttls=None, cache_size=256, **kwargs):
+        """
+        :param name: name of the message bus
+        :type name: str
+        :param pool_size: number of connections to the message bus
+        :type pool_size: int
+        :param cache_ttl: how long (in s) can be reused the responses of the queries
+                          listed in CACHEABLE_QUERIES (0 = the responses are not cached)
+        :type cache_ttl: int
+        :param cache_ttls: cache ttls of particular modules (overrides RESPONSE_CACHE_TTLS)
+        :type cache_ttls: dict
+        :param cache_size: maximal number of cached responses
+        :type cache_size: int
+        """
         self.name = name
         self.controller_id = None
+        self.notification_handlers = []
+        self._listener_thread = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.cache_ttl = cache_ttl
+        self.cache_ttls = dict(self.RESPONSE_CACHE_TTLS, **(cache_ttls or {}))
+        self.response_cache = LRUExpiringCache("backend_responses", cache_size)
+        # incremented on every invalidation (responses obtained meanwhile are outdated)
+        self._response_generation = 0
+        self._response_lock = threading.Lock()
 
         if name == "ubus":
             from foris_client.buses.ubus import UbusSender
 
             self.path = kwargs["path"]
-            self._instance = UbusSender(kwargs["path"], default_timeout=self.DEFAULT_TIMEOUT)
+            self._sender_class = UbusSender
+            sender_args = (kwargs["path"],)
+            sender_kwargs = {"default_timeout": self.DEFAULT_TIMEOUT}
+            # python-ubus keeps a single connection per process which is shared
+            # with foris.ubus, so it can't be multiplied nor recreated by the pool
+            if pool_size > 1:
+                logger.warning("Only a single connection can be used for ubus.")
+                pool_size = 1
+            max_idle = None
+            reconnect = False
 
         elif name == "unix-socket":
             from foris_client.buses.unix_socket import UnixSocketSender
 
             self.path = kwargs["path"]
-            self._instance = UnixSocketSender(kwargs["path"], default_timeout=self.DEFAULT_TIMEOUT)
+            self._sender_class = UnixSocketSender
+            sender_args = (kwargs["path"],)
+            sender_kwargs = {"default_timeout": self.DEFAULT_TIMEOUT}
+            max_idle = self.POOL_MAX_IDLE
+            reconnect = True
 
         elif name == "mqtt":
             from foris_client.buses.mqtt import MqttSender
@@ -55,19 +232,136 @@ class Backend(object):
             self.port = kwargs["port"]
             self.credentials = kwargs["credentials"]
             self.controller_id = kwargs["controller_id"]
-            self._instance = MqttSender(
-                kwargs["host"],
-                kwargs["port"],
-                default_timeout=self.DEFAULT_TIMEOUT,
-                credentials=kwargs["credentials"],
-            )
+            self._sender_class = MqttSender
+            sender_args = (kwargs["host"], kwargs["port"])
+            sender_kwargs = {
+                "default_timeout": self.DEFAULT_TIMEOUT,
+                "credentials": kwargs["credentials"],
+            }
+            max_idle = self.POOL_MAX_IDLE
+            reconnect = True
+
+        self._pool = SenderPool(
+            lambda: self._sender_class(*sender_args, **sender_kwargs),
+            size=pool_size,
+            max_idle=max_idle,
+            reconnect=reconnect,
+        )
+
+    def after_fork(self):
+        """ Drops the connections and threads inherited from the parent process
+
+        New connections are created when needed and the listening is resumed.
+        """
+        self._pool = SenderPool(
+            self._pool.factory,
+            size=self._pool.size,
+            max_idle=self._pool.max_idle,
+            reconnect=self._pool.reconnect,
+        )
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._response_lock = threading.Lock()
+        # notifications were not received since the process was forked
+        self.response_cache.clear()
+        if self._listener_thread:
+            self._listener_thread = None
+            self.start_listening()
 
     def __repr__(self):
         if self.name in ["unix-socket", "ubus"]:
-            return "%s('%s')" % (type(self._instance).__name__, self.path)
+            return "%s('%s')" % (self._sender_class.__name__, self.path)
         elif self.name == "mqtt":
-            return "%s('%s:%d')" % (type(self._instance).__name__, self.host, self.port)
-        return "%s" % type(self._instance).__name__
+            return "%s('%s:%d')" % (self._sender_class.__name__, self.host, self.port)
+        return "%s" % self._sender_class.__name__
+
+    def add_notification_handler(self, handler):
+        """ Registers a handler which will be called for every notification
+
+        Handler is called with a single argument - the notification message
+        (a dict containing "module", "action" and optionally "data").
+        Notifications are either received from the message bus (see `start_listening`)
+        or generated locally when an action is successfully performed via this backend.
+
+        :param handler: callable which handles the notification
+        :type handler: callable
+        """
+        self.notification_handlers.append(handler)
+
+    def is_cacheable(self, module, action):
+        """ Checks whether the response of the query can be reused by the following requests
+        """
+        return action in self.CACHEABLE_QUERIES.get(module, ())
+
+    def invalidate_responses(self, module):
+        """ Drops cached responses of the module and of the modules which depend on it
+        """
+        modules = (module,) + self.DEPENDENT_MODULES.get(module, ())
+        with self._response_lock:
+            self._response_generation += 1
+            if module in self.GLOBAL_MODULES:
+                self.response_cache.clear()
+            else:
+                self.response_cache.invalidate(lambda key: key[0] in modules)
+
+    def notify(self, msg, controller_id=None):
+        """ Passes the notification to all registered handlers
+        """
+        if query_key(msg["module"], msg["action"]) is None:
+            # the data of the module were altered
+            self.invalidate_responses(msg["module"])
+
+        if controller_id and self.controller_id and controller_id != self.controller_id:
+            return  # notification from another controller
+
+        for handler in self.notification_handlers:
+            try:
+                handler(msg)
+            except Exception:
+                # handlers should not break the listener nor the caller
+                logger.exception(
+                    "Failed to handle notification %s.%s", msg.get("module"), msg.get("action")
+                )
+
+    def _make_listener(self):
+        if self.name == "ubus":
+            from foris_client.buses.ubus import UbusListener
+
+            return UbusListener(self.path, self.notify)
+
+        elif self.name == "unix-socket":
+            from foris_client.buses.unix_socket import UnixSocketListener
+
+            return UnixSocketListener(self.path, self.notify)
+
+        elif self.name == "mqtt":
+            from foris_client.buses.mqtt import MqttListener
+
+            return MqttListener(
+                self.host,
+                self.port,
+                self.notify,
+                credentials=self.credentials,
+                controller_id=self.controller_id or "+",
+            )
+
+    def start_listening(self):
+        """ Starts to listen for notifications on the message bus in a separate thread
+        """
+        if not self.notification_handlers or self._listener_thread:
+            return
+
+        def listen():
+            while True:
+                try:
+                    self._make_listener().listen()
+                except Exception as e:
+                    logger.error("Listening for notifications failed (%s)", e)
+                    time.sleep(self.LISTENER_RECONNECT_DELAY)
+
+        self._listener_thread = threading.Thread(target=listen, name="foris-listener", daemon=True)
+        self._listener_thread.start()
+        logger.debug("Listening for notifications via %r", self)
 
     def perform(
         self, module, action, data=None, raise_exception_on_failure=True, controller_id=None
@@ -78,12 +372,37 @@ class Backend(object):
         :rtype: NoneType or dict
         :raises ExceptionInBackend: When command failed and raise_exception_on_failure is True
         """
+        # responses of read-only queries are reused within the request
+        # and (depending on the ttl of the module) by the following requests
+        key = query_key(module, action, data)
+        cache_key = None
+        generation = self._response_generation
+        if key is None:
+            per_request.backend_data.invalidate()
+            self.invalidate_responses(module)
+        else:
+            if self.is_cacheable(module, action):
+                cache_key = key + (controller_id or self.controller_id,)
+            if controller_id is not None:
+                key = None  # data of other controllers are not cached within the request
+            else:
+                cached = per_request.backend_data.get(key)
+                if cached is not None:
+                    return copy.deepcopy(cached)
+
+            cached = self.response_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                if key:
+                    per_request.backend_data[key] = cached
+                return copy.deepcopy(cached)
+
         response = None
         start_time = time.time()
         try:
-            response = self._instance.send(
-                module, action, data, controller_id=controller_id or self.controller_id
-            )
+            with self._pool.checkout() as sender:
+                response = sender.send(
+                    module, action, data, controller_id=controller_id or self.controller_id
+                )
         except ControllerError as e:
             logger.error("Exception in backend occured.")
             if raise_exception_on_failure:
@@ -105,4 +424,145 @@ class Backend(object):
                 "Query took %f: %s.%s - %s", time.time() - start_time, module, action, data
             )
 
+        if response is not None:
+            # let the handlers know about the actions performed by foris itself
+            # (notifications from the bus might arrive later than the next request)
+            msg = {"module": module, "action": action, "kind": "notification"}
+            if data is not None:
+                msg["data"] = data
+            self.notify(msg, controller_id=controller_id)
+            if key or cache_key:
+                # cached data are shared (only their copies are returned)
+                cached = copy.deepcopy(response)
+                if key:
+                    per_request.backend_data[key] = cached
+                if cache_key:
+                    ttl = self.cache_ttls.get(module, self.cache_ttl)
+                    with self._response_lock:
+                        if generation == self._response_generation:
+                            self.response_cache.set(cache_key, cached, ttl)
+
         return response
+
+    def perform_many(
+        self, calls: typing.Iterable[tuple], controller_id=None
+    ) -> typing.List[typing.Union[dict, None, Exception]]:
+        """ Perform several independent backend actions at once
+
+        The actions are performed in parallel (up to the size of the sender pool),
+        so the whole batch takes roughly as long as the slowest action.
+
+        :param calls: list of (module, action) or (module, action, data) tuples
+        :param controller_id: controller id used for all the actions
+        :returns: responses in the order of calls, a failed call is represented by
+                  the exception it raised (e.g. ExceptionInBackend)
+        """
+
+        def perform_one(call):
+            module, action, data = (tuple(call) + (None,))[:3]
+            try:
+                return self.perform(module, action, data, controller_id=controller_id)
+            except Exception as e:
+                return e
+
+        calls = list(calls)
+        if self._pool.size == 1 or len(calls) < 2:
+            # no way to run the calls in parallel
+            return [perform_one(call) for call in calls]
+
+        # the calls are performed within the context of the request (see per_request)
+        contexts = [contextvars.copy_context() for _ in calls]
+        return list(
+            self.executor.map(lambda ctx, call: ctx.run(perform_one, call), contexts, calls)
+        )
+
+    @property
+    def executor(self):
+        """ Thread pool used to perform actions in parallel (one thread per sender)
+        """
+        with self._executor_lock:
+            # created lazily, threads would not survive the fork of a prefork worker
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._pool.size, thread_name_prefix="foris-backend"
+                )
+            return self._executor
+
+
+class AsyncBackend(object):
+    """ asyncio interface of the Backend (e.g. `await backend.perform(...)`)
+
+    foris_client provides only blocking senders, so the actions are performed
+    by the Backend in a thread pool of this object and the event loop keeps serving
+    other requests meanwhile. Responses cached by the Backend are shared.
+
+    Note that the actions which need the message bus are still limited by the number
+    of its connections (see --bus-pool-size, there is only one connection to ubus
+    per process).
+    """
+
+    def __init__(self, backend, workers=4):
+        """
+        :param backend: backend which performs the actions
+        :type backend: Backend
+        :param workers: maximal number of actions which are performed at once
+        :type workers: int
+        """
+        self.backend = backend
+        self.workers = workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def __repr__(self):
+        return "%s(%r)" % (type(self).__name__, self.backend)
+
+    @property
+    def executor(self):
+        with self._executor_lock:
+            # created lazily, threads would not survive the fork of a prefork worker
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="foris-async-backend"
+                )
+            return self._executor
+
+    def after_fork(self):
+        """ Drops the threads inherited from the parent process
+        """
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    async def perform(
+        self, module, action, data=None, raise_exception_on_failure=True, controller_id=None
+    ):
+        """ Perform backend action (see Backend.perform)
+        """
+        # the action is performed within the context of the caller (see per_request)
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            functools.partial(
+                context.run,
+                self.backend.perform,
+                module,
+                action,
+                data,
+                raise_exception_on_failure=raise_exception_on_failure,
+                controller_id=controller_id,
+            ),
+        )
+
+    async def perform_many(
+        self, calls: typing.Iterable[tuple], controller_id=None
+    ) -> typing.List[typing.Union[dict, None, Exception]]:
+        """ Perform several independent backend actions at once (see Backend.perform_many)
+        """
+
+        async def perform_one(call):
+            module, action, data = (tuple(call) + (None,))[:3]
+            try:
+                return await self.perform(module, action, data, controller_id=controller_id)
+            except Exception as e:
+                return e
+
+        return list(await asyncio.gather(*[perform_one(call) for call in calls]))
@@ -18,17 +18,20 @@
 import bottle
 import json
 import logging
-import os
-import re
 
 from functools import wraps
 
-from foris import BASE_DIR
 from foris.utils import redirect_unauthenticated, is_safe_redirect, login_required, check_password
 from foris.middleware.bottle_csrf import update_csrf_token, CSRFValidationError, CSRFPlugin
 from foris.utils.routing import reverse
+from foris.utils import static_files
 from foris.utils.translators import translations, set_current_language
-from foris.utils.bottle_stuff import clickjacking_protection, clear_lazy_cache, disable_caching
+from foris.utils.bottle_stuff import (
+    clickjacking_protection,
+    clear_lazy_cache,
+    clear_request_template_defaults,
+    disable_caching,
+)
 from foris.state import current_state
 
 
@@ -96,34 +99,10 @@ def static(filename):
     :type filename: str
     :return: http response
     """
-
-    def prepare_response(filename, fs_root):
-        response = bottle.static_file(filename, root=fs_root)
-        response.add_header("Cache-Control", "public, max-age=31536000")
-        return response
-
     if not bottle.DEBUG:
         logger.warning("Static files should be handled externally in production mode.")
 
-    match = re.match(r"/*plugins/+(\w+)/+(.+)", filename)
-    if match:
-        plugin_name, plugin_file = match.groups()
-
-        # find correspoding plugin
-        for plugin in bottle.app().foris_plugin_loader.plugins:
-            if plugin.PLUGIN_NAME == plugin_name:
-                return prepare_response(plugin_file, os.path.join(plugin.DIRNAME, "static"))
-
-        return bottle.HTTPError(404, "File does not exist.")
-
-    match = re.match(r"/*generated/+([a-z]{2})/+(.+)", filename)
-    if match:
-        filename = "/".join(match.groups())
-        return prepare_response(
-            filename, os.path.join(current_state.assets_path, current_state.app)
-        )
-
-    return prepare_response(filename, os.path.join(BASE_DIR, "static"))
+    return static_files.serve(filename)
 
 
 @login_required
@@ -244,6 +223,7 @@ def init_common_app(app, prefix):
     """
     app.catchall = False  # caught by ReportingMiddleware
     app.error_handler[403] = foris_403_handler
+    app.add_hook("before_request", clear_request_template_defaults)
     app.add_hook("after_request", clickjacking_protection)
     app.add_hook("after_request", disable_caching)
     app.add_hook("after_request", clear_lazy_cache)
@@ -17,7 +17,6 @@
 
 import os
 import bottle
-import jinja2
 
 from bottle_i18n import I18NMiddleware, I18NPlugin, i18n_defaults
 
@@ -25,13 +24,17 @@ from foris import BASE_DIR
 from foris.common import init_common_app, init_default_app
 from foris.langs import DEFAULT_LANGUAGE
 from foris.middleware.backend_data import BackendData
+from foris.middleware.compression import CompressionMiddleware
 from foris.middleware.sessions import SessionMiddleware
 from foris.middleware.reporting import ReportingMiddleware
 from foris.plugins import ForisPluginLoader
+from foris.sessions import get_session_store
 from foris.state import current_state
 from foris.utils.bottle_stuff import prepare_template_defaults, route_list_cmdline, route_list_debug
 from foris.utils import messages
 from foris.utils import dynamic_assets
+from foris.utils import template_cache
+from foris.utils.static_manifest import manifest as static_manifest
 
 
 def prepare_common_app(args, app_name, init_function, top_index, logger, load_plugins=True):
@@ -54,9 +57,14 @@ def prepare_common_app(args, app_name, init_function, top_index, logger, load_pl
     i18n_defaults(bottle.SimpleTemplate, bottle.request)
     i18n_defaults(bottle.Jinja2Template, bottle.request)
     bottle.Jinja2Template.settings["extensions"] = ["foris.utils.translators.i18n"]
-    bottle.Jinja2Template.settings["bytecode_cache"] = jinja2.FileSystemBytecodeCache(
-        directory=current_state.assets_path
+    # precompiled templates are read from a persistent cache (assets path is in tmpfs)
+    bottle.Jinja2Template.settings["bytecode_cache"] = template_cache.LayeredBytecodeCache(
+        args.template_cache, current_state.assets_path
     )
+    if not args.debug:
+        # templates don't change in runtime so there is no need to reload
+        # included templates (layouts, macros) on every render
+        bottle.Jinja2Template.settings["auto_reload"] = False
 
     # setup default template defaults
     prepare_template_defaults()
@@ -86,10 +94,12 @@ def prepare_common_app(args, app_name, init_function, top_index, logger, load_pl
             prefix = route.config["mountpoint.prefix"]
             init_common_app(mounted, prefix)
 
+    plugins = []
     if load_plugins:
         # load Foris plugins before applying Bottle plugins to app
         loader = ForisPluginLoader(app)
         loader.autoload_plugins()
+        plugins = loader.plugins
 
     # i18n middleware
     app = I18NMiddleware(
@@ -102,15 +112,26 @@ def prepare_common_app(args, app_name, init_function, top_index, logger, load_pl
         ),
     )
 
-    # obtains required data from backend (this will happen everytime when a request arrives)
-    app = BackendData(app)
+    # obtains required data from backend (cached until they expire or a notification arrives)
+    app = BackendData(app, args.backend_data_ttl)
+    current_state.backend.add_notification_handler(app.handle_notification)
 
     # reporting middleware for all mounted apps
     app = ReportingMiddleware(app, sensitive_params=("key", "pass", "*password*"))
     app.install_dump_route(bottle.app())
 
     # session handling
-    app = SessionMiddleware(app, args.session_timeout)
+    if args.session_store == "ubus":
+        # session cache is process-local, so it is not used when multiple processes handle requests
+        store = get_session_store("ubus", cache=args.server not in ["cgi", "prefork"])
+    elif args.session_store == "file":
+        store = get_session_store("file", path=args.session_dir)
+    else:
+        store = get_session_store(args.session_store)
+    app = SessionMiddleware(app, args.session_timeout, store)
+
+    # compress html pages and json responses
+    app = CompressionMiddleware(app, args.compression_level, args.compression_threshold)
 
     # print routes to console and exit
     if args.routes:
@@ -123,7 +144,18 @@ def prepare_common_app(args, app_name, init_function, top_index, logger, load_pl
         routes = route_list_debug(bottle.app())
         logger.debug("Routes:\n%s", "\n".join(routes))
 
-    # Make dynamic assets cleanup
-    dynamic_assets.reset(app_name, args.assets)
+    # prepare dynamic assets directory (assets are generated in advance via dynamic_assets.build)
+    dynamic_assets.reset(app_name, args.assets, args.script_name)
+
+    # static files (their hashes are computed in advance via static_manifest.build)
+    static_manifest.set_roots(
+        [
+            ("", os.path.join(BASE_DIR, "static")),
+            ("generated/", dynamic_assets.current_assets_path),
+        ]
+        + [("plugins/%s/" % e.PLUGIN_NAME, os.path.join(e.DIRNAME, "static")) for e in plugins]
+    )
+    static_manifest.fingerprint_urls = args.static_fingerprints
+    static_manifest.check_changes = args.debug
 
     return app
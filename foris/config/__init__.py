@@ -15,34 +15,23 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import csv
+import importlib
 import logging
 import pathlib
+import threading
 
 from bottle import Bottle, request, template, response
 import bottle
 
 from foris.common import login
 from foris.utils.translators import _
-from foris.utils import login_required, messages, is_safe_redirect
+from foris.utils import etags, login_required, messages, is_safe_redirect
 from foris.middleware.bottle_csrf import CSRFPlugin
 from foris.utils.routing import reverse
+from foris.utils.bottle_stuff import set_request_template_default
+from foris.utils.startup import report as startup_report
 from foris.state import current_state
 
-from .pages.notifications import NotificationsConfigPage
-from .pages.password import PasswordConfigPage
-from .pages.remote import RemoteConfigPage
-from .pages.guide import ProfileConfigPage, GuideFinishedPage
-from .pages.networks import NetworksConfigPage
-from .pages.wan import WanConfigPage
-from .pages.time import TimeConfigPage
-from .pages.dns import DNSConfigPage
-from .pages.lan import LanConfigPage
-from .pages.guest import GuestConfigPage
-from .pages.wifi import WifiConfigPage
-from .pages.maintenance import MaintenanceConfigPage
-from .pages.updater import UpdaterConfigPage
-from .pages.about import AboutConfigPage
-
 from .pages.base import (
     ConfigPageMixin,
     JoinedPages,
@@ -55,31 +44,66 @@ EXTERNAL_LINKS_DIR = pathlib.Path("/usr/share/foris/external-links/")
 
 logger = logging.getLogger(__name__)
 
-config_pages = {
-    e.slug: e
-    for e in [
-        NotificationsConfigPage,
-        RemoteConfigPage,
-        PasswordConfigPage,
-        ProfileConfigPage,
-        NetworksConfigPage,
-        WanConfigPage,
-        TimeConfigPage,
-        DNSConfigPage,
-        LanConfigPage,
-        GuestConfigPage,
-        WifiConfigPage,
-        MaintenanceConfigPage,
-        UpdaterConfigPage,
-        GuideFinishedPage,
-        AboutConfigPage,
-    ]
+# built-in pages: slug -> (module, class name)
+# the modules (and the config handlers which they use) are imported on the first use
+BUILTIN_PAGES = {
+    "notifications": (".pages.notifications", "NotificationsConfigPage"),
+    "remote": (".pages.remote", "RemoteConfigPage"),
+    "password": (".pages.password", "PasswordConfigPage"),
+    "profile": (".pages.guide", "ProfileConfigPage"),
+    "networks": (".pages.networks", "NetworksConfigPage"),
+    "wan": (".pages.wan", "WanConfigPage"),
+    "time": (".pages.time", "TimeConfigPage"),
+    "dns": (".pages.dns", "DNSConfigPage"),
+    "lan": (".pages.lan", "LanConfigPage"),
+    "guest": (".pages.guest", "GuestConfigPage"),
+    "wifi": (".pages.wifi", "WifiConfigPage"),
+    "maintenance": (".pages.maintenance", "MaintenanceConfigPage"),
+    "updater": (".pages.updater", "UpdaterConfigPage"),
+    "finished": (".pages.guide", "GuideFinishedPage"),
+    "about": (".pages.about", "AboutConfigPage"),
 }
 
+# registered pages (built-in and external pages are added by load_pages())
+config_pages = {}
+
+_pages_loaded = False
+_pages_lock = threading.Lock()
+
+
+def load_pages():
+    """ Imports the built-in pages and reads the external pages (only once)
+    """
+    global _pages_loaded
+    if _pages_loaded:
+        return
+    with _pages_lock:
+        if _pages_loaded:
+            return
+        with startup_report.lazy_load("config pages"):
+            pages = {
+                slug: getattr(importlib.import_module(module, __name__), name)
+                for slug, (module, name) in BUILTIN_PAGES.items()
+            }
+            pages.update(config_pages)  # built-in pages first
+            config_pages.clear()
+            config_pages.update(pages)
+            populate_external_pages()
+        _pages_loaded = True
+
+
+def __getattr__(name):
+    # plugin compatibility - built-in page classes used to be imported here
+    for module, class_name in BUILTIN_PAGES.values():
+        if class_name == name:
+            return getattr(importlib.import_module(module, __name__), name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 
 def get_config_pages():
     """ Returns sorted config pages
     """
+    load_pages()
     res = sorted(config_pages.values(), key=lambda e: (e.menu_order, e.slug))
 
     # sort subpages
@@ -96,6 +120,9 @@ def add_config_page(page_class):
     if page_class.slug is None:
         raise Exception("Page %s doesn't define a propper slug" % page_class)
     page_map = {k: v for k, v in config_pages.items()}
+    if not _pages_loaded:
+        # the built-in pages are not imported (only their slugs are checked)
+        page_map.update({k: v[1] for k, v in BUILTIN_PAGES.items() if k not in page_map})
 
     for page in config_pages.values():
         for subpage in page.subpages:
@@ -139,10 +166,8 @@ def populate_external_pages():
             logger.warning("Reason: %r", e)
 
 
-populate_external_pages()
-
-
 def get_config_page(page_name):
+    load_pages()
     ConfigPage = config_pages.get(page_name, None)
     if ConfigPage:
         return ConfigPage
@@ -176,30 +201,48 @@ def config_page_get(page_name):
     if current_state.guide.enabled and page_name not in current_state.guide.available_tabs:
         bottle.redirect(reverse("config_page", page_name=current_state.guide.current))
 
-    bottle.SimpleTemplate.defaults["active_config_page_key"] = page_name
-    bottle.Jinja2Template.defaults["active_config_page_key"] = page_name
+    set_request_template_default("active_config_page_key", page_name)
     ConfigPage = get_config_page(page_name)
 
     # test if page is enabled otherwise redirect to default
     if not ConfigPage.is_enabled() or not ConfigPage.is_visible():
         _redirect_to_default_location()
 
+    # the page is not rendered when the client has its current version
+    if etags.not_modified(ConfigPage):
+        response.status = 304
+        return ""
+
+    # the page shows the session as it was before rendering (e.g. consumed messages)
+    session_data = etags.session_snapshot()
     config_page = ConfigPage()
-    return config_page.render(active_config_page_key=page_name)
+    result = config_page.render(active_config_page_key=page_name)
+    etags.update(ConfigPage, session_data)
+    return result
+
+
+def _render_update(config_page):
+    """ Renders the page after a field with requirements was changed by the client
+
+    When the client and the page support it, only the fields which were shown or hidden
+    are sent (as JSON, see ConfigPageMixin.render_update for its limits).
+    Otherwise the whole form is rendered.
+    """
+    if request.POST.pop("_partial", None) and config_page.partial_update:
+        return config_page.render_update(request.POST.getall("_fields[]"))
+    return config_page.render(is_xhr=True)
 
 
 @login_required
 def config_page_post(page_name):
-    bottle.SimpleTemplate.defaults["active_config_page_key"] = page_name
-    bottle.Jinja2Template.defaults["active_config_page_key"] = page_name
+    set_request_template_default("active_config_page_key", page_name)
     ConfigPage = get_config_page(page_name)
     config_page = ConfigPage(request.POST.decode())
     if request.is_xhr:
         if request.POST.pop("_update", None):
             # if update was requested, just render the page - otherwise handle actions as usual
-            pass
-        else:
-            config_page.save()
+            return _render_update(config_page)
+        config_page.save()
         return config_page.render(is_xhr=True)
     try:
         if config_page.save():
@@ -214,8 +257,7 @@ def config_page_post(page_name):
 
 @login_required
 def config_action(page_name, action):
-    bottle.SimpleTemplate.defaults["active_config_page"] = page_name
-    bottle.Jinja2Template.defaults["active_config_page"] = page_name
+    set_request_template_default("active_config_page", page_name)
     ConfigPage = get_config_page(page_name)
     config_page = ConfigPage()
     try:
@@ -227,14 +269,13 @@ def config_action(page_name, action):
 
 @login_required
 def config_action_post(page_name, action):
-    bottle.SimpleTemplate.defaults["active_config_page_key"] = page_name
-    bottle.Jinja2Template.defaults["active_config_page_key"] = page_name
+    set_request_template_default("active_config_page_key", page_name)
     ConfigPage = get_config_page(page_name)
     config_page = ConfigPage(request.POST.decode())
     if request.is_xhr:
         if request.POST.pop("_update", None):
             # if update was requested, just render the page - otherwise handle actions as usual
-            return config_page.render(is_xhr=True)
+            return _render_update(config_page)
     # check if the button click wasn't any sub-action
     subaction = request.POST.pop("action", None)
     if subaction:
@@ -256,8 +297,7 @@ def config_action_post(page_name, action):
 
 @login_required
 def config_ajax(page_name):
-    bottle.SimpleTemplate.defaults["active_config_page_key"] = page_name
-    bottle.Jinja2Template.defaults["active_config_page_key"] = page_name
+    set_request_template_default("active_config_page_key", page_name)
     action = request.params.get("action")
     if not action:
         raise bottle.HTTPError(404, "AJAX action not specified.")
@@ -272,8 +312,7 @@ def config_ajax(page_name):
 
 @login_required
 def config_ajax_form(page_name, form_name):
-    bottle.SimpleTemplate.defaults["active_config_page_key"] = page_name
-    bottle.Jinja2Template.defaults["active_config_page_key"] = page_name
+    set_request_template_default("active_config_page_key", page_name)
     ConfigPage = get_config_page(page_name)
     config_page = ConfigPage()
     if not request.is_xhr:
@@ -28,6 +28,7 @@ class AboutConfigPage(ConfigPageMixin):
 
     template = "config/about"
     template_type = "jinja2"
+    cacheable = True
     userfriendly_title = gettext("About")
 
     def render(self, **kwargs):
@@ -34,6 +34,10 @@ class BaseConfigPage(object):
     userfriendly_title: typing.Optional[str]
     menu_title: typing.Optional[str] = None
     subpages: typing.Iterable[typing.Type["ConfigPageMixin"]] = []
+    # the page is rendered only from the backend queries performed via current_state.backend
+    # (without controller_id), the session and the language, so it can be answered
+    # with 304 when they don't change (see foris.utils.etags)
+    cacheable = False
 
     @staticmethod
     def get_menu_tag_static(cls):
@@ -87,6 +91,10 @@ class ConfigPageMixin(BaseConfigPage):
     # page url part /config/<slug>
     template = "config/main"
     template_type = "simple"
+    # the template renders all active fields of the form in order (using _field.html.j2)
+    # and the update doesn't alter the values of the displayed fields, so only the fields
+    # which were shown or hidden can be sent on update (see render_update)
+    partial_update = False
 
     def call_action(self, action):
         """Call config page action.
@@ -140,7 +148,43 @@ class ConfigPageMixin(BaseConfigPage):
             title = self.userfriendly_title
             description = None
 
-        return self.default_template(form=form, title=title, description=description, **kwargs)
+        return self.default_template(
+            form=form,
+            title=title,
+            description=description,
+            partial_update=self.partial_update,
+            **kwargs
+        )
+
+    def render_update(self, rendered_fields):
+        """ Renders only the fields whose visibility changed after a field with requirements
+        was altered by the client
+
+        Fields which remain displayed are not sent, even when the server would render them
+        with a different value. The values of the form are taken from the request, so this
+        holds unless the page alters the data on update (such page should not set
+        partial_update). Messages (_messages.html.j2) are not rendered either - they are
+        kept in the session and displayed when the whole page is rendered.
+
+        :param rendered_fields: names of the fields displayed by the client
+        :type rendered_fields: list
+        :return: {"remove": [names], "insert": [{"name": ..., "after": ..., "html": ...}]}
+        :rtype: dict
+        """
+        removed, inserted = self.form.visibility_diff(rendered_fields)
+        return {
+            "remove": removed,
+            "insert": [
+                {
+                    "name": field.name,
+                    "after": after,
+                    "html": template(
+                        "_field.html.j2", field=field, template_adapter=bottle.Jinja2Template
+                    ),
+                }
+                for field, after in inserted
+            ],
+        }
 
     def save(self, *args, **kwargs):
         no_messages = kwargs.pop("no_messages", False)
@@ -30,6 +30,7 @@ class DNSConfigPage(ConfigPageMixin, dns.DNSHandler):
 
     template = "config/dns"
     template_type = "jinja2"
+    cacheable = True
 
     def _action_check_connection(self):
         return current_state.backend.perform(
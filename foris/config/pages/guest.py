@@ -28,6 +28,8 @@ class GuestConfigPage(ConfigPageMixin, guest.GuestHandler):
 
     template = "config/guest"
     template_type = "jinja2"
+    cacheable = True
+    partial_update = True
 
     def render(self, **kwargs):
         kwargs["dhcp_clients"] = self.backend_data["dhcp"]["clients"]
@@ -30,6 +30,7 @@ class ProfileConfigPage(ConfigPageMixin, profile.ProfileHandler):
     menu_order = 13
     template = "config/profile"
     template_type = "jinja2"
+    cacheable = True
 
     def render(self, **kwargs):
         kwargs["workflows"] = [
@@ -72,6 +73,7 @@ class GuideFinishedPage(ConfigPageMixin, misc.GuideFinishedHandler):
     menu_order = 90
 
     template_type = "jinja2"
+    cacheable = True
     template = "config/finished"
 
     def save(self, *args, **kwargs):
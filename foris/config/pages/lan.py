@@ -28,6 +28,8 @@ class LanConfigPage(ConfigPageMixin, lan.LanHandler):
 
     template = "config/lan"
     template_type = "jinja2"
+    cacheable = True
+    partial_update = True
 
     def render(self, **kwargs):
         kwargs["dhcp_clients"] = self.backend_data["mode_managed"]["dhcp"]["clients"]
@@ -29,6 +29,7 @@ class NetworksConfigPage(ConfigPageMixin, networks.NetworksHandler):
     menu_order = 14
     template = "config/networks"
     template_type = "jinja2"
+    cacheable = True
 
     def render(self, **kwargs):
         # place non-configurable intefaces in front of configurable
@@ -32,6 +32,7 @@ class NotificationsConfigPage(ConfigPageMixin):
     template = "config/notifications"
     userfriendly_title = gettext("Notifications")
     template_type = "jinja2"
+    cacheable = True
 
     def render(self, **kwargs):
         notifications = current_state.backend.perform(
@@ -29,6 +29,7 @@ class PasswordConfigPage(ConfigPageMixin, misc.PasswordHandler):
     menu_order = 10
     template = "config/password"
     template_type = "jinja2"
+    cacheable = True
 
     def __init__(self, *args, **kwargs):
         super(PasswordConfigPage, self).__init__(change=current_state.password_set, *args, **kwargs)
@@ -48,7 +48,8 @@ class RemoteConfigPage(ConfigPageMixin, remote.RemoteHandler):
         cls.token_links = {k: v for k, v in cls.token_links.items() if now <= v["expiration"]}
 
     def render(self, **kwargs):
-        data = current_state.backend.perform("remote", "get_status")
+        # status is obtained together with the settings
+        (data,) = self.load_backend_queries(("remote", "get_status"))
 
         kwargs["status"] = data["status"]
         kwargs["tokens"] = data["tokens"]
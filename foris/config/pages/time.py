@@ -31,6 +31,7 @@ class TimeConfigPage(ConfigPageMixin, misc.UnifiedTimeHandler):
 
     template = "config/time"
     template_type = "jinja2"
+    cacheable = True
 
     def render(self, **kwargs):
         kwargs["ntp_servers"] = self.backend_data["time_settings"]["ntp_servers"]
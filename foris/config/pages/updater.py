@@ -34,6 +34,7 @@ class UpdaterConfigPage(ConfigPageMixin, updater.UpdaterHandler):
 
     template = "config/updater"
     template_type = "jinja2"
+    cacheable = True
 
     def _action_resolve_approval(self):
         if bottle.request.method != "POST":
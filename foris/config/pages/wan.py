@@ -29,8 +29,11 @@ class WanConfigPage(ConfigPageMixin, wan.WanHandler):
 
     template = "config/wan"
     template_type = "jinja2"
+    cacheable = True
+    partial_update = True
 
     def render(self, **kwargs):
+        self.load_backend_queries()
         kwargs["interface_count"] = self.backend_data["interface_count"]
         kwargs["interface_up_count"] = self.backend_data["interface_up_count"]
         kwargs["wan_status"] = self.status_data
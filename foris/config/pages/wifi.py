@@ -33,6 +33,7 @@ class WifiConfigPage(ConfigPageMixin, wifi.WifiHandler):
 
     template = "config/wifi"
     template_type = "jinja2"
+    cacheable = True
 
     def _action_reset(self):
 
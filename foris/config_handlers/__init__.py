@@ -14,7 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from .base import BaseConfigHandler
+from .base import BackendQuery, BaseConfigHandler
 
 
-__all__ = ["BaseConfigHandler"]
+__all__ = ["BackendQuery", "BaseConfigHandler"]
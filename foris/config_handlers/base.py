@@ -15,6 +15,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import logging
 
+from foris import fapi
+from foris.state import current_state
 from foris.utils.addresses import mask_to_prefix_4
 
 
@@ -27,11 +29,84 @@ DEFAULT_GUEST_MASK = "255.255.255.0"
 DEFAULT_GUEST_PREFIX = mask_to_prefix_4(DEFAULT_GUEST_MASK)
 
 
+class BackendQuery(object):
+    """ Handler attribute which is obtained from the backend when it is accessed for the first time
+
+    So the handler doesn't query the backend for data which are not going to be used
+    (e.g. when only an action of the page is called).
+
+    Example:
+        class LanHandler(BaseConfigHandler):
+            backend_data = BackendQuery("lan", "get_settings")
+    """
+
+    def __init__(self, module, action, data=None):
+        """
+        :param module: backend module
+        :type module: str
+        :param action: backend action
+        :type action: str
+        :param data: request data or a callable which returns them (it obtains the handler)
+        :type data: dict or callable
+        """
+        self.module = module
+        self.action = action
+        self.data = data
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def call(self, handler):
+        """ Returns (module, action, data) tuple which can be passed to Backend.perform_many
+        """
+        data = self.data(handler) if callable(self.data) else self.data
+        return self.module, self.action, data
+
+    def __get__(self, handler, owner):
+        if handler is None:
+            return self
+        value = current_state.backend.perform(*self.call(handler))
+        # stored in the instance, so the descriptor is not used anymore
+        handler.__dict__[self.name] = value
+        return value
+
+
 class BaseConfigHandler(object):
     def __init__(self, data=None):
         self.data = data
         self.__form_cache = None
 
+    def load_backend_queries(self, *calls):
+        """ Obtains all backend data of the handler which were not loaded yet (see BackendQuery)
+
+        The queries are performed in parallel.
+
+        :param calls: additional (module, action[, data]) calls which are performed together
+        :returns: responses of the additional calls
+        :rtype: list
+        :raises: the first exception raised by any of the calls
+        """
+        queries = {}
+        for cls in reversed(type(self).__mro__):
+            for name, attr in vars(cls).items():
+                if isinstance(attr, BackendQuery):
+                    queries[name] = attr
+                else:
+                    queries.pop(name, None)  # overridden in a subclass
+        queries = [(k, v) for k, v in queries.items() if k not in self.__dict__]
+
+        results = current_state.backend.perform_many(
+            [query.call(self) for _, query in queries] + list(calls)
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        for (name, _), result in zip(queries, results):
+            self.__dict__[name] = result
+        return results[len(queries) :]
+
     @property
     def form(self):
         if self.__form_cache is None:
@@ -46,6 +121,29 @@ class BaseConfigHandler(object):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def define_form(cls, *variant):
+        """ Defines the form without any data (see bind_form())
+
+        :param variant: options which alter structure of the form (e.g. hidden sections)
+        :rtype: fapi.ForisForm
+        """
+        raise NotImplementedError()
+
+    def bind_form(self, data, *variant, field_attrs=None):
+        """ Returns the form defined in define_form() bound to the data
+
+        The form definition is compiled only once per handler class, variant and language.
+
+        :param data: data of the form
+        :param variant: options passed to define_form() (must be hashable)
+        :param field_attrs: field name -> attributes of the input which differ per request
+        :type field_attrs: dict
+        :rtype: fapi.ForisForm
+        """
+        schema = fapi.get_form_schema((type(self), variant), lambda: self.define_form(*variant))
+        return schema.bind(data, field_attrs)
+
     def save(self, extra_callbacks=None):
         """
 
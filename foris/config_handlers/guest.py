@@ -23,36 +23,18 @@ from foris.utils.routing import reverse
 from foris.utils.translators import gettext_dummy as gettext, _
 
 
-from .base import BaseConfigHandler, DEFAULT_GUEST_MASK, DEFAULT_GUEST_IP
+from .base import BackendQuery, BaseConfigHandler, DEFAULT_GUEST_MASK, DEFAULT_GUEST_IP
 
 
 class GuestHandler(BaseConfigHandler):
     userfriendly_title = gettext("Guest network")
 
-    def __init__(self, *args, **kwargs):
-        super(GuestHandler, self).__init__(*args, **kwargs)
-        self.backend_data = current_state.backend.perform("guest", "get_settings")
-
-    def get_form(self):
-        data = {}
-        data["guest_enabled"] = self.backend_data["enabled"]
-        data["guest_ipaddr"] = self.backend_data["ip"]
-        data["guest_netmask"] = self.backend_data["netmask"]
-        data["guest_dhcp_enabled"] = self.backend_data["dhcp"]["enabled"]
-        data["guest_dhcp_start"] = self.backend_data["dhcp"]["start"]
-        data["guest_dhcp_limit"] = self.backend_data["dhcp"]["limit"]
-        data["guest_dhcp_leasetime"] = self.backend_data["dhcp"]["lease_time"] // 60 // 60
-        data["guest_qos_enabled"] = self.backend_data["qos"]["enabled"]
-        data["guest_qos_download"] = self.backend_data["qos"]["download"]
-        data["guest_qos_upload"] = self.backend_data["qos"]["upload"]
-
-        if self.data:
-            # Update from post
-            data.update(self.data)
+    backend_data = BackendQuery("guest", "get_settings")
 
+    @classmethod
+    def define_form(cls, wifi_url):
         guest_form = fapi.ForisForm(
             "guest",
-            data,
             validators=[
                 validators.DhcpRangeValidator(
                     "guest_netmask",
@@ -86,14 +68,14 @@ class GuestHandler(BaseConfigHandler):
         )
         guest_network_section = guest_form.add_section(
             name="guest_network",
-            title=_(self.userfriendly_title),
+            title=_(cls.userfriendly_title),
             description=_(
                 "Guest network is used for <a href='%(url)s'>guest Wi-Fi</a>. It is separated  "
                 "from your ordinary LAN. Devices connected to this network are allowed "
                 "to access the internet, but are not allowed to access the configuration "
                 "interface of this device nor the devices in LAN."
             )
-            % dict(url=reverse("config_page", page_name="wifi")),
+            % dict(url=wifi_url),
         )
         guest_network_section.add_field(
             Checkbox, name="guest_enabled", label=_("Enable guest network"), default=False
@@ -170,6 +152,28 @@ class GuestHandler(BaseConfigHandler):
             default=1024,
         ).requires("guest_qos_enabled", True)
 
+        return guest_form
+
+    def get_form(self):
+        data = {}
+        data["guest_enabled"] = self.backend_data["enabled"]
+        data["guest_ipaddr"] = self.backend_data["ip"]
+        data["guest_netmask"] = self.backend_data["netmask"]
+        data["guest_dhcp_enabled"] = self.backend_data["dhcp"]["enabled"]
+        data["guest_dhcp_start"] = self.backend_data["dhcp"]["start"]
+        data["guest_dhcp_limit"] = self.backend_data["dhcp"]["limit"]
+        data["guest_dhcp_leasetime"] = self.backend_data["dhcp"]["lease_time"] // 60 // 60
+        data["guest_qos_enabled"] = self.backend_data["qos"]["enabled"]
+        data["guest_qos_download"] = self.backend_data["qos"]["download"]
+        data["guest_qos_upload"] = self.backend_data["qos"]["upload"]
+
+        if self.data:
+            # Update from post
+            data.update(self.data)
+
+        # the url depends on the script name of the request
+        guest_form = self.bind_form(data, reverse("config_page", page_name="wifi"))
+
         def guest_form_cb(data):
             if data["guest_enabled"]:
                 msg = {
@@ -22,48 +22,18 @@ from foris.state import current_state
 from foris.utils.translators import gettext_dummy as gettext, _
 
 
-from .base import BaseConfigHandler
+from .base import BackendQuery, BaseConfigHandler
 
 
 class LanHandler(BaseConfigHandler):
     userfriendly_title = gettext("LAN")
 
-    def __init__(self, *args, **kwargs):
-        super(LanHandler, self).__init__(*args, **kwargs)
-        self.backend_data = current_state.backend.perform("lan", "get_settings")
-
-    def get_form(self):
-        data = {}
-        data["mode"] = self.backend_data["mode"]
-        data["router_ip"] = self.backend_data["mode_managed"]["router_ip"]
-        data["router_netmask"] = self.backend_data["mode_managed"]["netmask"]
-        data["router_dhcp_enabled"] = self.backend_data["mode_managed"]["dhcp"]["enabled"]
-        data["router_dhcp_start"] = self.backend_data["mode_managed"]["dhcp"]["start"]
-        data["router_dhcp_limit"] = self.backend_data["mode_managed"]["dhcp"]["limit"]
-        data["router_dhcp_leasetime"] = self.backend_data["mode_managed"]["dhcp"]["lease_time"] // (
-            60 * 60
-        )
-        data["client_proto_4"] = self.backend_data["mode_unmanaged"]["lan_type"]
-        data["client_ip_4"] = self.backend_data["mode_unmanaged"]["lan_static"]["ip"]
-        data["client_netmask_4"] = self.backend_data["mode_unmanaged"]["lan_static"]["netmask"]
-        data["client_gateway_4"] = self.backend_data["mode_unmanaged"]["lan_static"]["gateway"]
-        dns1 = self.backend_data["mode_unmanaged"]["lan_static"].get("dns1")
-        if dns1:
-            data["client_dns1_4"] = dns1
-        dns2 = self.backend_data["mode_unmanaged"]["lan_static"].get("dns2")
-        if dns2:
-            data["client_dns2_4"] = dns2
-        data["client_hostname_4"] = self.backend_data["mode_unmanaged"]["lan_dhcp"].get(
-            "hostname", ""
-        )
-
-        if self.data:
-            # Update from post
-            data.update(self.data)
+    backend_data = BackendQuery("lan", "get_settings")
 
+    @classmethod
+    def define_form(cls):
         lan_form = fapi.ForisForm(
             "lan",
-            data,
             validators=[
                 validators.DhcpRangeValidator(
                     "router_netmask",
@@ -97,7 +67,7 @@ class LanHandler(BaseConfigHandler):
         )
         lan_main = lan_form.add_section(
             name="set_lan",
-            title=_(self.userfriendly_title),
+            title=_(cls.userfriendly_title),
             description=_(
                 "This section contains settings for the local network (LAN). The provided"
                 " defaults are suitable for most networks. <br><strong>Note:</strong> If "
@@ -233,6 +203,39 @@ class LanHandler(BaseConfigHandler):
             hint=_("Hostname which will be provided to DHCP server."),
         ).requires("client_proto_4", LAN_DHCP)
 
+        return lan_form
+
+    def get_form(self):
+        data = {}
+        data["mode"] = self.backend_data["mode"]
+        data["router_ip"] = self.backend_data["mode_managed"]["router_ip"]
+        data["router_netmask"] = self.backend_data["mode_managed"]["netmask"]
+        data["router_dhcp_enabled"] = self.backend_data["mode_managed"]["dhcp"]["enabled"]
+        data["router_dhcp_start"] = self.backend_data["mode_managed"]["dhcp"]["start"]
+        data["router_dhcp_limit"] = self.backend_data["mode_managed"]["dhcp"]["limit"]
+        data["router_dhcp_leasetime"] = self.backend_data["mode_managed"]["dhcp"]["lease_time"] // (
+            60 * 60
+        )
+        data["client_proto_4"] = self.backend_data["mode_unmanaged"]["lan_type"]
+        data["client_ip_4"] = self.backend_data["mode_unmanaged"]["lan_static"]["ip"]
+        data["client_netmask_4"] = self.backend_data["mode_unmanaged"]["lan_static"]["netmask"]
+        data["client_gateway_4"] = self.backend_data["mode_unmanaged"]["lan_static"]["gateway"]
+        dns1 = self.backend_data["mode_unmanaged"]["lan_static"].get("dns1")
+        if dns1:
+            data["client_dns1_4"] = dns1
+        dns2 = self.backend_data["mode_unmanaged"]["lan_static"].get("dns2")
+        if dns2:
+            data["client_dns2_4"] = dns2
+        data["client_hostname_4"] = self.backend_data["mode_unmanaged"]["lan_dhcp"].get(
+            "hostname", ""
+        )
+
+        if self.data:
+            # Update from post
+            data.update(self.data)
+
+        lan_form = self.bind_form(data)
+
         def lan_form_cb(data):
             msg = {"mode": data["mode"]}
             if msg["mode"] == "managed":
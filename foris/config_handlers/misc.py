@@ -23,10 +23,11 @@ from datetime import datetime
 from foris import fapi, validators
 from foris.form import Password, Textbox, Dropdown
 from foris.state import current_state
-from foris.utils import tzinfo, localized_sorted, check_password
+from foris.utils import tzinfo, check_password
+from foris.utils.collation import cached_localized_sorted
 from foris.utils.translators import gettext_dummy as gettext, _
 
-from .base import BaseConfigHandler
+from .base import BackendQuery, BaseConfigHandler
 
 
 class PasswordHandler(BaseConfigHandler):
@@ -180,9 +181,7 @@ class UnifiedTimeHandler(BaseConfigHandler):
 
     userfriendly_title = gettext("Region and time")
 
-    def __init__(self, *args, **kwargs):
-        self.backend_data = current_state.backend.perform("time", "get_settings")
-        super().__init__(*args, **kwargs)
+    backend_data = BackendQuery("time", "get_settings")
 
     def get_form(self):
         data = copy.deepcopy(self.backend_data)
@@ -227,28 +226,32 @@ class UnifiedTimeHandler(BaseConfigHandler):
 
         lang = current_state.language
 
-        def construct_args(items, translation_function=_, key_getter=lambda x: x):
+        def construct_args(name, items, translation_function=_, key_getter=lambda x: x):
             """
             Helper function that builds args for country/timezone dropdowns.
             If there's only one item, dropdown should contain only that item.
             Otherwise the list of items should be prepended by an empty value.
 
-            :param items: list of filtered TZ data
+            The sorted items are cached per language.
+
+            :param name: identifier of the dropdown content (e.g. "countries/Europe")
+            :param items: function that returns list of filtered TZ data
             :param translation_function: function that returns displayed choice from TZ data
             :param key_getter:
             :return: list of args
             """
-            args = localized_sorted(
-                ((key_getter(x), translation_function(x)) for x in items),
-                lang=lang,
+            args = cached_localized_sorted(
+                name,
+                lang,
+                lambda: [(key_getter(x), translation_function(x)) for x in items()],
                 key=lambda x: x[1],
             )
             if len(args) > 1:
                 return [(None, "-" * 16)] + args
             return args
 
-        regions = localized_sorted(
-            ((x, _(x)) for x in tzinfo.regions), lang=lang, key=lambda x: x[1]
+        regions = cached_localized_sorted(
+            "regions", lang, lambda: [(x, _(x)) for x in tzinfo.regions], key=lambda x: x[1]
         )
         region_section.add_field(
             Dropdown, name="region", label=_("Continent or ocean"), required=True, args=regions
@@ -257,7 +260,9 @@ class UnifiedTimeHandler(BaseConfigHandler):
         # Get region and offer available countries
         region = region_and_time_form.current_data.get("region")
         countries = construct_args(
-            tzinfo.countries_in_region(region), lambda x: _(tzinfo.countries[x])
+            "countries/%s" % region,
+            lambda: tzinfo.countries_in_region(region),
+            lambda x: _(tzinfo.countries[x]),
         )
         region_section.add_field(
             Dropdown,
@@ -276,7 +281,8 @@ class UnifiedTimeHandler(BaseConfigHandler):
         if country not in (x[0] for x in countries):
             country = countries[0][0]
         timezones = construct_args(
-            tzinfo.timezones_in_region_and_country(region, country),
+            "timezones/%s/%s" % (region, country),
+            lambda: tzinfo.timezones_in_region_and_country(region, country),
             translation_function=lambda x: _(x[2]),
             key_getter=lambda x: x[0],
         )
@@ -18,7 +18,7 @@
 
 import copy
 
-from .base import BaseConfigHandler
+from .base import BackendQuery, BaseConfigHandler
 
 from foris import fapi
 
@@ -33,14 +33,11 @@ class NetworksHandler(BaseConfigHandler):
 
     userfriendly_title = gettext("Network interfaces")
 
-    def load_backend_data(self):
-        data = current_state.backend.perform("networks", "get_settings")
-
-        self.backend_data = data
+    backend_data = BackendQuery("networks", "get_settings")
 
-    def __init__(self, *args, **kwargs):
-        self.load_backend_data()
-        super(NetworksHandler, self).__init__(*args, **kwargs)
+    def load_backend_data(self):
+        # loaded data are dropped, so they are obtained again when accessed
+        self.__dict__.pop("backend_data", None)
 
     def get_form(self):
         data = copy.deepcopy(self.backend_data)
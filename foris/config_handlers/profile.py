@@ -16,7 +16,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from .base import BaseConfigHandler
+from .base import BackendQuery, BaseConfigHandler
 
 from foris import fapi
 
@@ -31,12 +31,11 @@ class ProfileHandler(BaseConfigHandler):
 
     userfriendly_title = gettext("Guide workflow")
 
-    def __init__(self, *args, **kwargs):
-        self.load_backend_data()
-        super(ProfileHandler, self).__init__(*args, **kwargs)
+    backend_data = BackendQuery("web", "get_guide")
 
     def load_backend_data(self):
-        self.backend_data = current_state.backend.perform("web", "get_guide")
+        # loaded data are dropped, so they are obtained again when accessed
+        self.__dict__.pop("backend_data", None)
 
     def get_form(self):
 
@@ -15,7 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from .base import BaseConfigHandler
+from .base import BackendQuery, BaseConfigHandler
 
 from foris import fapi
 
@@ -44,9 +44,7 @@ class RemoteHandler(BaseConfigHandler):
 
     userfriendly_title = gettext("Remote Access")
 
-    def __init__(self, *args, **kwargs):
-        self.backend_data = current_state.backend.perform("remote", "get_settings")
-        super().__init__(*args, **kwargs)
+    backend_data = BackendQuery("remote", "get_settings")
 
     def get_form(self):
         data = {
@@ -18,15 +18,15 @@
 
 import copy
 import logging
-import pkg_resources
 import typing
 
 from foris import fapi, validators
 from foris.form import Checkbox, Radio, RadioSingle, Number, Hidden, Textbox
 from foris.state import current_state
+from foris.utils.entry_points import registry as entry_points
 from foris.utils.translators import gettext_dummy as gettext, _
 
-from .base import BaseConfigHandler
+from .base import BackendQuery, BaseConfigHandler
 
 
 logger = logging.getLogger(__name__)
@@ -41,53 +41,67 @@ class UpdaterHandler(BaseConfigHandler):
     APPROVAL_DEFAULT = APPROVAL_NO
     APPROVAL_DEFAULT_DELAY = 1.0
 
+    backend_data = BackendQuery(
+        "updater", "get_settings", lambda handler: {"lang": current_state.language}
+    )
+
     def __init__(self, *args, **kwargs):
         super(UpdaterHandler, self).__init__(*args, **kwargs)
+        # settings updated from the posted data (see get_form)
+        self.posted_settings: typing.Dict[str, typing.Any] = {}
+        self._always_on_reasons: typing.Optional[typing.List[str]] = None
 
-        # Check whether updater is supposed to be always on and store the reason why
-        self.always_on_reasons: typing.List[str] = []
-        for entry_point in pkg_resources.iter_entry_points("updater_always_on"):
-            logger.info("Processing 'updater_always_on' for '%s' plugin", entry_point.name)
-            reason: typing.Option[str] = entry_point.load()()
-            if reason:
-                self.always_on_reasons.append(reason)
+    @property
+    def always_on_reasons(self) -> typing.List[str]:
+        """ Reasons why updater is supposed to be always on (obtained from the plugins)
+        """
+        if self._always_on_reasons is None:
+            self._always_on_reasons = []
+            for entry_point, get_reason in entry_points.load("updater_always_on"):
+                logger.debug("Processing 'updater_always_on' for '%s' plugin", entry_point.name)
+                reason: typing.Optional[str] = get_reason()
+                if reason:
+                    self._always_on_reasons.append(reason)
+        return self._always_on_reasons
 
-        self.backend_data = current_state.backend.perform(
-            "updater", "get_settings", {"lang": current_state.language}
-        )
-        # store setting required for rendering
-        self.current_approval = self.backend_data["approval"]
+    @property
+    def current_approval(self):
+        return self.backend_data["approval"]
+
+    @property
+    def updater_enabled(self):
+        if "enabled" in self.posted_settings:
+            return self.posted_settings["enabled"]
         # update can be in 3 states: True, False, None
         # None means that it is not set in this case we want to prefill True
-        self.updater_enabled = False if self.backend_data["enabled"] is False else True
-        self.approval_setting_status = self.backend_data["approval_settings"]["status"]
-        self.approval_setting_delay = self.backend_data["approval_settings"].get(
-            "delay", self.APPROVAL_DEFAULT_DELAY
-        )
+        return False if self.backend_data["enabled"] is False else True
 
-    def get_form(self):
-        data = copy.deepcopy(self.backend_data)
-
-        data["enabled"] = "0" if data["enabled"] is False else "1"
-        data["approval_status"] = data["approval_settings"]["status"]
-        if "delay" in data["approval_settings"]:
-            data["approval_delay"] = "%.1f" % (data["approval_settings"]["delay"] / 24.0)
-        for userlist in [e for e in data["user_lists"] if not e["hidden"]]:
-            data["install_%s" % userlist["name"]] = userlist["enabled"]
-        for lang in data["languages"]:
-            data["language_%s" % lang["code"]] = lang["enabled"]
+    @property
+    def approval_setting_status(self):
+        if "approval_status" in self.posted_settings:
+            return self.posted_settings["approval_status"]
+        return self.backend_data["approval_settings"]["status"]
 
-        if self.data:
-            # Update from post
-            data.update(self.data)
-            self.updater_enabled = True if data["enabled"] == "1" else False
-            self.approval_setting_status = data["approval_status"]
-            self.approval_setting_delay = data.get("approval_delay", self.APPROVAL_DEFAULT_DELAY)
+    @property
+    def approval_setting_delay(self):
+        if "approval_delay" in self.posted_settings:
+            return self.posted_settings["approval_delay"]
+        return self.backend_data["approval_settings"].get("delay", self.APPROVAL_DEFAULT_DELAY)
 
-        form = fapi.ForisForm("updater", data)
+    @classmethod
+    def define_form(cls, user_lists, languages, approval_present):
+        """
+        :param user_lists: (name, title, msg) of the displayed user lists
+        :type user_lists: tuple
+        :param languages: codes of the languages
+        :type languages: tuple
+        :param approval_present: whether the hidden approval field is present
+        :type approval_present: bool
+        """
+        form = fapi.ForisForm("updater")
         main_section = form.add_section(
             name="main",
-            title=_(self.userfriendly_title),
+            title=_(cls.userfriendly_title),
             description=_(
                 "Updater is a service that keeps all TurrisOS "
                 "software up to date. Apart from the standard "
@@ -120,7 +134,6 @@ class UpdaterHandler(BaseConfigHandler):
             group="approval_status",
             label=_("Automatic installation"),
             hint=_("Updates will be installed without user's intervention."),
-            default=data["approval_status"],
         )
 
         approval_section.add_field(
@@ -132,7 +145,6 @@ class UpdaterHandler(BaseConfigHandler):
                 "Updates will be installed with an adjustable delay. "
                 "You can also approve them manually."
             ),
-            default=data["approval_status"],
         )
         approval_section.add_field(
             Textbox,
@@ -152,16 +164,12 @@ class UpdaterHandler(BaseConfigHandler):
             group="approval_status",
             label=_("Update approval needed"),
             hint=_("You have to approve the updates, otherwise they won't be installed."),
-            default=data["approval_status"],
         )
 
         package_lists_main = main_section.add_section(name="select_package_lists", title=None)
-        for userlist in [e for e in data["user_lists"] if not e["hidden"]]:
+        for name, title, msg in user_lists:
             package_lists_main.add_field(
-                Checkbox,
-                name="install_%s" % userlist["name"],
-                label=userlist["title"],
-                hint=userlist["msg"],
+                Checkbox, name="install_%s" % name, label=title, hint=msg
             ).requires("enabled", "1")
 
         language_lists_main = main_section.add_section(
@@ -171,21 +179,57 @@ class UpdaterHandler(BaseConfigHandler):
                 "following list:"
             ),
         )
-        for lang in data["languages"]:
-            language_lists_main.add_field(
-                Checkbox, name="language_%s" % lang["code"], label=lang["code"].upper()
-            )
+        for code in languages:
+            language_lists_main.add_field(Checkbox, name="language_%s" % code, label=code.upper())
 
-        if self.backend_data["approval"]["present"]:
+        if approval_present:
             # field for hidden approval
             current_approval_section = main_section.add_section(name="current_approval", title="")
-            current_approval_section.add_field(
-                Hidden, name="approval-id", default=self.backend_data["approval"]["hash"]
-            )
+            current_approval_section.add_field(Hidden, name="approval-id")
 
         # this will be filled according to action
         main_section.add_field(Hidden, name="target")
 
+        return form
+
+    def get_form(self):
+        data = copy.deepcopy(self.backend_data)
+
+        data["enabled"] = "0" if data["enabled"] is False else "1"
+        data["approval_status"] = data["approval_settings"]["status"]
+        if "delay" in data["approval_settings"]:
+            data["approval_delay"] = "%.1f" % (data["approval_settings"]["delay"] / 24.0)
+        for userlist in [e for e in data["user_lists"] if not e["hidden"]]:
+            data["install_%s" % userlist["name"]] = userlist["enabled"]
+        for lang in data["languages"]:
+            data["language_%s" % lang["code"]] = lang["enabled"]
+
+        if self.data:
+            # Update from post
+            data.update(self.data)
+            self.posted_settings = {
+                "enabled": True if data["enabled"] == "1" else False,
+                "approval_status": data["approval_status"],
+                "approval_delay": data.get("approval_delay", self.APPROVAL_DEFAULT_DELAY),
+            }
+
+        # values which used to be field defaults (they differ per request)
+        for status in (self.APPROVAL_NO, self.APPROVAL_TIMEOUT, self.APPROVAL_NEEDED):
+            data.setdefault(status, data["approval_status"])
+        if self.backend_data["approval"]["present"]:
+            data.setdefault("approval-id", self.backend_data["approval"]["hash"])
+
+        form = self.bind_form(
+            data,
+            tuple(
+                (e["name"], e["title"], e["msg"])
+                for e in self.backend_data["user_lists"]
+                if not e["hidden"]
+            ),
+            tuple(e["code"] for e in self.backend_data["languages"]),
+            self.backend_data["approval"]["present"],
+        )
+
         def form_cb(data):
             data["enabled"] = True if data["enabled"] == "1" else False
             if data["enabled"] and data["target"] == "save":
@@ -14,7 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from .base import BaseConfigHandler
+from .base import BackendQuery, BaseConfigHandler
 from foris import fapi, validators
 from foris.state import current_state
 from foris.form import Checkbox, Dropdown, Textbox, Number, PasswordWithHide
@@ -25,11 +25,12 @@ from foris.utils.translators import gettext_dummy as gettext, _
 class WanHandler(BaseConfigHandler):
     userfriendly_title = gettext("WAN")
 
+    status_data = BackendQuery("wan", "get_wan_status")
+    backend_data = BackendQuery("wan", "get_settings")
+
     def __init__(self, *args, **kwargs):
         # Do not display "none" options for WAN protocol if hide_no_wan is True
         self.hide_no_wan = kwargs.pop("hide_no_wan", False)
-        self.status_data = current_state.backend.perform("wan", "get_wan_status")
-        self.backend_data = current_state.backend.perform("wan", "get_settings")
         super(WanHandler, self).__init__(*args, **kwargs)
 
     @staticmethod
@@ -153,18 +154,13 @@ class WanHandler(BaseConfigHandler):
 
         return res
 
-    def get_form(self):
-        data = WanHandler._convert_backend_data_to_form_data(self.backend_data)
-
-        if self.data:
-            # Update from post
-            data.update(self.data)
-
+    @classmethod
+    def define_form(cls, hide_no_wan):
         # WAN
-        wan_form = fapi.ForisForm("wan", data)
+        wan_form = fapi.ForisForm("wan")
         wan_main = wan_form.add_section(
             name="set_wan",
-            title=_(self.userfriendly_title),
+            title=_(cls.userfriendly_title),
             description=_(
                 "Here you specify your WAN port settings. Usually, you can leave these "
                 "options untouched unless instructed otherwise by your internet service "
@@ -195,7 +191,7 @@ class WanHandler(BaseConfigHandler):
             (WAN6_6IN4, _("6in4 (public IPv4 address required)")),
         )
 
-        if not self.hide_no_wan:
+        if not hide_no_wan:
             WAN6_OPTIONS = ((WAN6_NONE, _("Disable IPv6")),) + WAN6_OPTIONS
 
         # protocol
@@ -318,7 +314,6 @@ class WanHandler(BaseConfigHandler):
             name="ip6duid",
             label=_("Custom DUID"),
             validators=validators.Duid(),
-            placeholder=self.status_data["last_seen_duid"],
             hint=_("DUID which will be provided to the DHCPv6 server."),
         ).requires("wan6_proto", WAN6_DHCP)
         wan_main.add_field(
@@ -414,6 +409,23 @@ class WanHandler(BaseConfigHandler):
             hint=_("Colon is used as a separator, for example 00:11:22:33:44:55"),
         ).requires("custom_mac", True)
 
+        return wan_form
+
+    def get_form(self):
+        # both settings and status are required
+        self.load_backend_queries()
+        data = WanHandler._convert_backend_data_to_form_data(self.backend_data)
+
+        if self.data:
+            # Update from post
+            data.update(self.data)
+
+        wan_form = self.bind_form(
+            data,
+            self.hide_no_wan,
+            field_attrs={"ip6duid": {"placeholder": self.status_data["last_seen_duid"]}},
+        )
+
         def wan_form_cb(data):
             backend_data = WanHandler._convert_form_data_to_backend_data(data)
             res = current_state.backend.perform("wan", "update_settings", backend_data)
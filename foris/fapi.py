@@ -23,6 +23,9 @@ from bottle import MultiDict
 
 from foris.form import Input, InputWithArgs, Dropdown, Form, Checkbox, websafe, Hidden, Radio
 from foris import validators as validators_module
+from foris.state import current_state
+from foris.utils.caches import LRUExpiringCache
+from foris.utils.translators import translations
 
 
 logger = logging.getLogger(__name__)
@@ -66,11 +69,18 @@ class ForisFormElement(object):
     def _add(self, child):
         self.children[child.name] = child
         child.parent = self
+        self._structure_changed()
         return child
 
     def _remove(self, child):
         del self.children[child.name]
         child.parent = None
+        self._structure_changed()
+
+    def _structure_changed(self):
+        """ Called when fields or requirements of the form are altered
+        """
+        self._main_form._structure_changed()
 
     @property
     def sections(self):
@@ -110,6 +120,9 @@ class ForisForm(ForisFormElement):
             self._request_data = data or {}
         self.defaults = {}  # default values from field definitions
         self.__data_cache = None  # cached data
+        self.__active_cache = None  # fields which meet their requirements in cached data
+        self.__fields_cache = {}  # element -> fields within the element
+        self.__field_index = None  # name -> fields
         self.__form_cache = None
         self.validated = False
         self.requirement_map = defaultdict(list)  # mapping: requirement -> list of required_by
@@ -147,23 +160,62 @@ class ForisForm(ForisFormElement):
         return data
 
     def clean_data(self, data):
-        new_data = {}
-        fields = self._get_all_fields()
-        for field in fields:
-            new_data[field.name] = data[field.name]
-            if field.name in data:
-                if issubclass(field.type, Checkbox):
-                    # coerce checkbox values to boolean
-                    new_data[field.name] = (
-                        False if data[field.name] == "0" else bool(data[field.name])
-                    )
-        # get names of active fields according to new_data
-        active_field_names = [x.name for x in self.get_active_fields(data=new_data)]
-        # get new dict of data of active fields
-        return {k: v for k, v in new_data.items() if k in active_field_names}
+        new_data = self._field_values(data)
+        # get new dict of data of active fields (according to new_data)
+        return self._filter_active(new_data, self._active_in(new_data))
+
+    @staticmethod
+    def _coerce(field, value):
+        if issubclass(field.type, Checkbox):
+            # coerce checkbox values to boolean
+            return False if value == "0" else bool(value)
+        return value
+
+    def _field_values(self, data):
+        return {
+            field.name: self._coerce(field, data[field.name]) for field in self._get_all_fields()
+        }
+
+    def _active_in(self, data):
+        """ Returns set of fields which meet their requirements in data
+        """
+        return {field for field in self._get_all_fields() if field.has_requirements(data)}
+
+    def _filter_active(self, values, active):
+        active_names = {field.name for field in active}
+        return {k: v for k, v in values.items() if k in active_names}
 
     def invalidate_data(self):
         self.__data_cache = None
+        self.__active_cache = None
+
+    def _structure_changed(self):
+        self.__fields_cache = {}
+        self.__field_index = None
+        self.__active_cache = None
+
+    def visibility_diff(self, rendered_fields):
+        """ Compares the active fields with the fields which are displayed by the client
+
+        :param rendered_fields: names of the fields displayed by the client
+        :type rendered_fields: iterable
+        :returns: (names of fields which should be removed,
+                   [(field which should be inserted, name of the preceding active field or None)])
+        :rtype: tuple
+        """
+        rendered_fields = list(dict.fromkeys(rendered_fields))
+        index = self._field_index()
+        active = self.get_active_fields()
+        active_names = {field.name for field in active}
+        removed = [e for e in rendered_fields if e in index and e not in active_names]
+
+        inserted = []
+        previous = None
+        for field in active:
+            if field.name not in rendered_fields:
+                inserted.append((field, previous))
+            previous = field.name
+        return removed, inserted
 
     @property
     def _form(self):
@@ -181,16 +233,33 @@ class ForisForm(ForisFormElement):
     def valid(self):
         return self._form.valid
 
-    def _get_all_fields(self, element=None, fields=None):
-        element = element or self
-        fields = fields or []
+    @staticmethod
+    def _collect_fields(element, fields):
         for c in element.children.values():
             if c.children:
-                fields = self._get_all_fields(c, fields)
+                ForisForm._collect_fields(c, fields)
             if isinstance(c, Field):
                 fields.append(c)
         return fields
 
+    def _get_all_fields(self, element=None):
+        """ Returns fields within the element (the list is cached and should not be altered)
+        """
+        element = element or self
+        fields = self.__fields_cache.get(element)
+        if fields is None:
+            fields = self.__fields_cache[element] = self._collect_fields(element, [])
+        return fields
+
+    def _field_index(self):
+        """ Returns name -> fields mapping of all fields of the form
+        """
+        if self.__field_index is None:
+            self.__field_index = defaultdict(list)
+            for field in self._get_all_fields():
+                self.__field_index[field.name].append(field)
+        return self.__field_index
+
     def get_active_fields(self, element=None, data=None):
         """Get all fields that meet their requirements.
 
@@ -199,9 +268,16 @@ class ForisForm(ForisFormElement):
         :return: list of fields
         """
         fields = self._get_all_fields(element)
-        if fields:
-            data = data or self.data
-        return [field for field in fields if field.has_requirements(data)]
+        if not fields:
+            return []
+        if data:
+            return [field for field in fields if field.has_requirements(data)]
+
+        # requirements are evaluated only once for the cached data
+        data = self.data
+        if self.__active_cache is None:
+            self.__active_cache = self._active_in(data)
+        return [field for field in fields if field in self.__active_cache]
 
     def add_section(self, *args, **kwargs):
         """
@@ -273,6 +349,66 @@ class ForisForm(ForisFormElement):
                 raise NotImplementedError("Unsupported callback operation: %s" % operation)
 
 
+class FormSchema(object):
+    """ Compiled definition of a form (sections, fields, their validators and requirements)
+
+    The definition doesn't depend on the data of the request, so it is created only once
+    and it is bound to the data of each request (see bind()). The bound forms share
+    the definitions of the fields, only their state (data, rendered inputs) is separate.
+    """
+
+    def __init__(self, form):
+        """
+        :param form: form defined without any data
+        :type form: ForisForm
+        """
+        self.form = form
+        for field in form._get_all_fields():
+            field._generate_html_data()
+
+    def bind(self, data=None, field_attrs=None):
+        """ Creates a form with data of the request
+
+        :param data: data from request
+        :param field_attrs: field name -> attributes of the input which differ per request
+                            (e.g. {"ip6duid": {"placeholder": "..."}})
+        :type field_attrs: dict
+        :rtype: ForisForm
+        """
+        form = ForisForm(self.form.name, data, validators=self.form.validators)
+        form.defaults = dict(self.form.defaults)
+        form.requirement_map = defaultdict(
+            list, {k: list(v) for k, v in self.form.requirement_map.items()}
+        )
+        for child in self.form.children.values():
+            form._add(child._bind(form, field_attrs or {}))
+        return form
+
+
+# schemas of unused forms (or of outdated catalogs) are dropped
+FORM_SCHEMA_TTL = 3600
+
+_schemas = LRUExpiringCache("form_schemas", 128)
+
+
+def get_form_schema(key, define):
+    """ Returns compiled form schema, the form is defined only once per key and language
+
+    :param key: identifies the definition (e.g. handler class and its options)
+    :type key: hashable
+    :param define: returns the form defined without any data
+    :type define: callable
+    :rtype: FormSchema
+    """
+    key = (key, current_state.language, translations.generation)
+    schema = _schemas.get(key)
+    if schema is None:
+        schema = FormSchema(define())
+        _schemas.set(key, schema, FORM_SCHEMA_TTL)
+        logger.debug("Form schema %s compiled.", key)
+    return schema
+
+
 class Section(ForisFormElement):
     def __init__(self, main_form, name, title, description=None):
         super(Section, self).__init__(name)
@@ -309,6 +445,15 @@ class Section(ForisFormElement):
             return self._add(args[0])
         return self._add(Section(self._main_form, *args, **kwargs))
 
+    def _bind(self, main_form, field_attrs):
+        section = copy.copy(self)
+        section._main_form = main_form
+        section.parent = None
+        section.children = OrderedDict()
+        for child in self.children.values():
+            section._add(child._bind(main_form, field_attrs))
+        return section
+
     def render(self):
         content = "\n".join(
             c.render() for c in self.children.values() if c.has_requirements(self._main_form.data)
@@ -377,6 +522,16 @@ class Field(ForisFormElement):
         self._main_form.defaults.setdefault(name, default)
         # cache for rendered field - remove after finishing TODO #2793
         self.__field_cache = None
+        self._html_data = None  # depends only on the validators
+
+    def _bind(self, main_form, field_attrs):
+        field = copy.copy(self)
+        field._main_form = main_form
+        field.parent = None
+        field.__field_cache = None
+        if self.name in field_attrs:
+            field._kwargs = dict(self._kwargs, **field_attrs[self.name])
+        return field
 
     def __str__(self):
         return self.render()
@@ -388,7 +543,9 @@ class Field(ForisFormElement):
         return classes
 
     def _generate_html_data(self):
-        return validators_module.validators_as_data_dict(self.validators)
+        if self._html_data is None:
+            self._html_data = validators_module.validators_as_data_dict(self.validators)
+        return self._html_data
 
     @property
     def field(self):
@@ -477,7 +634,10 @@ class Field(ForisFormElement):
         :return: self
         """
         self._main_form.requirement_map[field].append(self.name)
+        # not altered in place - the requirements can be shared with a form schema
+        self.requirements = dict(self.requirements)
         self.requirements[field] = value
+        self._structure_changed()
         return self
 
     def has_requirements(self, data):
@@ -15,20 +15,47 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import bottle
+import logging
 
+from foris.backend import query_key
+from foris.guide import Guide
 from foris.state import current_state
-from foris.utils.caches import per_request
+from foris.utils.caches import per_request, ExpiringCache
+
+
+logger = logging.getLogger("foris.middleware.backend_data")
 
 
 class BackendData(object):
     """ Reads data from the backend and stores it properly.
-        This is performed everytime when a request arrives.
+        This is performed when a request arrives and the cached data are missing or expired,
+        the state of the request is set from the cached data otherwise.
 
         There can be a few running instances of foris apps (e.g config, ...).
         When one changes the other should reflect the change immediatelly.
-        Therefor it is necessary to update it so frequent.
+        Therefore the cached data are dropped when a notification which affects
+        them is received from the message bus.
     """
 
+    CACHE_KEY = ("web", "get_data", None)
+
+    # (module, action) of notifications which alter the data returned by web.get_data
+    INVALIDATING_NOTIFICATIONS = {
+        ("web", "set_language"),
+        ("web", "update_guide"),
+        ("web", "reset_guide"),
+        ("maintain", "reboot_required"),
+        ("maintain", "reboot"),
+        ("router_notifications", "create"),
+        ("router_notifications", "mark_as_displayed"),
+        ("password", "set"),
+        ("updater", "run"),
+    }
+    # guide steps are passed by the actions of these modules (e.g. update_settings)
+    # and the updater state changes when it finishes, so any of their notifications
+    # except the read-only ones alters the data
+    INVALIDATING_MODULES = {"password", "wan", "networks", "time", "dns", "updater", "lan"}
+
     def set_language(self, language):
         """ Sets the language internallly inside the running instance of foris
 
@@ -39,26 +66,28 @@ class BackendData(object):
         # Update info variable
         current_state.update_lang(language)
 
-        # update bottle app as well
-        bottle.app().lang = language
+        # update bottle app as well (shared by all requests, used only by plugins)
+        if bottle.app().lang != language:
+            bottle.app().lang = language
 
-    def __init__(self, app):
+    def __init__(self, app, ttl=0):
+        """
+        :param app: wrapped wsgi app
+        :param ttl: how long (in seconds) can be the data reused (0 = always query the backend)
+        :type ttl: int
+        """
         self.app = app
+        self.cache = ExpiringCache("web_data", ttl)
 
-    def __call__(self, environ, start_response):
-
-        # clear per request data cache
-        per_request.backend_data.clear()
-
-        try:
-            data = current_state.backend.perform("web", "get_data")
-            per_request.backend_data["web", "get_data", None] = data
-        except Exception:
-            # Exceptions raised here are not correctly processed in flup
-            # so we don't propagate the excetion (it will fail later)
-            # use best effort here and if e.g. backend is not running it will fail later
-            return self.app(environ, start_response)
+    def handle_notification(self, msg):
+        module, action = msg["module"], msg["action"]
+        if (module, action) in self.INVALIDATING_NOTIFICATIONS or (
+            module in self.INVALIDATING_MODULES and query_key(module, action) is None
+        ):
+            logger.debug("Notification %s.%s received.", msg["module"], msg["action"])
+            self.cache.invalidate(self.CACHE_KEY)
 
+    def update_state(self, data, guide):
         # update language
         self.set_language(data["language"])
 
@@ -80,7 +109,39 @@ class BackendData(object):
         # update device
         current_state.set_device(data["device"])
 
-        # initialize guide
-        current_state.update_guide(data["guide"])
+        # set guide
+        current_state.set_guide(guide)
+
+    def __call__(self, environ, start_response):
+
+        # clear per request data cache
+        per_request.reset()
+
+        cached = self.cache.get(self.CACHE_KEY)
+        if cached is None:
+            # data obtained while an invalidating notification arrives are not stored
+            generation = self.cache.generation
+            try:
+                data = current_state.backend.perform("web", "get_data")
+            except Exception:
+                # Exceptions raised here are not correctly processed in flup
+                # so we don't propagate the excetion (it will fail later)
+                # use best effort here and if e.g. backend is not running it will fail later
+                return self.app(environ, start_response)
+
+            # guide object is shared by all requests which use the same data
+            cached = data, Guide(data["guide"])
+            self.cache.set(self.CACHE_KEY, cached, generation)
+
+        data, guide = cached
+        self.update_state(data, guide)
+        backend_data = per_request.backend_data
+        backend_data[self.CACHE_KEY] = data
 
-        return self.app(environ, start_response)
+        try:
+            return self.app(environ, start_response)
+        finally:
+            if backend_data.modified:
+                # an action performed within the request could alter the data
+                # (e.g. a guide step was passed)
+                self.cache.invalidate(self.CACHE_KEY)
@@ -0,0 +1,239 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import zlib
+
+logger = logging.getLogger("foris.middleware.compression")
+
+# content types which are worth to compress
+COMPRESSIBLE_TYPES = (
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+
+# encoding -> wbits of zlib compressor (preferred encoding first)
+ENCODINGS = (("gzip", 16 + zlib.MAX_WBITS), ("deflate", zlib.MAX_WBITS))
+
+
+def select_encoding(accept_encoding, encodings=ENCODINGS):
+    """ Selects the best supported encoding from the Accept-Encoding header
+
+    :param accept_encoding: content of the Accept-Encoding header
+    :type accept_encoding: str
+    :param encodings: supported encodings ((encoding, value) pairs, preferred first)
+    :type encodings: tuple
+    :returns: (encoding, value) or None if no encoding is acceptable
+    """
+    qualities = {}
+    for item in accept_encoding.split(","):
+        parts = [e.strip() for e in item.split(";")]
+        quality = 1.0
+        for param in parts[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        qualities[parts[0].lower()] = quality
+
+    best = None
+    for encoding, value in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[0]):
+            best = quality, encoding, value
+    return best[1:] if best else None
+
+
+class CompressionMiddleware(object):
+    """ Compresses responses (gzip or deflate) according to Accept-Encoding of the request
+
+    The body is compressed incrementally as it is produced by the wrapped app.
+    Only the first few chunks are held back to find out whether the body
+    is large enough to be compressed.
+
+    Responses which are already encoded, partial or transferred in byte ranges
+    (static files which are served precompressed) are passed unchanged.
+
+    Note that Cache-Control: no-transform is not taken into account - it is
+    meant for the proxies and this middleware is a part of the origin server.
+    """
+
+    def __init__(self, app, level=6, threshold=1024, content_types=COMPRESSIBLE_TYPES):
+        """
+        :param app: wrapped wsgi app
+        :param level: compression level (1-9, 0 = compression is disabled)
+        :type level: int
+        :param threshold: smaller bodies are not compressed (in bytes)
+        :type threshold: int
+        :param content_types: content types which should be compressed
+        :type content_types: tuple
+        """
+        self.app = app
+        self.level = level
+        self.threshold = threshold
+        self.content_types = tuple(content_types)
+
+    def _compressible(self, status, headers):
+        if not status.startswith("200"):
+            return False
+        names = {k.lower(): v for k, v in headers}
+        if "content-encoding" in names or "content-range" in names:
+            return False
+        if names.get("accept-ranges", "none").lower() != "none":
+            # byte ranges would refer to the compressed body
+            return False
+        content_type = names.get("content-type", "").split(";")[0].strip().lower()
+        if content_type not in self.content_types:
+            return False
+        try:
+            if int(names.get("content-length", self.threshold)) < self.threshold:
+                return False
+        except ValueError:
+            pass
+        return True
+
+    @staticmethod
+    def _compressed_headers(headers, encoding):
+        result = []
+        vary = None
+        for name, value in headers:
+            lower = name.lower()
+            if lower == "content-length":
+                continue
+            elif lower == "vary":
+                vary = value
+                continue
+            elif lower == "etag" and value.endswith('"'):
+                # representation differs so the strong etag has to differ too
+                value = '%s-%s"' % (value[:-1], encoding)
+            result.append((name, value))
+        if vary is None:
+            vary = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower() and vary.strip() != "*":
+            vary += ", Accept-Encoding"
+        result.append(("Vary", vary))
+        result.append(("Content-Encoding", encoding))
+        return result
+
+    @staticmethod
+    def _translate_etags(environ, encoding):
+        """ Adds the original etags of compressed responses to If-None-Match
+
+        So the wrapped app can recognize them.
+
+        :returns: etags which were sent by the client
+        :rtype: list
+        """
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if not if_none_match:
+            return []
+        suffix = '-%s"' % encoding
+        etags = [e.strip() for e in if_none_match.split(",")]
+        originals = [e[: -len(suffix)] + '"' for e in etags if e.endswith(suffix)]
+        if originals:
+            environ["HTTP_IF_NONE_MATCH"] = ", ".join(etags + originals)
+        return etags
+
+    @staticmethod
+    def _not_modified_headers(headers, encoding, requested_etags):
+        # client should keep the etag of the compressed response
+        result = []
+        for name, value in headers:
+            if name.lower() == "etag" and value.endswith('"'):
+                compressed = '%s-%s"' % (value[:-1], encoding)
+                if compressed in requested_etags:
+                    value = compressed
+            result.append((name, value))
+        return result
+
+    def __call__(self, environ, start_response):
+        if self.level <= 0 or environ.get("REQUEST_METHOD") == "HEAD":
+            return self.app(environ, start_response)
+        selected = select_encoding(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        if not selected:
+            return self.app(environ, start_response)
+
+        encoding = selected[0]
+        requested_etags = self._translate_etags(environ, encoding)
+
+        # start_response is postponed until it is decided whether the body is compressed
+        response = {}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            if status.startswith("304") and requested_etags:
+                headers = self._not_modified_headers(headers, encoding, requested_etags)
+            if exc_info or not self._compressible(status, headers):
+                response.clear()
+                response["started"] = True
+                return start_response(status, headers, exc_info)
+            response.update(status=status, headers=headers)
+
+            def write(data):
+                # legacy write() - the body can't be compressed
+                response["started"] = True
+                start_response(status, headers)(data)
+
+            return write
+
+        result = self.app(environ, compressing_start_response)
+        if "status" not in response:
+            return result
+        return self._compress(result, response, start_response, *selected)
+
+    def _compress(self, result, response, start_response, encoding, wbits):
+        try:
+            iterator = iter(result)
+            chunks, size = [], 0
+            for chunk in iterator:
+                if response.get("started"):
+                    # write() was called in the meantime
+                    yield from chunks
+                    chunks = []
+                    yield chunk
+                    continue
+                if chunk:
+                    chunks.append(chunk)
+                    size += len(chunk)
+                if size >= self.threshold:
+                    break
+            else:
+                # the whole body is buffered
+                if not response.get("started"):
+                    start_response(response["status"], response["headers"])
+                yield from chunks
+                return
+
+            start_response(
+                response["status"], self._compressed_headers(response["headers"], encoding)
+            )
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, wbits)
+            data = b"".join(compressor.compress(e) for e in chunks)
+            if data:
+                yield data
+            for chunk in iterator:
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            if hasattr(result, "close"):
+                result.close()
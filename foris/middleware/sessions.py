@@ -14,21 +14,29 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import logging
+import threading
 
 from datetime import datetime
 
-from foris.ubus.sessions import UbusSession, SessionNotFound
+from foris.sessions import ANONYMOUS, SessionNotFound
 
 logger = logging.getLogger("middleware.sessions")
 
 
 class SessionProxy(object):
-    def __init__(self, env_key, timeout):
+    def __init__(self, env_key, timeout, store):
         self.cookie_set_needed = False
         self.cookie_unset_needed = False
         self.env_key = env_key
         self.timeout = timeout
+        self.store = store
+
+    def _open_session(self, session_id=None):
+        if session_id:
+            return self.store.obtain(session_id, self.timeout)
+        return self.store.create(self.timeout)
 
     @property
     def session_id(self):
@@ -40,7 +48,7 @@ class SessionProxy(object):
 
     @property
     def is_anonymous(self):
-        return self.session_id == UbusSession.ANONYMOUS
+        return self.session_id == ANONYMOUS
 
     def set_cookie(self):
         self.cookie_set_needed = True
@@ -82,9 +90,9 @@ class SessionProxy(object):
 
 
 class SessionWsProxy(SessionProxy):
-    def __init__(self, env_key, timeout, session_id=None):
-        super(SessionWsProxy, self).__init__(env_key, timeout)
-        self._session = UbusSession(self.timeout, session_id)
+    def __init__(self, env_key, timeout, store, session_id=None):
+        super(SessionWsProxy, self).__init__(env_key, timeout, store)
+        self._session = self._open_session(session_id)
 
         if session_id is None:
             # grant listen for the new session
@@ -101,15 +109,44 @@ class SessionWsProxy(SessionProxy):
 class SessionForisProxy(SessionProxy):
     DONT_STORE_IN_ANONYMOUS = ["user_authenticated"]
 
-    def __init__(self, env_key, timeout, session_id):
-        super(SessionForisProxy, self).__init__(env_key, timeout)
-        self._session = UbusSession(self.timeout, session_id)
+    def __init__(
+        self, env_key, timeout, store, session_id, ws_key="foris.ws.session", ws_session_id=None
+    ):
+        super(SessionForisProxy, self).__init__(env_key, timeout, store)
+        self._session = self._open_session(session_id)
         self.tainted = False
         if self.is_anonymous:
             self._session.filtered_keys = list(SessionForisProxy.DONT_STORE_IN_ANONYMOUS)
-        self.ws_session = None
+        self.ws_key = ws_key
+        self.ws_session_id = ws_session_id
+        # ws session is loaded only when it is required (see ws_session)
+        self._ws_session = None
+        self.ws_session_loaded = False
         logger.debug("session '%s' loaded" % self.session_id)
 
+    @property
+    def ws_session(self):
+        """ Websocket session of the authenticated user (None for anonymous session)
+
+        It is obtained (or created) when it is accessed for the first time.
+        """
+        if not self.ws_session_loaded:
+            self.ws_session_loaded = True
+            if not self.is_anonymous:
+                try:
+                    self._ws_session = SessionWsProxy(
+                        self.ws_key, self.timeout, self.store, self.ws_session_id
+                    )
+                except SessionNotFound:
+                    self._ws_session = SessionWsProxy(self.ws_key, self.timeout, self.store)
+        return self._ws_session
+
+    def _existing_ws_session(self):
+        # the ws session should not be created only to be destroyed
+        if self.ws_session_loaded or self.ws_session_id:
+            return self.ws_session
+        return None
+
     def __len__(self):
         return self._session.__len__()
 
@@ -142,16 +179,19 @@ class SessionForisProxy(SessionProxy):
         self._session.destroy()
         self.tainted = False
         logger.debug("session '%s' destroyed" % self.session_id)
-        if self.ws_session:
-            self.ws_session.destroy()
+        ws_session = self._existing_ws_session()
+        if ws_session and not ws_session.destroyed:
+            ws_session.destroy()
 
     def recreate(self):
         if not self.is_anonymous:
             self.unload()
-            self.ws_session.unload()
+            ws_session = self._existing_ws_session()
+            if ws_session:
+                ws_session.unload()
             self.destroy()
 
-        self._session = UbusSession(self.timeout)
+        self._session = self._open_session()
         logger.debug("session '%s' created" % self.session_id)
         self._session.filtered_keys = []
         self.load()
@@ -162,9 +202,10 @@ class SessionForisProxy(SessionProxy):
 
         self.destroy()
         self.unload()
-        self._session = UbusSession(self.timeout, session_id=UbusSession.ANONYMOUS)
+        self._session = self._open_session(ANONYMOUS)
         self._session.filtered_keys = list(SessionForisProxy.DONT_STORE_IN_ANONYMOUS)
-        self.ws_session = None
+        self._ws_session = None
+        self.ws_session_loaded = True
 
 
 class SessionMiddleware(object):
@@ -173,39 +214,60 @@ class SessionMiddleware(object):
         filtered = [e.strip() for e in cookies.split(";") if e.strip().startswith("%s=" % name)]
         return filtered[0][len(name) + 1 :] if filtered else None
 
-    def __init__(self, wrap_app, timeout, env_key="foris.session", ws_key="foris.ws.session"):
+    def __init__(
+        self, wrap_app, timeout, store, env_key="foris.session", ws_key="foris.ws.session"
+    ):
+        """
+        :param store: where the sessions are stored
+        :type store: foris.sessions.SessionStore
+        """
         self.timeout = timeout
         self.env_key = env_key
         self.ws_key = ws_key
+        self.store = store
         self.wrap_app = self.app = wrap_app
+        # how many times was the ws session loaded / not needed for an authenticated user
+        # and how many session store calls were saved by not loading it
+        self.ws_session_stats = collections.Counter()
+        self._stats_lock = threading.Lock()
+
+    def _update_ws_session_stats(self, session, ws_session_key):
+        with self._stats_lock:
+            if session.ws_session_loaded:
+                self.ws_session_stats["loaded"] += 1
+            else:
+                self.ws_session_stats["skipped"] += 1
+                # obtain (1 call) or create + grant (2 calls)
+                self.ws_session_stats["saved_calls"] += 1 if ws_session_key else 2
+            stats = dict(self.ws_session_stats)
+        logger.debug("ws session stats: %s" % stats)
 
     def __call__(self, environ, start_response):
         cookies = environ.get("HTTP_COOKIE", "")
         session_key = self._get_cookie(self.env_key, cookies)
-        session_key = session_key if session_key else UbusSession.ANONYMOUS
+        session_key = session_key if session_key else ANONYMOUS
         ws_session_key = self._get_cookie(self.ws_key, cookies)
 
         try:
-            session = SessionForisProxy(self.env_key, self.timeout, session_key)
+            session = SessionForisProxy(
+                self.env_key, self.timeout, self.store, session_key, self.ws_key, ws_session_key
+            )
         except SessionNotFound:
-            session = SessionForisProxy(self.env_key, self.timeout, UbusSession.ANONYMOUS)
-
-        if not session.is_anonymous:
-            try:
-                ws_session = SessionWsProxy(self.ws_key, self.timeout, ws_session_key)
-            except SessionNotFound:
-                ws_session = SessionWsProxy(self.ws_key, self.timeout)
-        else:
-            ws_session = None
-
-        session.ws_session = ws_session
+            session = SessionForisProxy(
+                self.env_key, self.timeout, self.store, ANONYMOUS, self.ws_key, ws_session_key
+            )
+        authenticated = not session.is_anonymous
 
         environ["foris.session"] = session
         environ["foris.session.id"] = session.session_id
         environ["foris.session.data"] = session._session._data
 
         def session_start_response(status, headers, exc_info=None):
-            # update ws session cookies
+            if authenticated:
+                self._update_ws_session_stats(session, ws_session_key)
+
+            # update ws session cookies (only when it was loaded)
+            ws_session = session._ws_session
             if ws_session and ws_session.cookie_set_needed:
                 headers.append(("Set-cookie", ws_session.set_cookie_text))
             elif ws_session and ws_session.cookie_unset_needed:
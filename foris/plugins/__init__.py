@@ -5,16 +5,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-import gettext
 import inspect
 import importlib
 import logging
 import os
 import pkgutil
-import pkg_resources
 
 import bottle
 
+from foris.utils.entry_points import registry as entry_points
 from foris.utils.translators import translations
 
 
@@ -44,12 +43,10 @@ class ForisPlugin(object):
         This approach has one design flaw - messages in the plugin apply to
         the whole app. This is not an issue now, but it should be examined
         later and replaced by a better solution.
+
+        Catalogs of the plugin are loaded together with the catalog of the language.
         """
-        for lang, default_translation in translations.items():
-            local_translation = gettext.translation(
-                "messages", os.path.join(self.DIRNAME, "locale"), languages=[lang], fallback=True
-            )
-            default_translation.add_fallback(local_translation)
+        translations.add_fallback_dir(os.path.join(self.DIRNAME, "locale"))
 
 
 class ForisPluginLoader(object):
@@ -69,10 +66,7 @@ class ForisPluginLoader(object):
         for _, mod_name, _ in pkgutil.iter_modules(modules.__path__):
             plugin_module_name = "foris_plugins.%s" % mod_name
             # try to determine version
-            try:
-                version = pkg_resources.get_distribution("foris_%s_plugin" % mod_name).version
-            except pkg_resources.DistributionNotFound:
-                version = "?"
+            version = entry_points.version("foris_%s_plugin" % mod_name) or "?"
             logger.debug("Found foris plugin '%s (%s)'.", mod_name, version)
             plugin_classes += self._get_plugin_classes(plugin_module_name)
 
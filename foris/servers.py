@@ -0,0 +1,473 @@
+# Foris
+# Copyright (C) 2019 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import bottle
+import functools
+import io
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.parse
+
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.handlers import SimpleHandler
+from wsgiref.simple_server import ServerHandler, WSGIServer, WSGIRequestHandler
+
+
+logger = logging.getLogger("foris.servers")
+
+
+class PooledWSGIServer(WSGIServer):
+    """ WSGI server which processes the requests in a pool of threads
+
+    When all the threads are busy the requests are queued up to `queue_size`,
+    further requests are refused with 503 (Service Unavailable).
+    """
+
+    REFUSED_RESPONSE = (
+        b"HTTP/1.0 503 Service Unavailable\r\n"
+        b"Content-Type: text/plain\r\n"
+        b"Retry-After: 1\r\n"
+        b"Content-Length: 19\r\n"
+        b"\r\n"
+        b"Service Unavailable"
+    )
+
+    def __init__(self, *args, threads=4, queue_size=64, **kwargs):
+        self.threads = threads
+        self.queue_size = queue_size
+        self.request_queue_size = max(queue_size, self.request_queue_size)  # listen() backlog
+        self._slots = threading.BoundedSemaphore(threads + queue_size)
+        self._executor = None
+        super(PooledWSGIServer, self).__init__(*args, **kwargs)
+
+    @property
+    def executor(self):
+        # created lazily, threads would not survive the fork of a prefork worker
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.threads, thread_name_prefix="foris-request"
+            )
+        return self._executor
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            logger.warning("Request queue is full, refusing request from %s.", client_address)
+            try:
+                request.sendall(self.REFUSED_RESPONSE)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+
+        self.executor.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def stop(self):
+        """ Stops accepting new requests, the requests in progress are finished
+
+        Can be called from a signal handler of the thread running serve_forever().
+        """
+        threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def server_close(self):
+        super(PooledWSGIServer, self).server_close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+class SendfileServerHandler(ServerHandler):
+    """ Server handler which transfers files (wsgi.file_wrapper) via sendfile
+    """
+
+    def sendfile(self):
+        filelike = self.result.filelike
+        fileobj = getattr(filelike, "file", filelike)  # FileRange
+        try:
+            fileobj.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return False
+        offset = getattr(filelike, "offset", None)
+        count = getattr(filelike, "length", None)
+        if offset is None:
+            offset = fileobj.tell()
+
+        if not self.headers_sent:
+            self.send_headers()
+        self._flush()
+        self.bytes_sent += self.request_handler.connection.sendfile(fileobj, offset, count)
+        return True
+
+
+class RequestHandler(WSGIRequestHandler):
+    def handle(self):
+        """ Handles a single HTTP request (same as WSGIRequestHandler.handle, but sendfile is used)
+        """
+        self.raw_requestline = self.rfile.readline(65537)
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ""
+            self.request_version = ""
+            self.command = ""
+            self.send_error(414)
+            return
+
+        if not self.parse_request():
+            return
+
+        handler = SendfileServerHandler(
+            self.rfile, self.wfile, self.get_stderr(), self.get_environ(), multithread=True
+        )
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+
+class QuietRequestHandler(RequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class ThreadedServer(bottle.ServerAdapter):
+    """ Multi-threaded server
+
+    Options:
+        threads - number of threads which handle the requests
+        queue_size - number of requests which can wait for a free thread
+    """
+
+    def make_server(self, handler):
+        server = PooledWSGIServer(
+            (self.host, self.port),
+            RequestHandler if not self.quiet else QuietRequestHandler,
+            threads=self.options.get("threads", 4),
+            queue_size=self.options.get("queue_size", 64),
+        )
+        server.set_app(handler)
+        return server
+
+    def run(self, handler):
+        server = self.make_server(handler)
+        signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+        logger.debug("Starting threaded server with %d threads.", server.threads)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+
+class PreforkServer(ThreadedServer):
+    """ Server with several pre-forked worker processes each having a pool of threads
+
+    The listening socket is opened in the master process and shared by the workers.
+    SIGHUP gracefully replaces the workers (the old ones finish the requests in progress)
+    and SIGTERM/SIGINT gracefully stops the server.
+
+    Options (apart from the ones of ThreadedServer):
+        workers - number of worker processes
+        after_fork - callable which is called in each worker after it is forked
+    """
+
+    CHECK_INTERVAL = 1.0  # in s
+
+    def run(self, handler):
+        server = self.make_server(handler)
+        self.workers = {}  # pid -> generation
+        self.generation = 0
+        self.stopping = False
+        self.reloading = False
+
+        def stop(signum, frame):
+            self.stopping = True
+
+        def reload(signum, frame):
+            self.reloading = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGHUP, reload)
+
+        logger.debug(
+            "Starting prefork server with %d workers (%d threads each).",
+            self.options.get("workers", 2),
+            server.threads,
+        )
+        try:
+            while not self.stopping:
+                if self.reloading:
+                    self.reloading = False
+                    self._reload()
+                self._reap_workers()
+                self._spawn_workers(server)
+                time.sleep(self.CHECK_INTERVAL)
+        finally:
+            self._stop_workers(self.workers)
+            server.socket.close()
+
+    def _spawn_workers(self, server):
+        current = [pid for pid, gen in self.workers.items() if gen == self.generation]
+        for _ in range(self.options.get("workers", 2) - len(current)):
+            pid = os.fork()
+            if pid == 0:
+                self._run_worker(server)  # never returns
+            logger.debug("Worker %d started.", pid)
+            self.workers[pid] = self.generation
+
+    def _run_worker(self, server):
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGTERM, lambda signum, frame: server.stop())
+            signal.signal(signal.SIGINT, signal.SIG_IGN)  # master decides what to do
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            after_fork = self.options.get("after_fork")
+            if after_fork:
+                after_fork()
+            server.serve_forever()
+            server.server_close()
+        except Exception:
+            logger.exception("Worker %d failed.", os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def _reap_workers(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.workers.pop(pid, None) == self.generation:
+                logger.warning("Worker %d exited unexpectedly (status %d).", pid, status)
+
+    def _reload(self):
+        logger.debug("Reloading workers.")
+        old_workers = {pid: gen for pid, gen in self.workers.items()}
+        self.generation += 1
+        for pid in old_workers:
+            self._kill(pid, signal.SIGTERM)
+
+    def _stop_workers(self, workers):
+        for pid in list(workers):
+            self._kill(pid, signal.SIGTERM)
+        for pid in list(workers):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            workers.pop(pid, None)
+
+    @staticmethod
+    def _kill(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+class AsyncioServer(bottle.ServerAdapter):
+    """ Server based on asyncio event loop
+
+    Connections are accepted, requests are read and responses are sent in the event loop,
+    the (blocking) wsgi app is called in a pool of threads. So a slow client doesn't
+    occupy a thread and a slow backend action blocks only the thread of its request.
+    Coroutines running in the loop can use current_state.async_backend.
+
+    Each connection serves a single request (HTTP/1.0). SIGTERM/SIGINT gracefully stops
+    the server (the requests in progress are finished).
+
+    Options:
+        threads - number of threads which handle the requests
+        queue_size - number of requests which can wait for a free thread
+    """
+
+    REQUEST_TIMEOUT = 30  # in s (reading of the request)
+    MAX_HEADER_SIZE = 65536
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncioServer, self).__init__(*args, **kwargs)
+        self.threads = self.options.get("threads", 4)
+        self.queue_size = self.options.get("queue_size", 64)
+        self.server = None
+
+    def run(self, handler):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="foris-request")
+        logger.debug("Starting asyncio server with %d threads.", self.threads)
+        try:
+            loop.run_until_complete(self.serve(handler, executor))
+        finally:
+            executor.shutdown(wait=True)
+            loop.close()
+
+    async def serve(self, app, executor):
+        """ Serves the requests until SIGTERM or SIGINT is received
+        """
+        loop = asyncio.get_running_loop()
+        self._requests = set()
+        self.stopped = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self.stopped.set)
+
+        server = await asyncio.start_server(
+            functools.partial(self.handle_connection, app, executor),
+            self.host,
+            self.port,
+            limit=self.MAX_HEADER_SIZE,
+        )
+        self.server = server
+        try:
+            await self.stopped.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            if self._requests:
+                await asyncio.wait(self._requests)
+
+    async def handle_connection(self, app, executor, reader, writer):
+        task = asyncio.current_task()
+        self._requests.add(task)
+        try:
+            if len(self._requests) > self.threads + self.queue_size:
+                logger.warning("Request queue is full, refusing request.")
+                writer.write(PooledWSGIServer.REFUSED_RESPONSE)
+                await writer.drain()
+                return
+
+            try:
+                environ = await asyncio.wait_for(
+                    self.read_request(reader, writer), self.REQUEST_TIMEOUT
+                )
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                return
+            except ValueError as e:
+                writer.write(b"HTTP/1.0 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+                logger.debug("Bad request: %s", e)
+                await writer.drain()
+                return
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                executor, self.call_app, app, environ, AsyncioStreamWriter(writer, loop)
+            )
+        except ConnectionError:
+            pass  # client disconnected
+        finally:
+            writer.close()
+            self._requests.discard(task)
+
+    async def read_request(self, reader, writer):
+        """ Reads the request and creates its wsgi environ (wsgi.* keys are added later)
+        """
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("iso-8859-1")
+        request_line, *lines = head.split("\r\n")
+        try:
+            method, target, version = request_line.split(" ")
+        except ValueError:
+            raise ValueError("wrong request line %r" % request_line)
+
+        headers = {}
+        for line in lines:
+            if not line:
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise ValueError("wrong header %r" % line)
+            key = name.strip().upper().replace("-", "_")
+            value = value.strip()
+            headers[key] = "%s,%s" % (headers[key], value) if key in headers else value
+
+        if "chunked" in headers.get("TRANSFER_ENCODING", "").lower():
+            raise ValueError("chunked requests are not supported")
+        body = b""
+        if headers.get("CONTENT_LENGTH"):
+            body = await reader.readexactly(int(headers["CONTENT_LENGTH"]))
+
+        path, _, query = target.partition("?")
+        sockname = writer.get_extra_info("sockname") or ("", self.port)
+        peername = writer.get_extra_info("peername") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": urllib.parse.unquote(path, "iso-8859-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": str(sockname[0]),
+            "SERVER_PORT": str(sockname[1]),
+            "SERVER_PROTOCOL": version,
+            "REMOTE_ADDR": str(peername[0]),
+            "CONTENT_TYPE": headers.pop("CONTENT_TYPE", ""),
+            "CONTENT_LENGTH": headers.pop("CONTENT_LENGTH", ""),
+            "wsgi.input": io.BytesIO(body),
+        }
+        environ.update(("HTTP_%s" % k, v) for k, v in headers.items())
+        return environ
+
+    def call_app(self, app, environ, stdout):
+        """ Calls the wsgi app (in a thread of the pool)
+        """
+        handler = AsyncioRequestHandler(
+            environ["wsgi.input"], stdout, sys.stderr, environ, multithread=True
+        )
+        handler.run(app)
+        if not self.quiet:
+            logger.info(
+                '%s "%s %s" %s',
+                environ["REMOTE_ADDR"],
+                environ["REQUEST_METHOD"],
+                environ["PATH_INFO"],
+                handler.final_status,
+            )
+
+
+class AsyncioRequestHandler(SimpleHandler):
+    server_software = "foris"
+
+    def close(self):
+        self.final_status = self.status  # dropped by close()
+        super(AsyncioRequestHandler, self).close()
+
+
+class AsyncioStreamWriter(object):
+    """ File-like object which writes to an asyncio stream from a thread
+    """
+
+    def __init__(self, writer, loop):
+        self.writer = writer
+        self.loop = loop
+
+    async def _write(self, data):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    def write(self, data):
+        # waits until the data are passed to the transport (flow control)
+        asyncio.run_coroutine_threadsafe(self._write(bytes(data)), self.loop).result()
+        return len(data)
+
+    def flush(self):
+        pass
@@ -0,0 +1,281 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import copy
+import logging
+import secrets
+
+from json import JSONEncoder
+
+logger = logging.getLogger("foris.sessions")
+
+# id of the session which is shared by all unauthenticated users (it never expires)
+ANONYMOUS = "00000000000000000000000000000000"
+
+
+class SessionNotFound(Exception):
+    pass
+
+
+class SessionFailedToCreate(Exception):
+    pass
+
+
+class SessionDestroyed(Exception):
+    pass
+
+
+class SessionReadOnly(Exception):
+    pass
+
+
+def not_destroyed(func):
+    def wrapped(self, *args, **kwargs):
+        if self.destroyed:
+            raise SessionDestroyed()
+        return func(self, *args, **kwargs)
+
+    return wrapped
+
+
+def not_readonly(func):
+    def wrapped(self, *args, **kwargs):
+        if self.readonly:
+            raise SessionReadOnly()
+        return func(self, *args, **kwargs)
+
+    return wrapped
+
+
+def generate_session_id():
+    """ Generates a new session id (same format as the ids of ubus sessions)
+    """
+    return secrets.token_hex(16)
+
+
+def merge_data(stored, data, keys=None):
+    """ Returns stored session data updated by the keys of data (see SessionStore.write)
+    """
+    if keys is None:
+        return copy.deepcopy(data)
+    merged = dict(stored)
+    for key in keys:
+        if key in data:
+            merged[key] = copy.deepcopy(data[key])
+        else:
+            merged.pop(key, None)
+    return merged
+
+
+class BaseSession(object):
+    """ Dict-like session
+
+    Subclasses should set `session_id`, `_data` and `expires_in`
+    and implement `save()` and `destroy()`.
+    """
+
+    ANONYMOUS = ANONYMOUS
+
+    def __init__(self):
+        self.destroyed = False
+        self.readonly = False
+        self.filtered_keys = []
+
+    def _filtered_data(self):
+        return {k: v for k, v in self._data.items() if k not in self.filtered_keys}
+
+    def save(self):
+        raise NotImplementedError()
+
+    def destroy(self):
+        raise NotImplementedError()
+
+    @not_readonly
+    @not_destroyed
+    def grant(self, obj, function, scope="ubus"):
+        """ Grants a permission to the session (only sessions stored in ubus can hold them)
+
+        The permission is not stored by the other stores, so e.g. the websocket server
+        which checks the ubus session won't allow the session to listen.
+        """
+        logger.debug("Session '%s' can't be granted '%s'.'%s'" % (self.session_id, obj, function))
+
+    # make session iterable
+    @not_destroyed
+    def __getitem__(self, key):
+        return self._data.get(key, None)
+
+    @not_readonly
+    @not_destroyed
+    def __delitem__(self, key):
+        self._data.pop(key, None)
+
+    @not_destroyed
+    def __iter__(self):
+        for key in self._data:
+            yield key
+
+    @not_destroyed
+    def __contains__(self, key):
+        return key in self._data
+
+    @not_readonly
+    @not_destroyed
+    def __setitem__(self, key, value):
+        if not isinstance(key, str):
+            raise TypeError("key is not a string")
+        # test whether the key is ascii (exception will be raised otherwise)
+        key.encode("ascii")
+        # test whenter the value is json-serializable (exception otherwise)
+        JSONEncoder().encode(value)
+        self._data[key] = value
+
+    @not_destroyed
+    def __len__(self):
+        return len(self._data)
+
+    @not_destroyed
+    def get(self, *args, **kwargs):
+        return self._data.get(*args, **kwargs)
+
+
+class StoredSession(BaseSession):
+    """ Session which is kept in a local session store
+    """
+
+    def __init__(self, store, session_id, data, expires_in):
+        super(StoredSession, self).__init__()
+        self.store = store
+        self.session_id = session_id
+        self._data = data
+        self.expires_in = expires_in
+        # only the modified keys are written, so concurrent requests don't overwrite each other
+        self._modified_keys = set()
+
+    def __setitem__(self, key, value):
+        super(StoredSession, self).__setitem__(key, value)
+        self._modified_keys.add(key)
+
+    def __delitem__(self, key):
+        super(StoredSession, self).__delitem__(key)
+        self._modified_keys.add(key)
+
+    @not_readonly
+    @not_destroyed
+    def save(self):
+        filtered_data = self._filtered_data()
+        keys = self._modified_keys.difference(self.filtered_keys)
+        if not self.store.write(self.session_id, filtered_data, keys):
+            logger.debug("Failed to store session data.")
+            return False
+        self._modified_keys.clear()
+        logger.debug("foris session '%s' stored: %s" % (self.session_id, filtered_data))
+        return True
+
+    @not_readonly
+    @not_destroyed
+    def destroy(self):
+        self.store.remove(self.session_id)
+        logger.debug("foris session destroyed: %s" % self._data)
+        self.destroyed = True
+
+
+class SessionStore(object):
+    """ Base class of session stores
+
+    Stores which keep the sessions locally should implement `read()`, `write()`,
+    `remove()` and `new()`.
+    """
+
+    def create(self, timeout):
+        """ Creates a new session
+
+        :param timeout: session timeout (in seconds)
+        :type timeout: int
+        :rtype: BaseSession
+        """
+        session_id = self.new(timeout)
+        logger.debug("Session '%s' created." % session_id)
+        return StoredSession(self, session_id, {}, timeout)
+
+    def obtain(self, session_id, timeout):
+        """ Obtains an existing session and renews its timeout
+
+        :param session_id: session id
+        :type session_id: str
+        :param timeout: session timeout (in seconds)
+        :type timeout: int
+        :raises SessionNotFound: when the session doesn't exist or is expired
+        :rtype: BaseSession
+        """
+        data, expires = self.read(session_id)
+        logger.debug("session '%s' obtained: %s" % (session_id, data))
+        return StoredSession(self, session_id, data, expires)
+
+    def new(self, timeout):
+        """ Stores a new empty session and returns its id
+        """
+        raise NotImplementedError()
+
+    def read(self, session_id):
+        """ Renews the session and returns (data, expires)
+
+        Returned data should not be shared with the store.
+
+        :raises SessionNotFound: when the session doesn't exist or is expired
+        """
+        raise NotImplementedError()
+
+    def write(self, session_id, data, keys=None):
+        """ Stores the data of an existing session
+
+        :param keys: only these keys are updated (or removed when they are missing in data)
+                     the whole data are replaced when keys is None
+        :type keys: set
+        :returns: False when the session doesn't exist anymore True otherwise
+        """
+        raise NotImplementedError()
+
+    def remove(self, session_id):
+        raise NotImplementedError()
+
+
+def get_session_store(name, **kwargs):
+    """ Creates session store of the given type
+
+    Only the "ubus" store can hold permissions granted to the sessions (see BaseSession.grant),
+    the websocket server requires them.
+
+    :param name: "ubus", "memory" or "file"
+    :type name: str
+    :param kwargs: arguments passed to the store
+    :rtype: SessionStore
+    """
+    # ubus is imported only when it is required
+    if name == "ubus":
+        from foris.ubus.sessions import UbusSessionStore
+
+        return UbusSessionStore(**kwargs)
+    elif name == "memory":
+        from .memory import MemorySessionStore
+
+        return MemorySessionStore(**kwargs)
+    elif name == "file":
+        from .file import FileSessionStore
+
+        return FileSessionStore(**kwargs)
+
+    raise ValueError("Unknown session store '%s'" % name)
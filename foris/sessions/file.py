@@ -0,0 +1,148 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+
+from . import ANONYMOUS, SessionStore, SessionNotFound, generate_session_id, merge_data
+
+logger = logging.getLogger("foris.sessions.file")
+
+
+class FileSessionStore(SessionStore):
+    """ Keeps every session in a separate file within a directory
+
+    Files are replaced atomically so the store can be shared between processes
+    and it survives restarts of foris. Updates are serialized by a lock file.
+    The session expires when its timeout passes since the last modification
+    of the file (it is touched when the session is obtained).
+    """
+
+    SESSION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+    PURGE_INTERVAL = 60  # in s
+
+    def __init__(self, path="/tmp/.foris_workdir/sessions"):
+        """
+        :param path: directory where the sessions are stored
+        :type path: str
+        """
+        self.path = path
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        self._last_purge = 0
+
+    def _session_path(self, session_id):
+        # session id comes from a cookie so it has to be checked
+        if not self.SESSION_ID_RE.match(session_id):
+            raise SessionNotFound()
+        return os.path.join(self.path, session_id)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with open(os.path.join(self.path, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _store(self, path, record):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _expired(record, mtime, now):
+        return record["timeout"] and mtime + record["timeout"] <= now
+
+    def _purge(self, now):
+        self._last_purge = now
+        for entry in os.scandir(self.path):
+            if not self.SESSION_ID_RE.match(entry.name):
+                continue
+            try:
+                with open(entry.path) as f:
+                    record = json.load(f)
+                if self._expired(record, entry.stat().st_mtime, now):
+                    os.unlink(entry.path)
+                    logger.debug("Expired session '%s' removed." % entry.name)
+            except (OSError, ValueError):
+                pass  # removed or being replaced by another process
+
+    def new(self, timeout):
+        session_id = generate_session_id()
+        self._store(self._session_path(session_id), {"timeout": timeout, "data": {}})
+
+        now = time.time()
+        if self._last_purge + self.PURGE_INTERVAL <= now:
+            self._purge(now)
+
+        return session_id
+
+    def read(self, session_id):
+        path = self._session_path(session_id)
+        now = time.time()
+        try:
+            with open(path) as f:
+                record = json.load(f)
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            if session_id != ANONYMOUS:
+                raise SessionNotFound()
+            record = {"timeout": 0, "data": {}}
+            self._store(path, record)
+            return record["data"], record["timeout"]
+        except (OSError, ValueError):
+            logger.warning("Failed to read session '%s'." % session_id)
+            raise SessionNotFound()
+
+        if self._expired(record, mtime, now):
+            self.remove(session_id)
+            raise SessionNotFound()
+
+        if record["timeout"]:
+            # renew the session
+            os.utime(path, (now, now))
+
+        return record["data"], record["timeout"]
+
+    def write(self, session_id, data, keys=None):
+        path = self._session_path(session_id)
+        with self._locked():
+            try:
+                with open(path) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                return False
+            record["data"] = merge_data(record["data"], data, keys)
+            self._store(path, record)
+        return True
+
+    def remove(self, session_id):
+        try:
+            os.unlink(self._session_path(session_id))
+        except FileNotFoundError:
+            pass
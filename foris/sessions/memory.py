@@ -0,0 +1,89 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import copy
+import logging
+import threading
+import time
+
+from . import ANONYMOUS, SessionStore, SessionNotFound, generate_session_id, merge_data
+
+logger = logging.getLogger("foris.sessions.memory")
+
+
+class MemorySessionStore(SessionStore):
+    """ Keeps the sessions in the memory of the process
+
+    Expired sessions are evicted and when there are too many sessions
+    the least recently used ones are dropped.
+
+    Note that the sessions are lost on restart and can't be shared between processes.
+    """
+
+    def __init__(self, max_sessions=1024):
+        """
+        :param max_sessions: maximal number of stored sessions
+        :type max_sessions: int
+        """
+        self.max_sessions = max_sessions
+        self._records = collections.OrderedDict()  # id -> [data, timeout, expires_at]
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        expired = [k for k, v in self._records.items() if v[2] is not None and v[2] <= now]
+        for session_id in expired:
+            del self._records[session_id]
+
+        while len(self._records) > self.max_sessions:
+            session_id, _ = self._records.popitem(last=False)
+            logger.debug("Session '%s' evicted." % session_id)
+
+    def new(self, timeout):
+        session_id = generate_session_id()
+        now = time.monotonic()
+        with self._lock:
+            self._records[session_id] = [{}, timeout, now + timeout]
+            self._evict(now)
+        return session_id
+
+    def read(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is None and session_id == ANONYMOUS:
+                record = self._records[session_id] = [{}, 0, None]
+            if record is None:
+                raise SessionNotFound()
+            if record[2] is not None:
+                if record[2] <= now:
+                    del self._records[session_id]
+                    raise SessionNotFound()
+                record[2] = now + record[1]
+            self._records.move_to_end(session_id)
+            return copy.deepcopy(record[0]), record[1]
+
+    def write(self, session_id, data, keys=None):
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is None:
+                return False
+            record[0] = merge_data(record[0], data, keys)
+        return True
+
+    def remove(self, session_id):
+        with self._lock:
+            self._records.pop(session_id, None)
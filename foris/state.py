@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import contextvars
 import logging
 
 from foris import __version__ as version
@@ -23,12 +24,42 @@ from foris.langs import DEFAULT_LANGUAGE
 logger = logging.getLogger("foris.state")
 
 
+class RequestLocal(object):
+    """ Attribute which is stored in the context of the request being processed
+    (works for both threads and asyncio tasks), so the concurrent requests
+    don't affect each other
+    """
+
+    def __init__(self, default=None):
+        self.default = default
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.var = contextvars.ContextVar("%s.%s" % (owner.__name__, name), default=self.default)
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return self.var.get()
+
+    def __set__(self, instance, value):
+        self.var.set(value)
+
+
 class ForisState(object):
+    # data obtained from the backend for the current request
+    language = RequestLocal(DEFAULT_LANGUAGE)
+    reboot_required = RequestLocal(False)
+    notification_count = RequestLocal(0)
+    updater_is_running = RequestLocal(False)
+    password_set = RequestLocal(False)
+    turris_os_version = RequestLocal()
+    device = RequestLocal()
+    guide = RequestLocal()
+
     def __init__(self):
         self.foris_version = version
-        self.language = DEFAULT_LANGUAGE
         self.app = None
-        self.reboot_required = False
         self.assets_path = None
         self.sentry_running = False
 
@@ -41,6 +72,8 @@ class ForisState(object):
         self.app = app
 
     def set_backend(self, backend):
+        from foris.backend import AsyncBackend
+
         if backend.name in ["ubus", "unix-socket"]:
             logger.debug(f"setting backend to '{backend.name}' (path {backend.path}).")
         elif backend.name == "mqtt":
@@ -48,6 +81,7 @@ class ForisState(object):
                 f"setting backend to '{backend.name}' (host {backend.host}:{backend.port})."
             )
         self.backend = backend
+        self.async_backend = AsyncBackend(backend)
 
     def set_websocket(self, ws_port, ws_path, wss_port, wss_path):
         self.websockets = {
@@ -109,6 +143,13 @@ class ForisState(object):
         logger.debug(f"setting guide_data ({guide_data})")
         self.guide = Guide(guide_data)
 
+    def set_guide(self, guide):
+        """ Sets already initialized guide
+        :param guide: guide
+        :type guide: foris.guide.Guide
+        """
+        self.guide = guide
+
     def set_assets_path(self, assets_path):
         logger.debug(f"setting assets_path to '{assets_path}'")
         self.assets_path = assets_path
@@ -218,7 +218,7 @@ Foris.initWebsockets = function() {
 };
 
 Foris.initPasswordHiding = function() {
-    $(".password-toggle").click(function () {
+    $(".password-toggle").off("click").click(function () {
         var input= $(this).prev();
         if (input.attr("type") == "password") {
             input.attr("type", "text");
@@ -238,6 +238,11 @@ Foris.afterAjaxUpdate = function(response, status, xhr) {
 }
 
 Foris.updateForm = function (form) {
+  if (form.is("[data-partial-update]")) {
+    Foris.updateFormPartially(form);
+    return;
+  }
+
   var serialized = form.serializeArray();
   serialized.push({name: '_update', value: '1'});
 
@@ -264,6 +269,58 @@ Foris.updateForm = function (form) {
   form.find("input, select, button").attr("disabled", "disabled");
 };
 
+// only the fields which were shown or hidden are sent by the server
+Foris.updateFormPartially = function (form) {
+  var fieldElement = function (name) {
+    return form.find('[data-field="' + name + '"]').add(form.children('input[type=hidden][name="' + name + '"]'));
+  };
+
+  var serialized = form.serializeArray();
+  serialized.push({name: '_update', value: '1'});
+  serialized.push({name: '_partial', value: '1'});
+  form.find("[data-field]").each(function () {
+    serialized.push({name: '_fields[]', value: $(this).attr("data-field")});
+  });
+  form.children("input[type=hidden]").each(function () {
+    serialized.push({name: '_fields[]', value: this.name.replace(/\[\]$/, "")});
+  });
+
+  var enabled = form.find("input, select, button").not(":disabled");
+  $.ajax({
+    url: form.attr("action"),
+    method: "post",
+    data: serialized,
+    dataType: "json",
+  })
+      .done(function (response, status, xhr) {
+        for (let name of response.remove) {
+          fieldElement(name).remove();
+        }
+        for (let field of response.insert) {
+          var after = field.after ? fieldElement(field.after).last() : form.children('input[name=csrf_token]');
+          after.after(field.html);
+        }
+
+        Foris.initParsley(response, status, xhr);
+        Foris.initPasswordHiding(response, status, xhr);
+        Foris.afterAjaxUpdate(response, status, xhr);
+        Foris.initClicksQR(response, status, xhr);
+        $(document).trigger('formupdate', [form]);
+      })
+      .fail(function (xhr) {
+        // logged out users get 403 with a JSON response
+        var response = xhr.responseJSON;
+        if (response && response.loggedOut && response.loginUrl) {
+          window.location.replace(response.loginUrl);
+        }
+      })
+      .always(function () {
+        form.find(".fa-spinner").remove();
+        enabled.removeAttr("disabled");
+      });
+  enabled.attr("disabled", "disabled");
+};
+
 Foris.confirmDialog = function (...vexArgs) {
     vex.dialog.buttons.YES.text = Foris.messages.vexYes;
     vex.dialog.buttons.NO.text = Foris.messages.vexNo;
@@ -378,12 +435,12 @@ Foris.updateWiFiQR = function (radio, ssid, password, hidden, guest) {
 };
 
 Foris.initClicksQR = function () {
-  $(".wifi-qr img").on("click", function(e) {
+  $(".wifi-qr img").off("click").on("click", function(e) {
     e.preventDefault();
     $(this).parent().find(".wifi-qr-box").toggle("normal");
     $(this).toggle("normal");
   });
-  $(".wifi-qr-box").on("click", function(e) {
+  $(".wifi-qr-box").off("click").on("click", function(e) {
     e.preventDefault();
     $(this).parent().find("img").toggle("normal");
     $(this).toggle("normal");
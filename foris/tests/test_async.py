@@ -0,0 +1,82 @@
+# coding=utf-8
+
+import asyncio
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from foris_client.buses import unix_socket
+
+from foris.backend import AsyncBackend, Backend
+from foris.servers import AsyncioServer
+from foris.utils.caches import per_request
+
+
+class SlowSender(object):
+    def send(self, module, action, data, controller_id=None):
+        if action == "reboot":
+            time.sleep(0.5)
+        return {"action": action}
+
+
+def test_async_backend(monkeypatch):
+    monkeypatch.setattr(unix_socket, "UnixSocketSender", lambda *args, **kw: SlowSender())
+    backend = AsyncBackend(Backend("unix-socket", path="/tmp/foris-test.sock", pool_size=2))
+    finished = []
+
+    async def perform(action):
+        per_request.reset()
+        response = await backend.perform("maintain", action)
+        finished.append(action)
+        return response
+
+    async def main():
+        return await asyncio.gather(perform("reboot"), perform("get_settings"))
+
+    assert asyncio.run(main()) == [{"action": "reboot"}, {"action": "get_settings"}]
+    # the slow action doesn't block the other one
+    assert finished == ["get_settings", "reboot"]
+
+    responses = asyncio.run(backend.perform_many([("maintain", "get_settings")]))
+    assert responses == [{"action": "get_settings"}]
+
+
+def app(environ, start_response):
+    if environ["PATH_INFO"] == "/slow":
+        time.sleep(0.5)
+    body = ("%s %s" % (environ["REQUEST_METHOD"], environ["wsgi.input"].read().decode())).encode()
+    start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", str(len(body)))])
+    return [body]
+
+
+def test_asyncio_server():
+    server = AsyncioServer(host="127.0.0.1", port=0, threads=2, quiet=True)
+    finished = []
+
+    async def request(port, path, body=b""):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            b"POST %s HTTP/1.0\r\nContent-Length: %d\r\n\r\n%s" % (path.encode(), len(body), body)
+        )
+        response = await reader.read()
+        writer.close()
+        finished.append(path)
+        return response
+
+    async def main():
+        serving = asyncio.ensure_future(server.serve(app, executor))
+        while not server.server:
+            await asyncio.sleep(0.01)
+        port = server.server.sockets[0].getsockname()[1]
+        try:
+            return await asyncio.gather(request(port, "/slow"), request(port, "/fast", b"x"))
+        finally:
+            server.stopped.set()
+            await serving
+
+    executor = ThreadPoolExecutor(2)
+    slow, fast = asyncio.run(main())
+    executor.shutdown()
+    assert slow.startswith(b"HTTP/1.0 200 OK\r\n") and slow.endswith(b"\r\n\r\nPOST ")
+    assert fast.endswith(b"\r\n\r\nPOST x")
+    assert finished == ["/fast", "/slow"]
@@ -0,0 +1,93 @@
+# coding=utf-8
+
+from foris_client.buses import unix_socket
+
+from foris.backend import Backend
+from foris.middleware.backend_data import BackendData
+from foris.state import current_state
+
+
+class WebSender(object):
+    """ Passes the guide step when the settings of the current step are updated """
+
+    def __init__(self):
+        self.passed = []
+        self.updater_running = False
+
+    def send(self, module, action, data, controller_id=None):
+        if (module, action) == ("web", "get_data"):
+            steps = ["password", "profile", "networks", "finished"]
+            return {
+                "language": "en",
+                "reboot_required": False,
+                "notification_count": 0,
+                "updater_running": self.updater_running,
+                "password_ready": True,
+                "turris_os_version": "5.0.0",
+                "device": "omnia",
+                "guide": {
+                    "enabled": True,
+                    "workflow": "router",
+                    "passed": list(self.passed),
+                    "workflow_steps": steps,
+                    "next_step": steps[len(self.passed)],
+                },
+            }
+        if action == "update_settings":
+            self.passed.append(module)
+        return {"result": True}
+
+
+def make_app(monkeypatch):
+    sender = WebSender()
+    monkeypatch.setattr(unix_socket, "UnixSocketSender", lambda *args, **kw: sender)
+    backend = Backend("unix-socket", path="/tmp/foris-test.sock")
+    monkeypatch.setattr(current_state, "backend", backend, raising=False)
+    monkeypatch.setattr(BackendData, "set_language", lambda self, language: None)
+
+    def app(environ, start_response):
+        for call in environ.get("calls", []):
+            current_state.backend.perform(*call)
+        return [current_state.guide.current]
+
+    middleware = BackendData(app, ttl=60)
+    backend.add_notification_handler(middleware.handle_notification)
+    return middleware, sender
+
+
+def test_guide_step_passed(monkeypatch):
+    app, sender = make_app(monkeypatch)
+    assert app({}, None) == ["password"]
+
+    # the step is passed within a request
+    assert app({"calls": [("password", "update_settings", {})]}, None) == ["password"]
+    assert app({}, None) == ["profile"]
+
+    # a module which is not listed in INVALIDATING_MODULES
+    app({"calls": [("web", "update_settings", {})]}, None)
+    assert app({}, None) == ["networks"]
+
+
+def test_updater_finished(monkeypatch):
+    app, sender = make_app(monkeypatch)
+    app({}, None)
+    assert current_state.updater_is_running is False
+
+    sender.updater_running = True
+    app.handle_notification({"module": "updater", "action": "run", "kind": "notification"})
+    app({}, None)
+    assert current_state.updater_is_running is True
+
+    # updater finished (notification from the message bus)
+    sender.updater_running = False
+    app.handle_notification(
+        {"module": "updater", "action": "run", "kind": "notification", "data": {"status": "exit"}}
+    )
+    app({}, None)
+    assert current_state.updater_is_running is False
+
+    # read-only actions don't drop the data
+    sender.updater_running = True
+    app.handle_notification({"module": "lan", "action": "get_settings", "kind": "notification"})
+    app({}, None)
+    assert current_state.updater_is_running is False
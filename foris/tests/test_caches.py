@@ -0,0 +1,113 @@
+# coding=utf-8
+
+from foris_client.buses import unix_socket
+
+from foris.backend import Backend
+from foris.utils.caches import ExpiringCache, LRUExpiringCache, per_request
+
+
+def test_lru_expiring_cache():
+    cache = LRUExpiringCache("test", 2)
+    cache.set("a", 1, 60)
+    cache.set("b", 2, 60)
+    cache.set("ignored", 3, 0)
+    assert cache.get("a") == 1
+    cache.set("c", 3, 60)
+    assert cache.get("b") is None  # least recently used
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    cache.invalidate(lambda key: key == "a")
+    assert cache.get("a") is None and len(cache) == 1
+
+
+def test_expiring_cache_generation():
+    cache = ExpiringCache("test", 60)
+    generation = cache.generation
+    cache.invalidate("a")  # e.g. a notification arrived while the value was obtained
+    assert not cache.set("a", 1, generation)
+    assert cache.get("a") is None
+    assert cache.set("a", 1, cache.generation)
+    assert cache.get("a") == 1
+
+
+class FakeSender(object):
+    def __init__(self):
+        self.calls = []
+        self.value = 1
+
+    def send(self, module, action, data, controller_id=None):
+        self.calls.append((module, action))
+        return {"value": self.value}
+
+
+def make_backend(monkeypatch, **kwargs):
+    sender = FakeSender()
+    monkeypatch.setattr(unix_socket, "UnixSocketSender", lambda *args, **kw: sender)
+    return Backend("unix-socket", path="/tmp/foris-test.sock", **kwargs), sender
+
+
+def test_response_cache(monkeypatch):
+    backend, sender = make_backend(monkeypatch, cache_ttl=60, cache_ttls={"time": 0})
+
+    per_request.reset()
+    assert backend.perform("dns", "get_settings") == {"value": 1}
+    per_request.reset()
+    response = backend.perform("dns", "get_settings")
+    response["value"] = 5  # cached data are not altered
+    per_request.reset()
+    assert backend.perform("dns", "get_settings") == {"value": 1}
+    assert sender.calls == [("dns", "get_settings")]
+
+    # not cached module
+    backend.perform("time", "get_settings")
+    per_request.reset()
+    backend.perform("time", "get_settings")
+    assert sender.calls.count(("time", "get_settings")) == 2
+
+
+def test_response_cache_invalidation(monkeypatch):
+    backend, sender = make_backend(monkeypatch, cache_ttl=60)
+
+    per_request.reset()
+    backend.perform("dns", "get_settings")
+    backend.perform("lan", "get_settings")
+    sender.value = 2
+    backend.perform("dns", "update_settings", {"forwarding_enabled": False})
+    assert per_request.backend_data.modified
+
+    per_request.reset()
+    assert backend.perform("dns", "get_settings") == {"value": 2}
+    assert backend.perform("lan", "get_settings") == {"value": 1}
+
+    # notification from the message bus
+    backend.notify({"module": "lan", "action": "update_settings", "kind": "notification"})
+    per_request.reset()
+    assert backend.perform("lan", "get_settings") == {"value": 2}
+
+
+def test_response_cache_allowlist(monkeypatch):
+    backend, sender = make_backend(monkeypatch, cache_ttl=60)
+
+    # not listed in CACHEABLE_QUERIES -> reused only within the request
+    per_request.reset()
+    backend.perform("remote", "get_token")
+    backend.perform("remote", "get_token")
+    per_request.reset()
+    backend.perform("remote", "get_token")
+    assert sender.calls.count(("remote", "get_token")) == 2
+
+
+def test_response_cache_dependent_modules(monkeypatch):
+    backend, sender = make_backend(monkeypatch, cache_ttl=60)
+
+    per_request.reset()
+    backend.perform("lan", "get_settings")
+    backend.perform("wifi", "get_settings")
+    backend.perform("dns", "get_settings")
+    sender.value = 2
+    backend.notify({"module": "networks", "action": "update_settings", "kind": "notification"})
+
+    per_request.reset()
+    assert backend.perform("lan", "get_settings") == {"value": 2}
+    assert backend.perform("wifi", "get_settings") == {"value": 2}
+    assert backend.perform("dns", "get_settings") == {"value": 1}
@@ -0,0 +1,41 @@
+# coding=utf-8
+
+from foris.utils import collation
+from foris.utils.collation import cached_localized_sorted, localized_sorted
+
+
+def test_czech_alphabet():
+    words = ["Chorvatsko", "Itálie", "Česko", "Hongkong", "Cypr", "chata", "hrad", "Ázerbájdžán"]
+    assert localized_sorted(words, "cs") == [
+        "Ázerbájdžán",
+        "Cypr",
+        "Česko",
+        "Hongkong",
+        "Chorvatsko",
+        "Itálie",
+        "hrad",
+        "chata",
+    ]
+    assert localized_sorted(["ch", "h", "i"], "cs") == ["h", "ch", "i"]
+    assert localized_sorted(["b", "a"], "en") == ["a", "b"]
+    assert localized_sorted([("x", "Ch"), ("y", "D")], "cs", key=lambda x: x[1], reverse=True) == [
+        ("x", "Ch"),
+        ("y", "D"),
+    ]
+
+
+def test_cached_localized_sorted(monkeypatch):
+    calls = []
+
+    def build():
+        calls.append(1)
+        return ["b", "a"]
+
+    assert cached_localized_sorted("test", "cs", build) == ["a", "b"]
+    assert cached_localized_sorted("test", "cs", build) == ["a", "b"]
+    assert len(calls) == 1
+
+    # catalog changed
+    monkeypatch.setattr(collation.translations, "generation", -1)
+    cached_localized_sorted("test", "cs", build)
+    assert len(calls) == 2
@@ -0,0 +1,110 @@
+# coding=utf-8
+
+import gzip
+import zlib
+
+from foris.middleware.compression import CompressionMiddleware, select_encoding
+
+BODY = b"<html>" + b"x" * 4096 + b"</html>"
+
+
+def make_app(body, headers=None, chunks=1):
+    def app(environ, start_response):
+        start_response("200 OK", headers or [("Content-Type", "text/html; charset=UTF-8")])
+        size = len(body) // chunks + 1
+        return [body[i : i + size] for i in range(0, len(body), size)]
+
+    return app
+
+
+def call(app, accept_encoding="gzip, deflate", **extra):
+    environ = {"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": accept_encoding}
+    environ.update(extra)
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = status
+        response["headers"] = dict(headers)
+
+    body = b"".join(app(environ, start_response))
+    return response["status"], response["headers"], body
+
+
+def test_select_encoding():
+    assert select_encoding("") is None
+    assert select_encoding("br") is None
+    assert select_encoding("gzip;q=0, deflate") == ("deflate", zlib.MAX_WBITS)
+    assert select_encoding("deflate;q=0.5, gzip")[0] == "gzip"
+    assert select_encoding("*")[0] == "gzip"
+
+    variants = (("br", ".br"), ("gzip", ".gz"))
+    assert select_encoding("gzip;q=0, br;q=0", variants) is None
+    assert select_encoding("gzip, br", variants) == ("br", ".br")
+    assert select_encoding("gzip, br;q=0.5", variants) == ("gzip", ".gz")
+
+
+def test_gzip_chunked():
+    app = CompressionMiddleware(make_app(BODY, chunks=8), threshold=1024)
+    status, headers, body = call(app)
+    assert status == "200 OK"
+    assert headers["Content-Encoding"] == "gzip"
+    assert headers["Vary"] == "Accept-Encoding"
+    assert "Content-Length" not in headers
+    assert gzip.decompress(body) == BODY
+
+
+def test_no_transform():
+    headers = [("Content-Type", "text/html"), ("Cache-Control", "no-store, no-transform")]
+    _, headers, body = call(CompressionMiddleware(make_app(BODY, headers)))
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(body) == BODY
+
+
+def test_deflate():
+    app = CompressionMiddleware(make_app(BODY))
+    _, headers, body = call(app, "deflate")
+    assert headers["Content-Encoding"] == "deflate"
+    assert zlib.decompress(body) == BODY
+
+
+def test_skipped():
+    # small body
+    _, headers, body = call(CompressionMiddleware(make_app(b"<p>small</p>")))
+    assert "Content-Encoding" not in headers
+    assert body == b"<p>small</p>"
+
+    # not accepted
+    _, headers, body = call(CompressionMiddleware(make_app(BODY)), "identity")
+    assert "Content-Encoding" not in headers
+    assert body == BODY
+
+    # disabled
+    _, headers, body = call(CompressionMiddleware(make_app(BODY), level=0))
+    assert "Content-Encoding" not in headers
+
+    # already compressed
+    compressed = gzip.compress(BODY)
+    app = make_app(compressed, [("Content-Type", "text/html"), ("Content-Encoding", "gzip")])
+    _, headers, body = call(CompressionMiddleware(app))
+    assert body == compressed
+
+    # not compressible
+    app = make_app(BODY, [("Content-Type", "image/png")])
+    _, headers, body = call(CompressionMiddleware(app))
+    assert "Content-Encoding" not in headers
+
+
+def test_etag():
+    headers = [("Content-Type", "text/html"), ("ETag", '"abc"')]
+    _, headers, _ = call(CompressionMiddleware(make_app(BODY, headers)))
+    assert headers["ETag"] == '"abc-gzip"'
+
+    def app(environ, start_response):
+        if '"abc"' in environ["HTTP_IF_NONE_MATCH"]:
+            start_response("304 Not Modified", [("ETag", '"abc"')])
+            return [b""]
+        return make_app(BODY, headers)(environ, start_response)
+
+    status, headers, _ = call(CompressionMiddleware(app), HTTP_IF_NONE_MATCH='"abc-gzip"')
+    assert status == "304 Not Modified"
+    assert headers["ETag"] == '"abc-gzip"'
@@ -0,0 +1,30 @@
+# coding=utf-8
+
+import bottle
+
+from foris.utils import dynamic_assets
+
+
+def test_inputs_hash_covers_included_templates(tmpdir, monkeypatch):
+    tmpdir.join("javascript", "x.js.j2").write(
+        '{% include "_a.j2" %}{% import "_b.j2" as b %}', ensure=True
+    )
+    tmpdir.join("_a.j2").write('{% extends "_c.j2" %}')
+    tmpdir.join("_b.j2").write("b")
+    tmpdir.join("_c.j2").write("c")
+    monkeypatch.setattr(bottle, "TEMPLATE_PATH", [str(tmpdir)])
+
+    sources = [path for path, _ in dynamic_assets._template_sources("javascript/x.js.j2")]
+    assert sources == sorted(
+        str(tmpdir.join(e)) for e in ("javascript/x.js.j2", "_a.j2", "_b.j2", "_c.j2")
+    )
+
+    original = dynamic_assets._inputs_hash("javascript/x.js", "en", "")
+    assert dynamic_assets._inputs_hash("javascript/x.js", "en", "/foris") != original
+    tmpdir.join("_c.j2").write("changed")
+    assert dynamic_assets._inputs_hash("javascript/x.js", "en", "") != original
+
+
+def test_script_dir():
+    assert dynamic_assets.script_dir("") == dynamic_assets.script_dir("")
+    assert dynamic_assets.script_dir("") != dynamic_assets.script_dir("/foris")
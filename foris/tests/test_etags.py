@@ -0,0 +1,65 @@
+# coding=utf-8
+
+import bottle
+
+from foris.utils import etags
+from foris.utils.caches import per_request
+
+
+class Page(object):
+    slug = "page"
+    cacheable = True
+
+
+class RemotePage(object):
+    """ Page which displays per-process state (e.g. token links) """
+
+    slug = "remote"
+    cacheable = False
+
+
+class Session(dict):
+    ws_session_id = "ws"
+    ws_session = None
+    ws_session_loaded = False
+
+
+def request(session, if_none_match=None):
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": "/", "foris.session": session}
+    if if_none_match:
+        environ["HTTP_IF_NONE_MATCH"] = if_none_match
+    bottle.request.bind(environ)
+    bottle.response.bind()
+    per_request.reset()
+
+
+def render(session, page=Page):
+    """ Renders a page which consumes the messages """
+    session_data = etags.session_snapshot()
+    session.pop("messages", None)
+    etags.update(page, session_data)
+    return bottle.response.get_header("ETag")
+
+
+def test_consumed_messages():
+    session = Session(messages=["saved"])
+    request(session)
+    etag = render(session)
+
+    # the messages were shown, the page without them is different
+    request(session, etag)
+    assert not etags.not_modified(Page)
+    etag = render(session)
+
+    request(session, etag)
+    assert etags.not_modified(Page)
+
+
+def test_not_cacheable_page():
+    session = Session()
+    request(session)
+    assert render(session, RemotePage) is None
+
+    for etag in ['"anything"', render(session, Page)]:
+        request(session, etag)
+        assert not etags.not_modified(RemotePage)
@@ -0,0 +1,60 @@
+# coding=utf-8
+
+from foris import fapi
+from foris.form import Checkbox, Dropdown, Textbox
+
+
+def make_form(data=None):
+    form = fapi.ForisForm("test", data)
+    main = form.add_section(name="main", title="Main")
+    main.add_field(Dropdown, name="mode", args=[("a", "A"), ("b", "B")], default="a")
+    main.add_field(Checkbox, name="dhcp", default=True).requires("mode", "a")
+    main.add_field(Textbox, name="start", default="100").requires("dhcp", True)
+    main.add_field(Textbox, name="client", default="x").requires("mode", "b")
+    nested = main.add_section(name="nested", title="Nested")
+    nested.add_field(Textbox, name="limit", default="10").requires(
+        "start", lambda value: value != "0"
+    )
+    return form
+
+
+def active_names(form, element=None):
+    return [field.name for field in form.get_active_fields(element)]
+
+
+def test_active_fields():
+    form = make_form({"mode": "b"})
+    assert form.data == {"mode": "b", "client": "x", "start": "100", "limit": "10"}
+    # requirements are checked against the (already filtered) data
+    assert active_names(form) == ["mode", "client", "limit"]
+    assert active_names(form, form.sections[0].sections[0]) == ["limit"]
+    assert [e.name for e in form.get_active_fields(data={"mode": "a"})] == ["mode", "dhcp", "limit"]
+
+    # fields added later are taken into account
+    form.sections[0].add_field(Textbox, name="extra")
+    assert "extra" in active_names(form)
+
+
+def test_active_fields_cache():
+    form = make_form({"mode": "b"})
+    assert active_names(form) == ["mode", "client", "limit"]
+
+    # new requirement
+    form.sections[0].children["client"].requires("limit", "0")
+    assert active_names(form) == ["mode", "limit"]
+
+    # new data
+    form._request_data = {"mode": "a"}
+    form.invalidate_data()
+    assert active_names(form) == ["mode", "dhcp", "start", "limit"]
+
+
+def test_visibility_diff():
+    form = make_form({"mode": "b"})
+    removed, inserted = form.visibility_diff(["mode", "dhcp", "start", "csrf_token"])
+    assert removed == ["dhcp", "start"]  # unknown names are ignored
+    assert [(field.name, after) for field, after in inserted] == [
+        ("client", "mode"),
+        ("limit", "client"),
+    ]
+    assert form.visibility_diff(["mode", "client", "limit"]) == ([], [])
@@ -0,0 +1,58 @@
+# coding=utf-8
+
+from foris import fapi, validators
+from foris.config_handlers.base import BaseConfigHandler
+from foris.form import Checkbox, Textbox
+
+
+class ExampleHandler(BaseConfigHandler):
+    definitions = 0
+
+    @classmethod
+    def define_form(cls, with_hostname):
+        cls.definitions += 1
+        form = fapi.ForisForm("example")
+        section = form.add_section(name="main", title="Example")
+        section.add_field(Checkbox, name="enabled", label="Enabled", default=True)
+        section.add_field(
+            Textbox, name="ipaddr", label="IP address", validators=validators.IPv4()
+        ).requires("enabled", True)
+        if with_hostname:
+            section.add_field(Textbox, name="hostname", label="Hostname")
+        return form
+
+    def get_form(self):
+        return self.bind_form(self.data, True, field_attrs={"ipaddr": {"placeholder": "1.2.3.4"}})
+
+
+def test_form_defined_once():
+    first = ExampleHandler({"ipaddr": "10.0.0.1"}).form
+    second = ExampleHandler({"enabled": "0"}).form
+    assert ExampleHandler.definitions == 1
+    ExampleHandler(None).bind_form(None, False)
+    assert ExampleHandler.definitions == 2
+
+    # definitions of the fields are shared
+    first_field = first.sections[0].children["ipaddr"]
+    second_field = second.sections[0].children["ipaddr"]
+    assert first_field is not second_field
+    assert first_field.validators is second_field.validators
+    assert first_field._kwargs["placeholder"] == "1.2.3.4"
+
+    # the state is not
+    assert first.data == {"enabled": True, "ipaddr": "10.0.0.1", "hostname": None}
+    assert second.data == {"enabled": False, "hostname": None}
+    assert first_field._main_form is first
+
+
+def test_bound_form_can_be_extended():
+    form = ExampleHandler(None).form
+    form.add_section(name="hidden", title="").add_field(Textbox, name="extra").requires(
+        "enabled", True
+    )
+    form.sections[0].children["hostname"].requires("enabled", True)
+
+    other = ExampleHandler(None).form
+    assert [e.name for e in other.sections] == ["main"]
+    assert "hostname" not in other.requirement_map["enabled"]
+    assert other.sections[0].children["hostname"].requirements == {}
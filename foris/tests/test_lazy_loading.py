@@ -0,0 +1,94 @@
+# coding=utf-8
+
+import struct
+import sys
+
+from foris.utils.entry_points import EntryPointRegistry
+from foris.utils.startup import StartupReport
+
+
+def test_config_pages_imported_on_first_use():
+    import foris.config as config
+
+    if not config._pages_loaded:
+        assert "foris.config.pages.wan" not in sys.modules
+    assert config.get_config_page("wan").slug == "wan"
+    assert "foris.config.pages.wan" in sys.modules
+    assert config.WanConfigPage is config.config_pages["wan"]
+
+
+def make_catalog(directory, lang, messages):
+    # minimal .mo file (little endian, no hash table)
+    messages = dict({"": "Content-Type: text/plain; charset=UTF-8\n"}, **messages)
+    ids = b"".join(k.encode() + b"\0" for k in messages)
+    strs = b"".join(v.encode() + b"\0" for v in messages.values())
+    count = len(messages)
+    header_size = 28 + 16 * count
+    id_offset, str_offset = header_size, header_size + len(ids)
+    id_table, str_table = b"", b""
+    for k, v in messages.items():
+        id_table += struct.pack("<2I", len(k.encode()), id_offset)
+        str_table += struct.pack("<2I", len(v.encode()), str_offset)
+        id_offset += len(k.encode()) + 1
+        str_offset += len(v.encode()) + 1
+    header = struct.pack("<7I", 0x950412DE, 0, count, 28, 28 + 8 * count, 0, header_size)
+    path = directory / lang / "LC_MESSAGES"
+    path.mkdir(parents=True)
+    (path / "messages.mo").write_bytes(header + id_table + str_table + ids + strs)
+
+
+def test_catalogs_loaded_on_first_use(tmp_path, monkeypatch):
+    from foris.utils import translators
+
+    make_catalog(tmp_path / "foris", "cs", {"Save": "Uložit"})
+    make_catalog(tmp_path / "plugin", "cs", {"Plugin": "Zásuvný modul"})
+    monkeypatch.setattr(translators, "locale_directory", str(tmp_path / "foris"))
+
+    translations = translators.CatalogRegistry(["en", "cs"])
+    translations.add_fallback_dir(str(tmp_path / "plugin"))
+    assert list(translations) == ["en", "cs"]
+    assert not translations.memory_usage()
+    assert translations["xx"] is translations["en"]  # english is the default
+    assert list(translations.memory_usage()) == ["en"]
+    assert translations["cs"].gettext("Save") == "Uložit"
+    assert translations["cs"].gettext("Plugin") == "Zásuvný modul"
+    assert translations["cs"].gettext("Missing") == "Missing"
+
+    # least recently used catalog is dropped
+    translations.set_memory_limit(translations.memory_usage()["cs"])
+    assert list(translations.memory_usage()) == ["cs"]
+    assert "total" in translations.memory_report()
+
+
+def test_startup_report():
+    report = StartupReport()
+    with report.phase("app"):
+        pass
+    with report.lazy_load("data"):
+        pass
+    assert not report.finish(budget=1e-9)
+    with report.lazy_load("after startup"):
+        pass
+    assert [e[0] for e in report.phases] == ["app"]
+    assert [e[0] for e in report.lazy_loads] == ["data"]
+    assert "total" in report.format()
+
+
+def test_entry_points_cache(tmp_path):
+    persistent = tmp_path / "persistent"
+    persistent.mkdir()
+    fallback = tmp_path / "tmpfs" / "entry_points.json"
+
+    registry = EntryPointRegistry()
+    registry.build(str(persistent / "entry_points.json"), str(fallback))
+    assert (persistent / "entry_points.json").exists() and not fallback.exists()
+
+    # persistent directory is not writable
+    read_only = str(tmp_path / "missing" / "entry_points.json")
+    registry.build(read_only, str(fallback))
+    assert fallback.exists()
+
+    other = EntryPointRegistry()
+    other._scan = None  # loaded from the cache
+    other.build(read_only, str(fallback))
+    assert other.versions == registry.versions
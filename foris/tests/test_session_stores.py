@@ -0,0 +1,129 @@
+# coding=utf-8
+
+import os
+import pytest
+
+from foris.sessions import ANONYMOUS, SessionDestroyed, SessionNotFound
+from foris.sessions.file import FileSessionStore
+from foris.sessions.memory import MemorySessionStore
+
+TIMEOUT = 60
+
+
+@pytest.fixture(params=["memory", "file"])
+def store(request, tmpdir):
+    if request.param == "memory":
+        yield MemorySessionStore()
+    else:
+        yield FileSessionStore(str(tmpdir))
+
+
+def test_create_and_obtain(store):
+    session = store.create(TIMEOUT)
+    assert session.expires_in == TIMEOUT
+    assert len(session) == 0
+    session["test1"] = 1
+    session["test2"] = "2"
+    assert session.save()
+
+    session = store.obtain(session.session_id, TIMEOUT)
+    assert sorted([e for e in session]) == ["test1", "test2"]
+    assert session["test1"] == 1
+    assert session["test2"] == "2"
+    assert session["missing"] is None
+
+
+def test_data_not_shared(store):
+    session = store.create(TIMEOUT)
+    session["test"] = [1]
+    session.save()
+
+    session = store.obtain(session.session_id, TIMEOUT)
+    session["test"].append(2)
+
+    assert store.obtain(session.session_id, TIMEOUT)["test"] == [1]
+
+
+def test_destroy(store):
+    session = store.create(TIMEOUT)
+    session.destroy()
+    with pytest.raises(SessionDestroyed):
+        session["test"] = 1
+    with pytest.raises(SessionNotFound):
+        store.obtain(session.session_id, TIMEOUT)
+
+
+def test_anonymous(store):
+    session = store.obtain(ANONYMOUS, TIMEOUT)
+    assert session.expires_in == 0
+    session.filtered_keys = ["user_authenticated"]
+    session["user_authenticated"] = True
+    session["language"] = "cs"
+    session.save()
+
+    session = store.obtain(ANONYMOUS, TIMEOUT)
+    assert "user_authenticated" not in session
+    assert session["language"] == "cs"
+
+
+def test_not_found(store):
+    with pytest.raises(SessionNotFound):
+        store.obtain("f" * 32, TIMEOUT)
+    with pytest.raises(SessionNotFound):
+        store.obtain("../../etc/passwd", TIMEOUT)
+
+
+def test_memory_expiration():
+    store = MemorySessionStore()
+    session = store.create(TIMEOUT)
+    store._records[session.session_id][2] -= TIMEOUT
+    with pytest.raises(SessionNotFound):
+        store.obtain(session.session_id, TIMEOUT)
+    assert not session.save()
+
+
+def test_memory_lru():
+    store = MemorySessionStore(max_sessions=2)
+    first = store.create(TIMEOUT)
+    second = store.create(TIMEOUT)
+    store.obtain(first.session_id, TIMEOUT)
+    store.create(TIMEOUT)
+
+    store.obtain(first.session_id, TIMEOUT)
+    with pytest.raises(SessionNotFound):
+        store.obtain(second.session_id, TIMEOUT)
+
+
+def test_file_expiration(tmpdir):
+    store = FileSessionStore(str(tmpdir))
+    session = store.create(TIMEOUT)
+    path = os.path.join(str(tmpdir), session.session_id)
+    mtime = os.stat(path).st_mtime - TIMEOUT
+    os.utime(path, (mtime, mtime))
+    with pytest.raises(SessionNotFound):
+        store.obtain(session.session_id, TIMEOUT)
+    assert not os.path.exists(path)
+
+
+def test_file_shared(tmpdir):
+    session = FileSessionStore(str(tmpdir)).create(TIMEOUT)
+    session["test"] = 1
+    session.save()
+
+    assert FileSessionStore(str(tmpdir)).obtain(session.session_id, TIMEOUT)["test"] == 1
+
+
+def test_concurrent_updates(store):
+    session_id = store.create(TIMEOUT).session_id
+    first = store.obtain(session_id, TIMEOUT)
+    second = store.obtain(session_id, TIMEOUT)
+    first["first"] = 1
+    second["second"] = 2
+    first.save()
+    second.save()
+
+    session = store.obtain(session_id, TIMEOUT)
+    assert session["first"] == 1 and session["second"] == 2
+    del session["first"]
+    session.save()
+    assert "first" not in store.obtain(session_id, TIMEOUT)
@@ -2,7 +2,15 @@
 
 import pytest
 
-from foris.ubus.sessions import UbusSession, SessionDestroyed, SessionNotFound, SessionReadOnly
+import foris.ubus.sessions
+
+from foris.ubus.sessions import (
+    UbusSession,
+    SessionCache,
+    SessionDestroyed,
+    SessionNotFound,
+    SessionReadOnly,
+)
 
 TIMEOUT = 60
 
@@ -168,3 +176,37 @@ def test_readonly():
 
     with pytest.raises(SessionReadOnly):
         del session["key"]
+
+
+def test_cached_session(monkeypatch):
+    cache = SessionCache()
+    session = UbusSession(TIMEOUT, cache=cache)
+    session["test1"] = 1
+    session.save()
+
+    calls = []
+    orig_call = foris.ubus.sessions.call
+
+    def counting_call(*args, **kwargs):
+        calls.append(args[:2])
+        return orig_call(*args, **kwargs)
+
+    monkeypatch.setattr(foris.ubus.sessions, "call", counting_call)
+
+    # obtained from cache
+    session = UbusSession(TIMEOUT, session.session_id, cache=cache)
+    assert session["test1"] == 1
+    # data not changed -> not stored
+    session.save()
+    assert calls == []
+
+    session["test1"] = 2
+    session.save()
+    assert calls == [("session", "set")]
+
+    session = UbusSession(TIMEOUT, session.session_id, cache=cache)
+    assert session["test1"] == 2
+
+    session.destroy()
+    with pytest.raises(SessionNotFound):
+        UbusSession(TIMEOUT, session.session_id, cache=cache)
@@ -0,0 +1,35 @@
+# coding=utf-8
+
+from foris.utils import tzinfo
+from foris.utils.tzinfo import TimezoneDatabase, build_database
+
+TZ_DATA = [
+    ("America/Argentina/Salta", "AR", "Salta", "ART3"),
+    ("America/Boise", "US", "Boise", "MST7MDT,M3.2.0,M11.1.0"),
+    ("America/Argentina/Jujuy", "AR", "Jujuy", "ART3"),
+    ("Europe/Prague", "CZ", "Prague", "CET-1CEST,M3.5.0,M10.5.0/3"),
+]
+COUNTRIES = {"AR": "Argentina", "CZ": "Czechia", "US": "United States", "SK": "Slovakia"}
+
+
+def test_database():
+    database = TimezoneDatabase(build_database(TZ_DATA, COUNTRIES))
+    assert database.regions() == {"America", "Europe"}
+    assert database.countries_in_region("America") == {"AR", "US"}
+    assert database.countries_in_region("Asia") == set()
+    assert database.zones_in_region_and_country("America", "AR") == sorted(TZ_DATA[::2])
+    assert sorted(database.zones_in_region("America")) == sorted(TZ_DATA[:3])
+    assert database.find_zone("Europe/Prague") == TZ_DATA[3]
+    assert database.find_zone("Europe/Brno") is None
+    assert database.country_name("SK") == "Slovakia"
+    assert sorted(database.zones()) == sorted(TZ_DATA)
+
+
+def test_shipped_database():
+    assert "Europe" in tzinfo.regions
+    assert tzinfo.countries["CZ"]
+    assert tzinfo.get_country_for_tz("Europe/Prague") == "CZ"
+    assert tzinfo.get_zoneinfo_for_tz("Europe/Prague") == "CET-1CEST,M3.5.0,M10.5.0/3"
+    assert [e[0] for e in tzinfo.timezones_in_region_and_country("Europe", "CZ")] == [
+        "Europe/Prague"
+    ]
@@ -23,11 +23,31 @@ import json
 logger = logging.getLogger("ubus")
 
 
-if not ubus.get_connected():
-    logger.debug("Connecting to ubus.")
-    ubus.connect()
+def _ensure_connected():
+    # connect lazily so that the module can be imported even when ubus is not running
+    if not ubus.get_connected():
+        logger.debug("Connecting to ubus.")
+        ubus.connect()
+
+
+def reconnect(socket_path=None):
+    """ Creates a new connection to ubus
+
+    Should be called in forked processes, the inherited connection can't be shared.
+
+    :param socket_path: path to ubus socket (default path is used when not set)
+    :type socket_path: str
+    """
+    logger.debug("Reconnecting to ubus.")
+    if ubus.get_connected():
+        ubus.disconnect(deregister=False)
+    if socket_path:
+        ubus.connect(socket_path)
+    else:
+        ubus.connect()
 
 
 def call(obj, func, params):
     logger.debug("Calling function '%s'.'%s' with params '%s'" % (obj, func, json.dumps(params)))
+    _ensure_connected()
     return ubus.call(obj, func, params)
@@ -1,52 +1,115 @@
+import copy
 import logging
+import threading
+import time
+
+from foris.sessions import (
+    BaseSession,
+    SessionStore,
+    SessionNotFound,
+    SessionFailedToCreate,
+    SessionDestroyed,
+    SessionReadOnly,
+    not_destroyed,
+    not_readonly,
+)
 
 from . import call
-from json import JSONEncoder
 
 logger = logging.getLogger("ubus.sessions")
 
 
-class SessionNotFound(Exception):
-    pass
-
-
-class SessionFailedToCreate(Exception):
-    pass
-
-
-class SessionDestroyed(Exception):
-    pass
-
-
-class SessionReadOnly(Exception):
-    pass
-
-
-def not_destroyed(func):
-    def wrapped(self, *args, **kwargs):
-        if self.destroyed:
-            raise SessionDestroyed()
-        return func(self, *args, **kwargs)
-
-    return wrapped
-
-
-def not_readonly(func):
-    def wrapped(self, *args, **kwargs):
-        if self.readonly:
-            raise SessionReadOnly()
-        return func(self, *args, **kwargs)
-
-    return wrapped
-
-
-class UbusSession(object):
-    ANONYMOUS = "00000000000000000000000000000000"
-
+class SessionCache(object):
+    """ In-process cache of ubus sessions
+
+    Sessions are renewed in ubus (via `session list`) only when a part of their
+    timeout has passed since the last renewal, otherwise they are served from the cache.
+    The data are stored to ubus only when they differ from the data which were stored last time.
+
+    Note that the cache is not aware of changes made by other processes.
+    """
+
+    REFRESH_RATIO = 0.25  # part of the timeout after which the session is renewed in ubus
+    PURGE_INTERVAL = 60  # in s
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+
+    def get(self, session_id, timeout):
+        """ Returns cached session data or None when the session needs to be renewed in ubus
+        """
+        with self._lock:
+            record = self._records.get(session_id)
+            if not record:
+                return None
+
+            now = time.monotonic()
+            if record["expires_at"] is not None and record["expires_at"] <= now:
+                # expired in ubus
+                del self._records[session_id]
+                return None
+
+            if (
+                record["expires_at"] is not None
+                and record["refreshed_at"] + max(timeout * self.REFRESH_RATIO, 1) <= now
+            ):
+                return None  # renewal is required
+
+            return copy.deepcopy(record["data"])
+
+    def store(self, session_id, data, expires):
+        """ Stores session data obtained from ubus
+
+        :param expires: number of seconds till the session expires in ubus (0 = never)
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._records[session_id] = {
+                "data": copy.deepcopy(data),
+                "expires_at": now + expires if expires else None,
+                "refreshed_at": now,
+            }
+            if self._last_purge + self.PURGE_INTERVAL <= now:
+                self._purge(now)
+
+    def stored_data(self, session_id):
+        """ Returns the data which were stored in ubus (None if unknown)
+        """
+        with self._lock:
+            record = self._records.get(session_id)
+            return record and record["data"]
+
+    def update_data(self, session_id, data):
+        """ Updates the data after they were stored in ubus (doesn't renew the session)
+        """
+        with self._lock:
+            record = self._records.get(session_id)
+            if record:
+                record["data"] = copy.deepcopy(data)
+
+    def invalidate(self, session_id):
+        with self._lock:
+            self._records.pop(session_id, None)
+
+    def _purge(self, now):
+        self._records = {
+            k: v
+            for k, v in self._records.items()
+            if v["expires_at"] is None or v["expires_at"] > now
+        }
+        self._last_purge = now
+        logger.debug("Session cache purged (%d sessions cached)." % len(self._records))
+
+
+class UbusSession(BaseSession):
     def _load_data(self, data):
         self.session_id = data["ubus_rpc_session"]
         self._data = data["data"].get("foris", {})
         self.expires_in = data["expires"]
+        if self.cache is not None:
+            self.cache.store(self.session_id, self._data, self.expires_in)
 
     def _create(self, timeout):
         try:
@@ -57,7 +120,16 @@ class UbusSession(object):
             logger.debug("Failed to create a session.")
             raise SessionFailedToCreate()
 
-    def _obtain(self, session_id):
+    def _obtain(self, session_id, timeout):
+        if self.cache is not None:
+            data = self.cache.get(session_id, timeout)
+            if data is not None:
+                self.session_id = session_id
+                self._data = data
+                self.expires_in = timeout
+                logger.debug("session '%s' obtained from cache" % session_id)
+                return
+
         try:
             # This will renew session -> expires will be delayed
             res = call("session", "list", {"ubus_rpc_session": session_id})
@@ -65,22 +137,33 @@ class UbusSession(object):
             self._load_data(res[0])
         except RuntimeError:
             logger.debug("session '%s' not found." % session_id)
+            if self.cache is not None:
+                self.cache.invalidate(session_id)
             raise SessionNotFound()
 
-    def __init__(self, timeout, session_id=None):
+    def __init__(self, timeout, session_id=None, cache=None):
+        """
+        :param timeout: session timeout (in seconds)
+        :param session_id: id of existing session (a new session is created when not set)
+        :param cache: cache which is used to reduce the number of ubus calls
+        :type cache: SessionCache
+        """
+        super(UbusSession, self).__init__()
+        self.cache = cache
         if not session_id:
             self._create(timeout)
         else:
-            self._obtain(session_id)
-        self.destroyed = False
-        self.readonly = False
-        self.filtered_keys = []
+            self._obtain(session_id, timeout)
 
     @not_readonly
     @not_destroyed
     def save(self):
+        filtered_data = self._filtered_data()
+        if self.cache is not None and self.cache.stored_data(self.session_id) == filtered_data:
+            logger.debug("foris session '%s' not changed" % self.session_id)
+            return True
+
         try:
-            filtered_data = {k: v for k, v in self._data.items() if k not in self.filtered_keys}
             call(
                 "session",
                 "set",
@@ -89,13 +172,20 @@ class UbusSession(object):
             logger.debug("foris session '%s' stored: %s" % (self.session_id, filtered_data))
         except RuntimeError:
             logger.debug("Failed to store session data.")
+            if self.cache is not None:
+                self.cache.invalidate(self.session_id)
             return False
 
+        if self.cache is not None:
+            self.cache.update_data(self.session_id, filtered_data)
+
         return True
 
     @not_readonly
     @not_destroyed
     def destroy(self):
+        if self.cache is not None:
+            self.cache.invalidate(self.session_id)
         try:
             call("session", "destroy", {"ubus_rpc_session": self.session_id})
             logger.debug("foris session destroyed: %s" % self._data)
@@ -103,44 +193,6 @@ class UbusSession(object):
         except RuntimeError:
             logger.debug("Failed to store session data.")
 
-    # make session iterable
-    @not_destroyed
-    def __getitem__(self, key):
-        return self._data.get(key, None)
-
-    @not_readonly
-    @not_destroyed
-    def __delitem__(self, key):
-        self._data.pop(key, None)
-
-    @not_destroyed
-    def __iter__(self):
-        for key in self._data:
-            yield key
-
-    @not_destroyed
-    def __contains__(self, key):
-        return key in self._data
-
-    @not_readonly
-    @not_destroyed
-    def __setitem__(self, key, value):
-        if not isinstance(key, str):
-            raise TypeError("key is not a string")
-        # test whether the key is ascii (exception will be raised otherwise)
-        key.encode("ascii")
-        # test whenter the value is json-serializable (exception otherwise)
-        JSONEncoder().encode(value)
-        self._data[key] = value
-
-    @not_destroyed
-    def __len__(self):
-        return len(self._data)
-
-    @not_destroyed
-    def get(self, *args, **kwargs):
-        return self._data.get(*args, **kwargs)
-
     @not_readonly
     @not_destroyed
     def grant(self, obj, function, scope="ubus"):
@@ -152,3 +204,24 @@ class UbusSession(object):
         logger.debug(
             "Session '%s' (scope='%s') granted '%s'.'%s'" % (self.session_id, scope, obj, function)
         )
+
+
+class UbusSessionStore(SessionStore):
+    """ Stores the sessions in ubus (session object of rpcd)
+
+    Sessions in ubus can be granted permissions (e.g. to listen on websockets).
+    """
+
+    def __init__(self, cache=False):
+        """
+        :param cache: keep sessions in an in-process cache (should be used only when
+                      a single process is handling the requests)
+        :type cache: bool
+        """
+        self.cache = SessionCache() if cache else None
+
+    def create(self, timeout):
+        return UbusSession(timeout, cache=self.cache)
+
+    def obtain(self, session_id, timeout):
+        return UbusSession(timeout, session_id, cache=self.cache)
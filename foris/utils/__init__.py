@@ -16,6 +16,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import base64
+import contextvars
 import json
 
 import bottle
@@ -27,6 +28,7 @@ from .routing import reverse
 from . import messages
 from .translators import _
 from .caches import per_request
+from .collation import localized_sorted  # noqa: F401
 from foris.state import current_state
 
 
@@ -38,6 +40,18 @@ def is_user_authenticated():
     return session.get("user_authenticated", False)
 
 
+def ensure_ws_session():
+    """ Makes sure that the websocket session of an authenticated user exists
+
+    Websocket session is loaded lazily, so it should be called when a page
+    which connects to the websockets is rendered.
+
+    :returns: empty string (so it can be called directly within a template)
+    """
+    bottle.request.environ["foris.session"].ws_session
+    return ""
+
+
 def redirect_unauthenticated(redirect_url=None):
     redirect_url = redirect_url or reverse("index")
     no_auth = bottle.default_app().config.get("no_auth", False)
@@ -142,12 +156,22 @@ class Lazy(object):
 
 class LazyCache(object):
     """
-    Simple per request cache of lazy objects
+    Simple per request cache of lazy objects (stored in the context of the current request)
     """
 
     def __init__(self):
+        super(LazyCache, self).__setattr__(
+            "_attr_dict_var", contextvars.ContextVar("lazy_cache_%x" % id(self))
+        )
         self.clear()
 
+    @property
+    def _attr_dict(self):
+        try:
+            return self._attr_dict_var.get()
+        except LookupError:
+            return self.clear()
+
     def __getattr__(self, name):
         res = self._attr_dict[name]
         logger.debug("Lazy cache object '%s' obtained." % name)
@@ -156,52 +180,22 @@ class LazyCache(object):
     def __setattr__(self, name, func):
         if not callable(func):
             raise TypeError("Expected callable")
-        self._attr_dict[name] = Lazy(func)
+        # don't alter the dict which might be shared with another context
+        attr_dict = dict(self._attr_dict)
+        attr_dict[name] = Lazy(func)
+        self._attr_dict_var.set(attr_dict)
         logger.debug("Lazy cache object '%s' initialized." % name)
 
     def __delattr__(self, name):
-        del self._attr_dict[name]
+        attr_dict = dict(self._attr_dict)
+        del attr_dict[name]
+        self._attr_dict_var.set(attr_dict)
         logger.debug("Lazy cache object '%s' removed." % name)
 
     def clear(self):
-        super(LazyCache, self).__setattr__("_attr_dict", {})
-
-
-def localized_sorted(iterable, lang, key=None, reverse=False):
-    """
-    Sorted method that can sort according to a language-specific alphabet.
-
-    :param iterable: iterable to sort
-    :param lang: alphabet to use
-    :param cmp: cmp argument for the sorted method
-    :param key: key argument for the sorted method
-    :param reverse: reverse argument for the sorted method
-    :return: sorted iterable
-    """
-    alphabet = {
-        # FIXME: "ch" should be sorted after h in Czech
-        "cs": u" AÁÅBCČDĎEÉĚFGHIÍJKLMNŇOÓPQRŘSŠTŤUÚŮVWXYÝZŽ"
-        u"aáåbcčdďeéěfghiíjklmnňoópqrřsštťuúůvwxyýzž"
-    }
-
-    alphabet = alphabet.get(lang)
-    if not alphabet:
-        return sorted(iterable, key=key, reverse=reverse)
-
-    key = key or (lambda x: x)
-
-    def safe_index(c):
-        """Get index of a character in the alphabet, do not raise error."""
-        try:
-            return alphabet.index(c)
-        except ValueError:
-            return len(alphabet) + ord(c)
-
-    def key_fn(x):
-        """Key function for sorting using a custom alphabet."""
-        return [safe_index(e) for e in key(x)]
-
-    return sorted(iterable, key=key_fn, reverse=reverse)
+        attr_dict = {}
+        self._attr_dict_var.set(attr_dict)
+        return attr_dict
 
 
 def check_password(password):
@@ -17,6 +17,7 @@
 
 
 import bottle
+import contextvars
 
 from foris.langs import iso2to3, translation_names
 from foris.middleware.bottle_csrf import get_csrf_token
@@ -24,10 +25,63 @@ from foris.state import current_state
 
 from .routing import reverse, static as static_path, generated_static
 from .translators import translations, gettext, ngettext
-from . import is_user_authenticated, template_helpers
+from . import ensure_ws_session, is_user_authenticated, template_helpers
+
+
+class TemplateDefaults(dict):
+    """ Template defaults which can be altered for the current request only
+
+    Both bottle.SimpleTemplate and bottle.Jinja2Template copy their defaults
+    before rendering, so the values set via `set_request_value` are merged here.
+    The values are stored in the context of the current request.
+    """
+
+    def __init__(self, name, *args, **kwargs):
+        super(TemplateDefaults, self).__init__(*args, **kwargs)
+        self._request_values = contextvars.ContextVar("%s.request_values" % name, default={})
+
+    def set_request_value(self, key, value):
+        values = dict(self._request_values.get())
+        values[key] = value
+        self._request_values.set(values)
+
+    def clear_request_values(self):
+        self._request_values.set({})
+
+    def copy(self):
+        res = dict(self)
+        res.update(self._request_values.get())
+        return res
+
+
+def set_request_template_default(key, value):
+    """ Sets template default for all templates rendered within the current request
+    """
+    bottle.SimpleTemplate.defaults.set_request_value(key, value)
+    bottle.Jinja2Template.defaults.set_request_value(key, value)
+
+
+def clear_request_template_defaults():
+    bottle.SimpleTemplate.defaults.clear_request_values()
+    bottle.Jinja2Template.defaults.clear_request_values()
+
+
+def translate(msgid, options=None):
+    """ Replacement of bottle_i18n `_` which uses the language of the current request
+    """
+    return gettext(msgid) % options if options else gettext(msgid)
 
 
 def prepare_template_defaults():
+    # defaults are shared by all threads, request specific values are kept aside
+    bottle.SimpleTemplate.defaults = TemplateDefaults(
+        "SimpleTemplate", bottle.SimpleTemplate.defaults
+    )
+    bottle.Jinja2Template.defaults = TemplateDefaults(
+        "Jinja2Template", bottle.Jinja2Template.defaults
+    )
+
+    bottle.SimpleTemplate.defaults["_"] = translate
     bottle.SimpleTemplate.defaults["trans"] = lambda msgid: gettext(msgid)  # workaround
     bottle.SimpleTemplate.defaults["translation_names"] = translation_names
     bottle.SimpleTemplate.defaults["translations"] = [e for e in translations]
@@ -36,6 +90,7 @@ def prepare_template_defaults():
         singular, plural, n
     )
     bottle.SimpleTemplate.defaults["foris_info"] = current_state
+    bottle.SimpleTemplate.defaults["lang"] = lambda: current_state.language
 
     # template defaults
     # this is not really straight-forward, check for user_authenticated() (with brackets) in template,
@@ -48,8 +103,10 @@ def prepare_template_defaults():
     bottle.SimpleTemplate.defaults["static"] = static_path
     bottle.SimpleTemplate.defaults["generated_static"] = generated_static
     bottle.SimpleTemplate.defaults["get_csrf_token"] = get_csrf_token
+    bottle.SimpleTemplate.defaults["ensure_ws_session"] = ensure_ws_session
     bottle.SimpleTemplate.defaults["helpers"] = template_helpers
 
+    bottle.Jinja2Template.defaults["_"] = translate
     bottle.Jinja2Template.defaults["trans"] = lambda msgid: gettext(msgid)  # workaround
     bottle.Jinja2Template.defaults["translation_names"] = translation_names
     bottle.Jinja2Template.defaults["translations"] = [e for e in translations]
@@ -58,6 +115,7 @@ def prepare_template_defaults():
         singular, plural, n
     )
     bottle.Jinja2Template.defaults["foris_info"] = current_state
+    bottle.Jinja2Template.defaults["lang"] = lambda: current_state.language
 
     # template defaults
     # this is not really straight-forward, check for user_authenticated() (with brackets) in template,
@@ -70,6 +128,7 @@ def prepare_template_defaults():
     bottle.Jinja2Template.defaults["static"] = static_path
     bottle.Jinja2Template.defaults["generated_static"] = generated_static
     bottle.Jinja2Template.defaults["get_csrf_token"] = get_csrf_token
+    bottle.Jinja2Template.defaults["ensure_ws_session"] = ensure_ws_session
     bottle.Jinja2Template.defaults["helpers"] = template_helpers
 
 
@@ -80,10 +139,16 @@ def disable_caching(authenticated_only=True):
     :param authenticated_only: apply only if user is authenticated
     """
     if not authenticated_only or authenticated_only and is_user_authenticated():
-        bottle.response.headers["Cache-Control"] = (
-            "no-store, no-cache, must-revalidate, "
-            "no-transform, max-age=0, post-check=0, pre-check=0"
-        )
+        if "ETag" in bottle.response.headers:
+            # can be stored by the browser but it has to be revalidated (see foris.utils.etags)
+            bottle.response.headers[
+                "Cache-Control"
+            ] = "private, no-cache, must-revalidate, no-transform, max-age=0"
+        else:
+            bottle.response.headers["Cache-Control"] = (
+                "no-store, no-cache, must-revalidate, "
+                "no-transform, max-age=0, post-check=0, pre-check=0"
+            )
         bottle.response.headers["Pragma"] = "no-cache"
 
 
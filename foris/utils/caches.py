@@ -15,7 +15,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import collections
+import contextvars
 import logging
+import threading
+import time
 
 
 logger = logging.getLogger("foris.caches")
@@ -34,12 +38,186 @@ class SimpleCache(dict):
         logger.debug("Cache %s: '%s' -> '%s'.", self.name, key, value)
 
 
+class RequestBackendData(SimpleCache):
+    """
+    Responses of read-only backend queries performed within a request
+    """
+
+    def __init__(self):
+        super(RequestBackendData, self).__init__("backend_data")
+        # set when an action which could alter the data was performed
+        self.modified = False
+
+    def invalidate(self):
+        self.clear()
+        self.modified = True
+
+
+class ExpiringCache(object):
+    """
+    Cache shared among requests where each record expires after `ttl` seconds
+    """
+
+    def __init__(self, name, ttl):
+        """
+        :param name: name of the cache (used in logs)
+        :type name: str
+        :param ttl: how long is the record valid (in seconds), 0 disables the cache
+        :type ttl: int
+        """
+        self.name = name
+        self.ttl = ttl
+        self._records = {}
+        self._lock = threading.Lock()
+        # incremented on every invalidation (values obtained meanwhile are outdated)
+        self.generation = 0
+
+    def get(self, key, default=None):
+        if self.ttl <= 0:
+            return default
+
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return default
+
+            value, expires_at = record
+            if expires_at <= time.monotonic():
+                del self._records[key]
+                logger.debug("Cache %s: '%s' expired.", self.name, key)
+                return default
+
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def set(self, key, value, generation=None):
+        """ Stores the value
+
+        :param generation: generation of the cache when the value was obtained, the value is
+                           not stored when the cache was invalidated since then (None = always)
+        :type generation: int
+        :returns: whether the value was stored
+        :rtype: bool
+        """
+        if self.ttl <= 0:
+            return False
+
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                logger.debug("Cache %s: '%s' is outdated, not stored.", self.name, key)
+                return False
+            self._records[key] = (value, time.monotonic() + self.ttl)
+        logger.debug("Cache %s: '%s' -> '%s'.", self.name, key, value)
+        return True
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def invalidate(self, key):
+        with self._lock:
+            self._records.pop(key, None)
+            self.generation += 1
+        logger.debug("Cache %s: '%s' invalidated.", self.name, key)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self.generation += 1
+        logger.debug("Cache %s cleared.", self.name)
+
+
+class LRUExpiringCache(object):
+    """
+    Cache shared among requests where each record has its own ttl
+    and the least recently used records are dropped when the cache is full
+    """
+
+    def __init__(self, name, max_size):
+        """
+        :param name: name of the cache (used in logs)
+        :type name: str
+        :param max_size: maximal number of records
+        :type max_size: int
+        """
+        self.name = name
+        self.max_size = max_size
+        self._records = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, key, default=None):
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return default
+
+            value, expires_at = record
+            if expires_at <= time.monotonic():
+                del self._records[key]
+                logger.debug("Cache %s: '%s' expired.", self.name, key)
+                return default
+
+            self._records.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl):
+        """
+        :param ttl: how long is the record valid (in seconds), 0 = not stored at all
+        :type ttl: int
+        """
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._records[key] = (value, time.monotonic() + ttl)
+            self._records.move_to_end(key)
+            while len(self._records) > self.max_size:
+                self._records.popitem(last=False)
+        logger.debug("Cache %s: '%s' stored (ttl %ds).", self.name, key, ttl)
+
+    def invalidate(self, predicate):
+        """ Drops all records which keys match the predicate
+
+        :param predicate: callable which obtains the key
+        :type predicate: callable
+        """
+        with self._lock:
+            keys = [e for e in self._records if predicate(e)]
+            for key in keys:
+                del self._records[key]
+        if keys:
+            logger.debug("Cache %s: %d records invalidated.", self.name, len(keys))
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+        logger.debug("Cache %s cleared.", self.name)
+
+
 class PerRequest(object):
     """
-    Ceched per request
+    Ceched per request (stored in the context of the current request)
     """
 
-    backend_data = SimpleCache("backend_data")
+    _backend_data = contextvars.ContextVar("per_request.backend_data")
+
+    @property
+    def backend_data(self):
+        try:
+            return self._backend_data.get()
+        except LookupError:
+            return self.reset()
+
+    def reset(self):
+        """ Starts with empty caches (should be called when a new request arrives)
+        """
+        backend_data = RequestBackendData()
+        self._backend_data.set(backend_data)
+        return backend_data
 
 
-per_request = PerRequest
+per_request = PerRequest()
@@ -0,0 +1,136 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Language-specific sorting
+
+Each language with a specific alphabet has a table which maps its graphemes
+(a grapheme can consist of more characters - e.g. "ch" in Czech) to their ranks.
+The table is computed only once per language.
+"""
+
+import functools
+
+from foris.utils.caches import LRUExpiringCache
+from foris.utils.translators import translations
+
+# alphabets ordered from the lowest grapheme (uppercase letters are sorted before lowercase)
+ALPHABETS = {
+    "cs": [" "]
+    + list("AÁÅBCČDĎEÉĚFGH")
+    + ["CH", "Ch"]
+    + list("IÍJKLMNŇOÓPQRŘSŠTŤUÚŮVWXYÝZŽ")
+    + list("aáåbcčdďeéěfgh")
+    + ["ch", "cH"]
+    + list("iíjklmnňoópqrřsštťuúůvwxyýzž")
+}
+
+# sorted choices are dropped when they are not used (or when the catalog changes)
+SORTED_CHOICES_TTL = 3600
+
+_sorted_choices = LRUExpiringCache("sorted_choices", 512)
+
+
+class Collation(object):
+    """ Sorting according to an alphabet
+    """
+
+    def __init__(self, alphabet):
+        """
+        :param alphabet: graphemes ordered from the lowest one
+        :type alphabet: list
+        """
+        self.ranks = {grapheme: rank for rank, grapheme in enumerate(alphabet)}
+        self.max_length = max(len(e) for e in alphabet)
+
+    def sort_key(self, text):
+        """ Returns sort key of the text
+
+        Graphemes which are not in the alphabet are placed after the alphabet
+        (ordered by their code points).
+
+        :param text: text to be sorted
+        :type text: str
+        :rtype: list
+        """
+        ranks = self.ranks
+        unknown = len(ranks)
+        result = []
+        i = 0
+        while i < len(text):
+            for length in range(min(self.max_length, len(text) - i), 0, -1):
+                rank = ranks.get(text[i : i + length])
+                if rank is not None:
+                    result.append(rank)
+                    i += length
+                    break
+            else:
+                result.append(unknown + ord(text[i]))
+                i += 1
+        return result
+
+
+@functools.lru_cache(maxsize=None)
+def get_collation(lang):
+    """ Returns collation of the language or None if the language uses the default ordering
+
+    :param lang: language code
+    :type lang: str
+    :rtype: Collation
+    """
+    alphabet = ALPHABETS.get(lang)
+    return Collation(alphabet) if alphabet else None
+
+
+def localized_sorted(iterable, lang, key=None, reverse=False):
+    """
+    Sorted method that can sort according to a language-specific alphabet.
+
+    :param iterable: iterable to sort
+    :param lang: alphabet to use
+    :param key: key argument for the sorted method
+    :param reverse: reverse argument for the sorted method
+    :return: sorted iterable
+    """
+    collation = get_collation(lang)
+    if not collation:
+        return sorted(iterable, key=key, reverse=reverse)
+
+    if key:
+        return sorted(iterable, key=lambda x: collation.sort_key(key(x)), reverse=reverse)
+    return sorted(iterable, key=collation.sort_key, reverse=reverse)
+
+
+def cached_localized_sorted(name, lang, build, key=None):
+    """ Sorted (and translated) list of choices which is computed only once per language
+
+    The choices are computed again when the catalog of the language changes.
+
+    :param name: identifier of the list (e.g. "countries/Europe")
+    :type name: str
+    :param lang: language of the choices
+    :type lang: str
+    :param build: returns the items which should be sorted
+    :type build: callable
+    :param key: key argument for the sorted method
+    :returns: sorted items (should not be altered)
+    :rtype: list
+    """
+    cache_key = (name, lang, translations.generation)
+    result = _sorted_choices.get(cache_key)
+    if result is None:
+        result = localized_sorted(build(), lang, key=key)
+        _sorted_choices.set(cache_key, result, SORTED_CHOICES_TTL)
+    return result
@@ -16,61 +16,276 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import bottle
+import hashlib
+import jinja2
+import json
 import logging
-import shutil
 import os
-import bottle
+import tempfile
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from jinja2 import meta
+
+from foris import BASE_DIR, __version__
+from foris.state import current_state
+from foris.utils.static_files import compress_file
+from foris.utils.static_manifest import manifest as static_manifest
+from foris.utils.template_cache import TEMPLATE_SUFFIX, list_templates
 
 
 logger = logging.getLogger("foris.utils.dynamic_assets")
 
+MANIFEST_NAME = "manifest.json"
+
+# templates of generated assets are placed within this template directory
+ASSETS_TEMPLATE_DIR = "javascript/"
 
-dynamic_assets_map = {}
+
+# (template_name, lang, script_name) which are generated and up to date
+dynamic_assets_map = set()
 
 current_assets_path = None
 
+# script name which is used to generate assets outside of a request
+current_script_name = ""
+
+_manifest = {"script_name": "", "assets": {}}
+_manifest_lock = threading.Lock()
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get("assets"), dict):
+            return manifest
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {"script_name": "", "assets": {}}
+
+
+def _store_manifest():
+    with _manifest_lock:
+        content = json.dumps(_manifest, sort_keys=True, indent=2)
+    _atomic_write(os.path.join(current_assets_path, MANIFEST_NAME), content.encode("utf8"))
+
+
+def _atomic_write(path, content):
+    """ Writes a file so that the readers see either the old or the new content
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def script_dir(script_name):
+    """ Name of the directory where the assets generated for the script name are placed
+
+    Assets contain urls so each script name (e.g. access via a proxy) has its own copy.
+    """
+    return "s-%s" % hashlib.md5(script_name.encode("utf8")).hexdigest()[:12]
+
+
+def _template_sources(template_name):
+    """ Reads the template and all the templates which it includes, imports or extends
+
+    :returns: list of (path, content) pairs
+    :rtype: list
+    """
+    env = jinja2.Environment(extensions=bottle.Jinja2Template.settings.get("extensions", []))
+    sources = []
+    to_process = [template_name]
+    processed = set()
+    while to_process:
+        name = to_process.pop()
+        if name in processed:
+            continue
+        processed.add(name)
+        path = bottle.Jinja2Template.search(name, bottle.TEMPLATE_PATH)
+        if not path:
+            continue
+        with open(path, "rb") as f:
+            content = f.read()
+        sources.append((path, content))
+        try:
+            ast = env.parse(content.decode("utf8"))
+        except jinja2.TemplateSyntaxError:
+            continue  # will fail during rendering
+        # dynamic references (None) can't be resolved in advance
+        to_process.extend(e for e in meta.find_referenced_templates(ast) if e)
+    return sorted(sources)
+
+
+def _inputs_hash(template_name, lang, script_name):
+    """ Hash of everything what affects the content of the asset
+    """
+    inputs = hashlib.sha256()
+    inputs.update(("%s|%s|%s" % (__version__, lang, script_name)).encode("utf8"))
+
+    for path, content in _template_sources(template_name + TEMPLATE_SUFFIX):
+        inputs.update(path.encode("utf8"))
+        inputs.update(content)
+
+    # translations of foris and the plugins (locale is placed next to the template dir)
+    locale_dirs = [os.path.join(BASE_DIR, "locale")] + [
+        os.path.join(os.path.dirname(os.path.normpath(e)), "locale")
+        for e in bottle.TEMPLATE_PATH
+        if os.path.isabs(e)
+    ]
+    for locale_dir in sorted(set(locale_dirs)):
+        mo_path = os.path.join(locale_dir, lang, "LC_MESSAGES", "messages.mo")
+        try:
+            stat = os.stat(mo_path)
+            inputs.update(("%s|%d|%d" % (mo_path, stat.st_mtime_ns, stat.st_size)).encode("utf8"))
+        except FileNotFoundError:
+            pass
+
+    return inputs.hexdigest()
+
+
+def _generate(template_name, lang, script_name):
+    """ Renders the asset unless the stored one is up to date
 
-def reset(app_name, assets_path):
-    """ Deletes generated assets and cleans md5
+    :returns: True if the asset was rendered False otherwise
     """
-    global dynamic_assets_map
-    dynamic_assets_map = {}
-    target = os.path.join(assets_path, app_name)
-    logger.debug("cleaning dynamic assets in '%s'", target)
-    shutil.rmtree(target, ignore_errors=True)
-    os.makedirs(target)
-    global current_assets_path
-    current_assets_path = target
-
-
-def store_template(template_name, lang):
-    """ Creates static file from template as stores it
+    key = "%s/%s/%s" % (script_dir(script_name), lang, template_name)
+    target_path = os.path.join(current_assets_path, script_dir(script_name), lang, template_name)
+    inputs = _inputs_hash(template_name, lang, script_name)
+
+    with _manifest_lock:
+        record = _manifest["assets"].get(key)
+
+    rendered = False
+    if not record or record["inputs"] != inputs or not os.path.exists(target_path):
+        content = bytearray(
+            bottle.template(
+                template_name + TEMPLATE_SUFFIX, template_adapter=bottle.Jinja2Template
+            ),
+            "utf8",
+        )
+        content_hash = hashlib.md5(content).hexdigest()
+        if not record or record["hash"] != content_hash or not os.path.exists(target_path):
+            _atomic_write(target_path, content)
+            compress_file(target_path)
+            static_manifest.update("generated/%s" % key, md5=content_hash)
+            for suffix in (".gz", ".br"):
+                static_manifest.update("generated/%s%s" % (key, suffix))
+            logger.debug(
+                "Generated template '%s' (%s) was stored to '%s'.", template_name, lang, target_path
+            )
+        with _manifest_lock:
+            _manifest["assets"][key] = {"hash": content_hash, "inputs": inputs}
+        rendered = True
+
+    dynamic_assets_map.add((template_name, lang, script_name))
+    return rendered
+
+
+def reset(app_name, assets_path, script_name=None):
+    """ Prepares the directory for the generated assets
+
+    Previously generated assets are kept, they are regenerated only when
+    they are outdated (see build()).
+
+    :param script_name: script name which is used to generate the assets outside of
+                        a request (the last used one is used when not set)
+    :type script_name: str
+    """
+    global dynamic_assets_map, current_assets_path, current_script_name, _manifest
+    dynamic_assets_map = set()
+    current_assets_path = os.path.join(assets_path, app_name)
+    os.makedirs(current_assets_path, exist_ok=True)
+    _manifest = _load_manifest(os.path.join(current_assets_path, MANIFEST_NAME))
+    current_script_name = _manifest["script_name"] if script_name is None else script_name
+    logger.debug("dynamic assets will be stored in '%s'", current_assets_path)
+
+
+def list_assets():
+    """ Lists names of all the assets which can be generated (core and plugins)
+    """
+    return [
+        e[: -len(TEMPLATE_SUFFIX)]
+        for e in list_templates(bottle.TEMPLATE_PATH)
+        if e.startswith(ASSETS_TEMPLATE_DIR)
+    ]
+
+
+def build(languages, workers=None):
+    """ Generates all assets for all languages in advance
+
+    :param languages: list of language codes
+    :type languages: list
+    :param workers: number of worker threads (cpu count when not set)
+    :type workers: int
+    :returns: (number of assets, number of rendered assets)
+    :rtype: tuple
+    """
+    script_name = current_script_name
+
+    def generate(args):
+        template_name, lang = args
+        # render the template as it was rendered within a request
+        bottle.request.bind(
+            {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": "/",
+                "SCRIPT_NAME": script_name,
+                "bottle.app": bottle.app(),
+            }
+        )
+        current_state.language = lang
+        return _generate(template_name, lang, script_name)
+
+    tasks = [(template_name, lang) for template_name in list_assets() for lang in languages]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="foris-assets") as executor:
+        rendered = sum(executor.map(generate, tasks))
+
+    _manifest["script_name"] = script_name
+    _store_manifest()
+    logger.debug(
+        "%d dynamic assets generated (%d were up to date)", rendered, len(tasks) - rendered
+    )
+    return len(tasks), rendered
+
+
+def store_template(template_name, lang, script_name=None):
+    """ Makes sure that the asset generated from the template is present
+
+    Assets are normally generated in advance by build(). They are generated here
+    only when it wasn't called (e.g. in cgi mode) or when the request uses
+    a different script name (each script name has its own copy of the asset).
+
     :param template_name: should looks like this <path>/<file>.tpl
     :type template_name: str
+    :param lang: language code
+    :type lang: str
+    :param script_name: script name of the current request
+    :type script_name: str
     """
     template_name = template_name.lstrip("/")
-    logger.debug("Trying to store generated template '%s' (%s)", template_name, lang)
+    script_name = current_script_name if script_name is None else script_name
 
     # already present
-    if (template_name, lang) in dynamic_assets_map:
-        logger.debug("Template already generated '%s' (%s)", template_name, lang)
+    if (template_name, lang, script_name) in dynamic_assets_map:
         return
 
-    # store file
-    rendered = bottle.template(template_name + ".j2", template_adapter=bottle.Jinja2Template)
-    target_path = os.path.join(current_assets_path, lang, template_name)
-    try:
-        os.makedirs(os.path.dirname(target_path))
-    except os.error:
-        # already exists
-        pass
-    with open(target_path, "wb") as f:
-        f.write(bytearray(rendered, "utf8"))
-        f.flush()
-
-    logger.debug(
-        "Generated template '%s' (%s) was stored to '%s'.", template_name, lang, target_path
-    )
-
-    # mark present
-    dynamic_assets_map[(template_name, lang)] = True
+    logger.debug("Trying to store generated template '%s' (%s)", template_name, lang)
+    if _generate(template_name, lang, script_name):
+        if script_name != current_script_name:
+            logger.info(
+                "Asset '%s' was generated for an additional script name ('%s' != '%s').",
+                template_name,
+                script_name,
+                current_script_name,
+            )
+        with _manifest_lock:
+            _manifest["script_name"] = script_name
+        _store_manifest()
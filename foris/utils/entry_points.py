@@ -0,0 +1,196 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import importlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+
+try:
+    from importlib import metadata
+except ImportError:
+    import importlib_metadata as metadata
+
+from foris import BASE_DIR
+
+
+logger = logging.getLogger("foris.utils.entry_points")
+
+# persistent (the result of the discovery is reused after reboot)
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, "entry_points.json")
+
+
+class EntryPoint(collections.namedtuple("EntryPoint", ["group", "name", "value", "dist"])):
+    """ Entry point of an installed distribution (e.g. "module.path:attribute")
+    """
+
+    def load(self):
+        module_name, _, attrs = self.value.partition(":")
+        obj = importlib.import_module(module_name.strip())
+        for attr in [e for e in attrs.split("[")[0].strip().split(".") if e]:
+            obj = getattr(obj, attr)
+        return obj
+
+
+def normalize_name(name):
+    """ Normalizes distribution name (e.g. "foris-x-plugin" -> "foris_x_plugin")
+    """
+    return re.sub(r"[-_.]+", "_", name).lower()
+
+
+class EntryPointRegistry(object):
+    """ Entry points and versions of all installed distributions
+
+    Discovery of the distributions is slow (all the metadata have to be read),
+    so it is performed only once (when foris starts) and the result can be stored
+    to a file which is reused until a distribution is installed or removed
+    (i.e. until the mtime of a directory in sys.path changes).
+    """
+
+    def __init__(self):
+        self.entry_points = {}  # group -> [EntryPoint]
+        self.versions = {}  # normalized distribution name -> version
+        self.built = False
+        self._loaded = {}  # EntryPoint -> loaded object
+        self._lock = threading.RLock()  # loaded entry points can use the registry
+
+    @staticmethod
+    def _paths_stamp():
+        stamp = {}
+        for path in sys.path:
+            try:
+                stamp[path or "."] = os.stat(path or ".").st_mtime_ns
+            except OSError:
+                pass
+        return stamp
+
+    def _scan(self):
+        entry_points = {}
+        versions = {}
+        for dist in metadata.distributions():
+            name = dist.metadata["Name"]
+            if not name:
+                continue
+            name = normalize_name(name)
+            if name in versions:
+                continue  # shadowed by a distribution which is sooner in sys.path
+            versions[name] = dist.version
+            for entry_point in dist.entry_points:
+                entry_points.setdefault(entry_point.group, []).append(
+                    EntryPoint(entry_point.group, entry_point.name, entry_point.value, name)
+                )
+        return entry_points, versions
+
+    def _load_cache(self, path, stamp):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data["stamp"] != stamp:
+                return False
+            self.entry_points = {
+                group: [EntryPoint(*e) for e in records]
+                for group, records in data["entry_points"].items()
+            }
+            self.versions = data["versions"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        return True
+
+    def _store_cache(self, path, stamp):
+        data = {
+            "stamp": stamp,
+            "entry_points": {k: [list(e) for e in v] for k, v in self.entry_points.items()},
+            "versions": self.versions,
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = "%s.tmp-%d" % (path, os.getpid())
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to store entry points to '%s': %s", path, e)
+
+    def build(self, cache_path=None, fallback_path=None):
+        """ Discovers entry points of all the installed distributions
+
+        :param cache_path: file where the result is cached (None = not cached)
+        :type cache_path: str
+        :param fallback_path: file where the result is cached when cache_path
+                              is not writable (e.g. in tmpfs)
+        :type fallback_path: str
+        """
+        stamp = self._paths_stamp()
+        paths = [e for e in (cache_path, fallback_path) if e]
+        with self._lock:
+            for path in paths:
+                if self._load_cache(path, stamp):
+                    logger.debug("Entry points loaded from '%s'.", path)
+                    break
+            else:
+                self.entry_points, self.versions = self._scan()
+                logger.debug("Entry points of %d distributions obtained.", len(self.versions))
+                if cache_path and os.access(os.path.dirname(cache_path), os.W_OK):
+                    self._store_cache(cache_path, stamp)
+                elif fallback_path:
+                    self._store_cache(fallback_path, stamp)
+            self._loaded = {}
+            self.built = True
+
+    def get(self, group):
+        """ Returns entry points of a group
+
+        :rtype: list of EntryPoint
+        """
+        if not self.built:
+            self.build()
+        return list(self.entry_points.get(group, []))
+
+    def load(self, group):
+        """ Loads (imports) all entry points of a group
+
+        Entry points are loaded only once, entry points which fail to load are skipped.
+
+        :returns: list of (entry point, loaded object)
+        :rtype: list
+        """
+        result = []
+        for entry_point in self.get(group):
+            with self._lock:
+                if entry_point not in self._loaded:
+                    try:
+                        self._loaded[entry_point] = entry_point.load()
+                    except Exception:
+                        logger.exception("Failed to load entry point '%s'.", entry_point.value)
+                        self._loaded[entry_point] = None
+                obj = self._loaded[entry_point]
+            if obj is not None:
+                result.append((entry_point, obj))
+        return result
+
+    def version(self, distribution):
+        """ Returns version of an installed distribution or None if it is not installed
+        """
+        if not self.built:
+            self.build()
+        return self.versions.get(normalize_name(distribution))
+
+
+registry = EntryPointRegistry()
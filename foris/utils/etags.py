@@ -0,0 +1,163 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" ETags of the config pages
+
+A page is fully determined by the responses of the read-only backend queries
+which were performed to render it, the language and the content of the session
+(messages, csrf token, ...). The queries are remembered when the page is rendered,
+so the etag of the next request can be computed (and 304 returned) without
+rendering the page again.
+
+Only the pages which set `cacheable` are handled. The content of the other pages
+depends on something else (e.g. per-process state, time or queries of other controllers)
+and they are always rendered.
+"""
+
+import bottle
+import copy
+import hashlib
+import json
+import logging
+import secrets
+import threading
+
+from foris.state import current_state
+from foris.utils.caches import per_request
+
+logger = logging.getLogger("foris.utils.etags")
+
+# pages are rendered differently when foris (or a plugin) is updated and restarted
+_instance_id = secrets.token_hex(8)
+
+_page_queries = {}  # page name -> read-only queries performed when the page was rendered
+_lock = threading.Lock()
+
+
+def _compute(page_name, keys, session_data, ws_session_id):
+    content = [
+        _instance_id,
+        current_state.foris_version,
+        page_name,
+        bottle.request.query_string,
+        current_state.language,
+        session_data,
+        ws_session_id,
+        [[list(k), per_request.backend_data.get(k)] for k in keys],
+    ]
+    digest = hashlib.md5(json.dumps(content, sort_keys=True, default=str).encode("utf-8"))
+    return '"%s"' % digest.hexdigest()
+
+
+def page_etag(page_name):
+    """ Computes etag of the page before it is rendered
+
+    Only the backend queries are performed (in parallel), their responses
+    are reused when the page is rendered.
+
+    :param page_name: name of the page
+    :type page_name: str
+    :returns: etag or None if it can't be determined
+    :rtype: str or NoneType
+    """
+    with _lock:
+        keys = _page_queries.get(page_name)
+    if keys is None:
+        return None
+
+    missing = [k for k in keys if k not in per_request.backend_data]
+    if missing:
+        calls = [
+            (module, action, json.loads(data) if data else None) for module, action, data in missing
+        ]
+        for response in current_state.backend.perform_many(calls):
+            if response is None or isinstance(response, Exception):
+                return None
+
+    session = bottle.request.environ["foris.session"]
+    return _compute(page_name, keys, session_snapshot(), session.ws_session_id)
+
+
+def session_snapshot():
+    """ Copies the content of the session
+
+    Rendering modifies the session (e.g. the messages are consumed), so the snapshot
+    has to be taken before the page is rendered and passed to update().
+
+    :returns: copy of the session data
+    :rtype: dict
+    """
+    session = bottle.request.environ["foris.session"]
+    return {k: copy.deepcopy(session[k]) for k in session}
+
+
+def not_modified(page):
+    """ Checks whether the client has the current version of the page
+
+    :param page: config page class
+    :type page: type
+    :returns: True if the page didn't change since the client obtained it
+    :rtype: bool
+    """
+    if_none_match = bottle.request.get_header("If-None-Match")
+    if not if_none_match or not page.cacheable:
+        return False
+
+    etag = page_etag(page.slug)
+    if etag is None or etag not in [e.strip() for e in if_none_match.split(",")]:
+        return False
+
+    # websocket session has to be renewed the same way as when the page is rendered
+    session = bottle.request.environ["foris.session"]
+    ws_session = session.ws_session
+    if ws_session and ws_session.session_id != session.ws_session_id:
+        return False  # ws session expired -> page has to be rendered with a new one
+
+    bottle.response.set_header("ETag", etag)
+    return True
+
+
+def update(page, session_data):
+    """ Remembers the queries which were performed to render the page
+    and sets the etag of the response
+
+    Should be called after the page is rendered.
+
+    :param page: config page class
+    :type page: type
+    :param session_data: content of the session before the page was rendered
+                         (see session_snapshot())
+    :type session_data: dict
+    """
+    if not page.cacheable:
+        return
+
+    page_name = page.slug
+    backend_data = per_request.backend_data
+    if backend_data.modified or bottle.response.status_code != 200:
+        # the page is not determined by the read-only queries
+        with _lock:
+            _page_queries.pop(page_name, None)
+        return
+
+    keys = sorted(backend_data.keys(), key=repr)
+    with _lock:
+        _page_queries[page_name] = keys
+
+    session = bottle.request.environ["foris.session"]
+    ws_session = session.ws_session if session.ws_session_loaded else None
+    ws_session_id = ws_session.session_id if ws_session else session.ws_session_id
+    bottle.response.set_header("ETag", _compute(page_name, keys, session_data, ws_session_id))
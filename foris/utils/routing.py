@@ -15,19 +15,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import bottle
-import hashlib
 import logging
-import os
 import re
 
-from foris import BASE_DIR
 from foris.state import current_state
-from foris.utils.dynamic_assets import store_template
+from foris.utils.dynamic_assets import script_dir, store_template
+from foris.utils.static_manifest import manifest as static_manifest
 
 logger = logging.getLogger("utils.routing")
 
-static_md5_map = {}
-
 
 def _get_prefix_and_script_name():
     script_name = bottle.request.script_name
@@ -74,9 +70,10 @@ def reverse(name, **kargs):
 
 
 def generated_static(name, *args):
-    lang = bottle.request.app.lang
-    store_template(name, lang)
-    name = "generated/%s/%s" % (lang, name.lstrip("/"))
+    lang = current_state.language
+    script_name, _ = _get_prefix_and_script_name()
+    store_template(name, lang, script_name)
+    name = "generated/%s/%s/%s" % (script_dir(script_name), lang, name.lstrip("/"))
     return static(name, *args)
 
 
@@ -84,9 +81,14 @@ def static(name, *args):
     script_name, _ = _get_prefix_and_script_name()
     script_name = script_name.strip("/")
     script_name = "/%s" % script_name if script_name else ""
-    filename = ("%s/static/%s" % (script_name, name)) % args
-    md5 = static_md5("static/" + name)
-    return "%s?md5=%s" % (filename, md5) if md5 else filename
+    name = (name % args).lstrip("/")
+    entry = static_manifest.get(name)
+    if not entry:
+        logger.warning("Static file related to url '%s' does not exist" % name)
+        return "%s/static/%s" % (script_name, name)
+    if static_manifest.fingerprint_urls:
+        return "%s/static/%s" % (script_name, static_manifest.fingerprinted(name))
+    return "%s/static/%s?md5=%s" % (script_name, name, entry.md5)
 
 
 def static_md5(filename):
@@ -95,42 +97,9 @@ def static_md5(filename):
     :type filename: str
     :return: md5 of the file or none if the file is not found
     """
-    filename = filename.lstrip("/")
-    if filename in static_md5_map:
-        return static_md5_map[filename]
-
-    match = re.match(r"(?:static)?/*plugins/+(\w+)/+(.+)", filename)
-    os_path = None
-    if match:
-        plugin_name, plugin_file = match.groups()
-        # find correspoding plugin
-        for plugin in bottle.app().foris_plugin_loader.plugins:
-            if plugin.PLUGIN_NAME == plugin_name:
-                os_path = os.path.join(plugin.DIRNAME, "static", plugin_file)
-    else:
-        match = re.match(r"(?:static)?/*generated/+([a-z]{2})/+(.+)", filename)
-        if match:
-            language, template = match.groups()
-            os_path = os.path.join(current_state.assets_path, current_state.app, language, template)
-        else:
-            os_path = os.path.join(BASE_DIR, filename)
-
-    if not os_path:
-        logger.warning("Unable to find file for static url '%s'" % filename)
-        return None
-
-    if not os.path.exists(os_path):
-        logger.warning("Static file '%s' related to url '%s' does not exist" % (os_path, filename))
-        return None
-
-    md5 = hashlib.md5()
-    with open(os_path, "rb") as f:
-        content = f.read()
-        md5.update(content)
-
-    digest = md5.hexdigest()
-    static_md5_map[filename] = digest
-    return digest
+    filename = re.sub(r"^(?:static)?/*", "", filename)
+    entry = static_manifest.get(filename)
+    return entry.md5 if entry else None
 
 
 def get_root():
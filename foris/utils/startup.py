@@ -0,0 +1,107 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+""" Startup time measurement
+
+Startup is split into phases which are measured and reported (with respect to
+the time budget). Modules, catalogs and data files which are not needed to start
+foris are loaded on their first use, these loads are reported as well.
+"""
+
+import contextlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger("foris.utils.startup")
+
+
+class StartupReport(object):
+    """ Durations of the startup phases and of the lazy loads
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.finished = None
+        self.phases = []  # [(name, seconds)]
+        self.lazy_loads = []  # [(name, seconds)] loads performed during the startup
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """ Measures a phase of the startup
+
+        :param name: name of the phase
+        :type name: str
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.monotonic() - start))
+
+    @contextlib.contextmanager
+    def lazy_load(self, name):
+        """ Measures a load of data (or modules) which were postponed till their first use
+
+        :param name: what is loaded
+        :type name: str
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - start
+            logger.debug("Lazy load of %s took %.1f ms.", name, duration * 1000)
+            with self._lock:
+                if self.finished is None:
+                    self.lazy_loads.append((name, duration))
+
+    @property
+    def total(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    def finish(self, budget=0.0):
+        """ Marks the end of the startup and logs the report
+
+        :param budget: expected duration of the startup in seconds (0 = no budget)
+        :type budget: float
+        :returns: True if the startup fits into the budget
+        :rtype: bool
+        """
+        with self._lock:
+            self.finished = time.monotonic()
+        within_budget = budget <= 0 or self.total <= budget
+        if within_budget:
+            logger.debug("Startup report:\n%s", self.format(budget))
+        else:
+            logger.warning("Startup exceeded its time budget:\n%s", self.format(budget))
+        return within_budget
+
+    def format(self, budget=0.0):
+        lines = ["  %-24s %8.1f ms" % (name, duration * 1000) for name, duration in self.phases]
+        lines += [
+            "  %-24s %8.1f ms (lazy)" % (name, duration * 1000)
+            for name, duration in self.lazy_loads
+        ]
+        total = "  %-24s %8.1f ms" % ("total", self.total * 1000)
+        if budget > 0:
+            total += " (budget %.1f ms)" % (budget * 1000)
+        lines.append(total)
+        return "\n".join(lines)
+
+
+report = StartupReport()
@@ -0,0 +1,225 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import bottle
+import email.utils
+import gzip
+import logging
+import mimetypes
+import os
+import re
+
+from foris.middleware.compression import select_encoding
+from foris.utils.static_manifest import manifest as static_manifest
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+logger = logging.getLogger("foris.utils.static_files")
+
+# files which should be precompressed (fonts like woff are already compressed)
+PRECOMPRESS_SUFFIXES = (".css", ".js", ".svg", ".ttf", ".eot", ".otf", ".html", ".json")
+
+# preferred encoding first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+CACHE_MAX_AGE = 31536000
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def compress_file(path):
+    """ Creates precompressed variants of a file (.gz and .br if brotli is installed)
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    variants = [(".gz", lambda x: gzip.compress(x, 9))]
+    if brotli:
+        variants.append((".br", lambda x: brotli.compress(x)))
+    for suffix, compress in variants:
+        compressed = compress(content)
+        if len(compressed) >= len(content):
+            continue  # compression is pointless
+        tmp_path = "%s%s.tmp-%d" % (path, suffix, os.getpid())
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path + suffix)
+
+
+def precompress(directory, suffixes=PRECOMPRESS_SUFFIXES):
+    """ Creates precompressed variants of all (outdated) files in the directory
+
+    :returns: number of compressed files
+    :rtype: int
+    """
+    count = 0
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if not filename.endswith(suffixes):
+                continue
+            path = os.path.join(root, filename)
+            mtime = os.stat(path).st_mtime
+            if all(
+                os.path.exists(path + s) and os.stat(path + s).st_mtime >= mtime
+                for s in [".gz"] + ([".br"] if brotli else [])
+            ):
+                continue
+            compress_file(path)
+            count += 1
+    return count
+
+
+class FileRange(object):
+    """ Part of a file which is sent as a response body
+
+    It can be sent via wsgi.file_wrapper (and sendfile if the server supports it).
+    """
+
+    def __init__(self, path, offset, length):
+        self.file = open(path, "rb")
+        self.file.seek(offset)
+        self.offset = offset
+        self.length = length
+        self._remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self.file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _parse_range(header, size):
+    """ Parses a single byte range
+
+    :returns: (start, end) (end is exclusive) or None if the whole file should be sent
+    :raises ValueError: when the range is not satisfiable
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None  # multiple ranges or invalid header -> send the whole file
+    start, end = match.groups()
+    if not start:  # suffix range (last n bytes)
+        start, end = max(size - int(end), 0), size
+    else:
+        start, end = int(start), min(int(end) + 1, size) if end else size
+    if start >= size or start >= end:
+        raise ValueError()
+    return start, end
+
+
+def _not_modified(entry, etag):
+    if_none_match = bottle.request.get_header("If-None-Match")
+    if if_none_match:
+        tags = [e.strip() for e in if_none_match.split(",")]
+        return "*" in tags or etag in tags or "W/" + etag in tags
+
+    if_modified_since = bottle.request.get_header("If-Modified-Since")
+    if if_modified_since:
+        since = bottle.parse_date(if_modified_since.split(";")[0].strip())
+        return since is not None and since >= int(entry.mtime / 1e9)
+
+    return False
+
+
+def _select_encoding(name, entry):
+    accept = bottle.request.get_header("Accept-Encoding", "")
+    if not accept:
+        return None, entry
+    variants = []
+    for encoding, suffix in ENCODINGS:
+        variant = static_manifest.files.get(name + suffix)
+        if variant and variant.mtime >= entry.mtime:
+            variants.append((encoding, variant))
+    return select_encoding(accept, variants) or (None, entry)
+
+
+def serve(name):
+    """ Serves a static file from the static manifest
+
+    Precompressed variants (.br/.gz) are sent when the client accepts them,
+    conditional (ETag / Last-Modified) and range requests are supported.
+
+    :param name: url path relative to the static directory (can be fingerprinted)
+    :type name: str
+    :rtype: bottle.HTTPResponse
+    """
+    entry = static_manifest.get(name)
+    if entry is None:
+        original = static_manifest.resolve(name)
+        entry = static_manifest.get(original) if original else None
+        name = original
+    if entry is None:
+        return bottle.HTTPError(404, "File does not exist.")
+
+    headers = {
+        "Cache-Control": "public, max-age=%d" % CACHE_MAX_AGE,
+        "Last-Modified": email.utils.formatdate(entry.mtime / 1e9, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+    }
+    mimetype, _ = mimetypes.guess_type(name)
+    mimetype = mimetype or "application/octet-stream"
+    if mimetype.startswith("text/") or mimetype == "application/javascript":
+        mimetype += "; charset=UTF-8"
+    headers["Content-Type"] = mimetype
+
+    range_header = bottle.request.get_header("Range")
+    if range_header:
+        encoding, variant = None, entry  # ranges are served from the identity variant
+    else:
+        encoding, variant = _select_encoding(name, entry)
+    etag = '"%s%s"' % (entry.md5, "-" + encoding if encoding else "")
+    headers["ETag"] = etag
+
+    if _not_modified(entry, etag):
+        return bottle.HTTPResponse(status=304, **headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    start, end = 0, variant.size
+    status = 200
+    if range_header:
+        try:
+            byte_range = _parse_range(range_header, variant.size)
+        except ValueError:
+            headers["Content-Range"] = "bytes */%d" % variant.size
+            return bottle.HTTPResponse(status=416, **headers)
+        if byte_range:
+            start, end = byte_range
+            status = 206
+            headers["Content-Range"] = "bytes %d-%d/%d" % (start, end - 1, variant.size)
+
+    headers["Content-Length"] = str(end - start)
+    if bottle.request.method == "HEAD":
+        return bottle.HTTPResponse(status=status, **headers)
+
+    try:
+        body = FileRange(variant.path, start, end - start)
+    except OSError:
+        return bottle.HTTPError(404, "File does not exist.")
+    return bottle.HTTPResponse(body, status=status, **headers)
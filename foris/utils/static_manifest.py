@@ -0,0 +1,225 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger("foris.utils.static_manifest")
+
+CHUNK_SIZE = 64 * 1024
+FINGERPRINT_LENGTH = 12
+FINGERPRINT_RE = re.compile(r"^(.+)\.([0-9a-f]{%d})(\.[^./]+)$" % FINGERPRINT_LENGTH)
+
+# files placed in the static roots which are not static files
+IGNORED_FILES = ["manifest.json", "config.rb"]
+
+StaticFile = collections.namedtuple("StaticFile", ["path", "size", "mtime", "md5"])
+
+
+def file_md5(path):
+    """ Computes md5 of a file (the file is read in chunks)
+    """
+    md5 = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class StaticManifest(object):
+    """ Size, mtime and md5 of all static files (core, plugins and generated)
+
+    Files are identified by their url path relative to the static directory
+    (e.g. "css/foris.css", "plugins/<plugin>/js/x.js",
+    "generated/<script dir>/<lang>/javascript/x.js").
+    """
+
+    def __init__(self):
+        self.roots = []  # [(url prefix, directory)]
+        self.files = {}  # url path -> StaticFile
+        self.fingerprints = {}  # fingerprinted url path -> url path
+        # place md5 into the filename instead of the query string
+        self.fingerprint_urls = False
+        # detect changed files on every lookup (useful for debugging)
+        self.check_changes = False
+        self._lock = threading.Lock()
+
+    def set_roots(self, roots):
+        """
+        :param roots: list of (url prefix, directory) e.g. [("plugins/sample/", "/path/static")]
+        :type roots: list
+        """
+        # the most specific prefix first
+        self.roots = sorted(roots, key=lambda x: len(x[0]), reverse=True)
+
+    def _fs_path(self, name):
+        for prefix, directory in self.roots:
+            if name.startswith(prefix):
+                path = os.path.normpath(os.path.join(directory, name[len(prefix) :]))
+                if path.startswith(os.path.normpath(directory) + os.sep):
+                    return path
+                return None
+        return None
+
+    def _scan(self):
+        for prefix, directory in self.roots:
+            for root, dirs, files in os.walk(directory):
+                # skip hidden directories
+                dirs[:] = [e for e in dirs if not e.startswith(".")]
+                for filename in files:
+                    path = os.path.join(root, filename)
+                    relpath = os.path.relpath(path, directory).replace(os.sep, "/")
+                    if filename.startswith(".") or relpath in IGNORED_FILES:
+                        continue
+                    name = prefix + relpath
+                    if self._fs_path(name) == path:  # not shadowed by a more specific root
+                        yield name, path
+
+    @staticmethod
+    def _entry(path, previous=None, md5=None):
+        stat = os.stat(path)
+        if not md5:
+            if previous and (previous.size, previous.mtime) == (stat.st_size, stat.st_mtime_ns):
+                md5 = previous.md5
+            else:
+                md5 = file_md5(path)
+        return StaticFile(path, stat.st_size, stat.st_mtime_ns, md5)
+
+    def _set(self, name, entry):
+        with self._lock:
+            old = self.files.get(name)
+            if old:
+                self.fingerprints.pop(self._fingerprinted(name, old.md5), None)
+            self.files[name] = entry
+            self.fingerprints[self._fingerprinted(name, entry.md5)] = name
+
+    def build(self, workers=None, previous_path=None):
+        """ Scans all the roots and computes the hashes in parallel
+
+        :param workers: number of worker threads (default is based on cpu count)
+        :type workers: int
+        :param previous_path: stored manifest, files which didn't change are not hashed again
+        :type previous_path: str
+        """
+        previous = self.load(previous_path) if previous_path else {}
+
+        def process(item):
+            name, path = item
+            try:
+                return name, self._entry(path, previous.get(name))
+            except OSError:
+                return name, None
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="foris-static") as ex:
+            results = [(name, entry) for name, entry in ex.map(process, self._scan()) if entry]
+
+        with self._lock:
+            self.files = {}
+            self.fingerprints = {}
+        for name, entry in results:
+            self._set(name, entry)
+
+        logger.debug("Static manifest built (%d files).", len(self.files))
+        if previous_path:
+            self.store(previous_path)
+
+    @staticmethod
+    def load(path):
+        try:
+            with open(path) as f:
+                return {k: StaticFile(*v) for k, v in json.load(f).items()}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def store(self, path):
+        with self._lock:
+            content = json.dumps({k: list(v) for k, v in self.files.items()})
+        try:
+            tmp_path = "%s.tmp-%d" % (path, os.getpid())
+            with open(tmp_path, "w") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Failed to store static manifest to '%s': %s", path, e)
+
+    def update(self, name, md5=None):
+        """ Updates a single file (e.g. when it is regenerated)
+
+        :param md5: md5 of the file (computed when not set)
+        :returns: updated entry or None if the file doesn't exist
+        """
+        path = self._fs_path(name)
+        if not path:
+            return None
+        try:
+            entry = self._entry(path, md5=md5)
+        except OSError:
+            return None
+        self._set(name, entry)
+        return entry
+
+    def get(self, name):
+        """ Returns StaticFile of the url path or None if it doesn't exist
+        """
+        entry = self.files.get(name)
+        if entry is None:
+            # not known when the manifest was built
+            return self.update(name)
+
+        if self.check_changes:
+            try:
+                stat = os.stat(entry.path)
+            except OSError:
+                return None
+            if (stat.st_size, stat.st_mtime_ns) != (entry.size, entry.mtime):
+                return self.update(name)
+
+        return entry
+
+    @staticmethod
+    def _fingerprinted(name, md5):
+        base, ext = os.path.splitext(name)
+        return "%s.%s%s" % (base, md5[:FINGERPRINT_LENGTH], ext)
+
+    def fingerprinted(self, name):
+        """ Returns url path which contains md5 of the file (e.g. css/foris.0123456789ab.css)
+        """
+        entry = self.get(name)
+        return self._fingerprinted(name, entry.md5) if entry else name
+
+    def resolve(self, name):
+        """ Translates fingerprinted url path to the original one
+
+        :returns: original url path or None if the path is not fingerprinted
+        """
+        if name in self.fingerprints:
+            return self.fingerprints[name]
+        match = FINGERPRINT_RE.match(name)
+        if match:
+            # file was changed (or is not in the manifest) -> ignore the fingerprint
+            return match.group(1) + match.group(3)
+        return None
+
+
+manifest = StaticManifest()
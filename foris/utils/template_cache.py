@@ -0,0 +1,129 @@
+# Foris - web administration interface for OpenWrt based on NETCONF
+# Copyright (C) 2020 CZ.NIC, z.s.p.o. <http://www.nic.cz>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import bottle
+import hashlib
+import jinja2
+import logging
+import os
+
+from foris import BASE_DIR
+
+logger = logging.getLogger("foris.utils.template_cache")
+
+# precompiled templates which are shipped with foris
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, "template_cache")
+
+TEMPLATE_SUFFIX = ".j2"
+
+
+class LayeredBytecodeCache(jinja2.BytecodeCache):
+    """ Jinja2 bytecode cache which reads precompiled templates from a persistent directory
+
+    Newly compiled templates are stored to the persistent directory when it is writable
+    otherwise they are stored to the fallback directory (e.g. in tmpfs).
+
+    Cache keys don't depend on the path of the template file so the templates
+    can be precompiled before foris is installed. Outdated entries are
+    detected via the checksum of the template source.
+    """
+
+    def __init__(self, persistent_dir, fallback_dir):
+        self.persistent = jinja2.FileSystemBytecodeCache(persistent_dir)
+        self.fallback = jinja2.FileSystemBytecodeCache(fallback_dir)
+        self.persistent_writable = os.access(persistent_dir, os.W_OK)
+
+    def get_cache_key(self, name, filename=None):
+        return hashlib.sha1(name.encode("utf-8")).hexdigest()
+
+    def load_bytecode(self, bucket):
+        self.persistent.load_bytecode(bucket)
+        if bucket.code is None:
+            self.fallback.load_bytecode(bucket)
+
+    def dump_bytecode(self, bucket):
+        if self.persistent_writable:
+            target = self.persistent
+        else:
+            target = self.fallback
+        try:
+            target.dump_bytecode(bucket)
+        except OSError as e:
+            logger.warning("Failed to store compiled template '%s': %s", bucket.key, e)
+
+
+def list_templates(template_dirs):
+    """ Lists names of all jinja2 templates within the template directories
+
+    :param template_dirs: template directories (relative paths are skipped)
+    :type template_dirs: list
+    :returns: template names (same as they are passed to bottle.template())
+    :rtype: list
+    """
+    names = []
+    for template_dir in template_dirs:
+        # default bottle paths are relative to cwd and should not be traversed
+        if not os.path.isabs(template_dir) or not os.path.isdir(template_dir):
+            continue
+        for root, _, files in os.walk(template_dir):
+            for filename in files:
+                if filename.endswith(TEMPLATE_SUFFIX):
+                    path = os.path.join(root, filename)
+                    name = os.path.relpath(path, template_dir).replace(os.sep, "/")
+                    if name not in names:
+                        names.append(name)
+    return sorted(names)
+
+
+def precompile_templates(template_dirs, cache_dir, extensions=()):
+    """ Compiles all templates and stores the bytecode to a cache directory
+
+    Bytecode doesn't depend on the language (the translations are
+    resolved when the template is rendered) so the templates are compiled only once.
+
+    :param template_dirs: template directories
+    :type template_dirs: list
+    :param cache_dir: where the compiled templates should be stored
+    :type cache_dir: str
+    :param extensions: jinja2 extensions (should match the extensions used in runtime)
+    :type extensions: list
+    :returns: number of compiled templates
+    :rtype: int
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    bytecode_cache = LayeredBytecodeCache(cache_dir, cache_dir)
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader([e for e in template_dirs if os.path.isabs(e)]),
+        extensions=extensions,
+        bytecode_cache=bytecode_cache,
+    )
+    names = list_templates(template_dirs)
+    for name in names:
+        logger.debug("Compiling template '%s'.", name)
+        env.get_template(name)
+    return len(names)
+
+
+def prewarm_templates():
+    """ Loads all templates to bottle template cache
+
+    So the first render of a template doesn't require to load and compile it.
+    """
+    for name in list_templates(bottle.TEMPLATE_PATH):
+        bottle.TEMPLATES[(id(bottle.TEMPLATE_PATH), name)] = bottle.Jinja2Template(
+            name=name, lookup=bottle.TEMPLATE_PATH
+        )
+    logger.debug("%d templates prewarmed.", len(bottle.TEMPLATES))
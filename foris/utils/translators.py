@@ -15,30 +15,164 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import collections
-import gettext
+import collections.abc
+import logging
 import os
+import sys
+import threading
+from gettext import GNUTranslations, NullTranslations, find as find_catalog
 
 from jinja2.ext import InternationalizationExtension
 
 from foris import BASE_DIR
-from foris.langs import translations
+from foris.langs import DEFAULT_LANGUAGE, translations
 from foris.state import current_state
+from foris.utils.startup import report as startup_report
+
+logger = logging.getLogger("foris.utils.translators")
 
 # read locale directory
 locale_directory = os.path.join(BASE_DIR, "locale")
 
 
-class _LangDict(collections.OrderedDict):
-    def __missing__(self, key):
-        # return english translation if missing key
-        return super(_LangDict, self).__getitem__("en")
+def _catalog_size(catalog):
+    """ Estimates memory used by a catalog and its fallbacks (in bytes)
+    """
+    size = 0
+    while catalog is not None:
+        messages = getattr(catalog, "_catalog", {})
+        size += sys.getsizeof(messages)
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in messages.items())
+        catalog = catalog._fallback
+    return size
+
 
+class CatalogRegistry(collections.abc.Mapping):
+    """ Gettext catalogs of the languages
 
-translations = _LangDict(
-    (e, gettext.translation("messages", locale_directory, languages=[e], fallback=True))
-    for e in translations
-)
+    A catalog is loaded when it is used for the first time (a router uses one
+    or two languages, so most of the catalogs are never loaded). Catalogs of the
+    plugins which contain the language are chained to the foris catalog as its
+    fallbacks.
+
+    When the loaded catalogs exceed the memory limit, the least recently used
+    catalogs are dropped (and loaded again when they are needed).
+    """
+
+    def __init__(self, languages, max_memory=0):
+        """
+        :param languages: available languages
+        :type languages: list
+        :param max_memory: memory limit of the loaded catalogs in bytes (0 = unlimited)
+        :type max_memory: int
+        """
+        self.languages = list(languages)
+        self.max_memory = max_memory
+        self._loaded = collections.OrderedDict()  # lang -> (catalog, size), least recent first
+        self._fallback_dirs = []  # locale directories of plugins
+        self._lock = threading.Lock()
+        self.generation = 0  # changed when content of the catalogs changes
+
+    def __iter__(self):
+        return iter(self.languages)
+
+    def __len__(self):
+        return len(self.languages)
+
+    def __contains__(self, key):
+        return key in self.languages
+
+    def __getitem__(self, key):
+        if key not in self.languages:
+            # return english translation if missing key
+            key = DEFAULT_LANGUAGE
+        with self._lock:
+            record = self._loaded.get(key)
+            if record is not None:
+                self._loaded.move_to_end(key)
+                return record[0]
+
+            with startup_report.lazy_load("'%s' catalog" % key):
+                catalog = self._load_chain(key)
+            size = _catalog_size(catalog)
+            self._loaded[key] = catalog, size
+            logger.debug("Catalog '%s' loaded (%.1f KiB).", key, size / 1024)
+            self._evict()
+            return catalog
+
+    @staticmethod
+    def _load(lang, directory):
+        # gettext.translation() is not used - it keeps all the catalogs in its own cache
+        path = find_catalog("messages", directory, languages=[lang])
+        if not path:
+            return None
+        with open(path, "rb") as f:
+            return GNUTranslations(f)
+
+    def _load_chain(self, lang):
+        catalog = self._load(lang, locale_directory) or NullTranslations()
+        for directory in self._fallback_dirs:
+            fallback = self._load(lang, directory)
+            if fallback:
+                catalog.add_fallback(fallback)
+        return catalog
+
+    def _evict(self):
+        if self.max_memory <= 0:
+            return
+        total = sum(size for _, size in self._loaded.values())
+        # the most recently used catalog is kept even if it exceeds the limit itself
+        while total > self.max_memory and len(self._loaded) > 1:
+            lang, (_, size) = self._loaded.popitem(last=False)
+            total -= size
+            logger.debug("Catalog '%s' dropped (%.1f KiB).", lang, size / 1024)
+
+    def add_fallback_dir(self, directory):
+        """ Adds a locale directory which is used when a message is not found in foris catalog
+
+        :param directory: path to the locale directory (e.g. of a plugin)
+        :type directory: str
+        """
+        with self._lock:
+            self._fallback_dirs.append(directory)
+            # loaded catalogs will be loaded again with the new fallback
+            self._loaded.clear()
+            self.generation += 1
+
+    def set_memory_limit(self, max_memory):
+        """ Sets memory limit of the loaded catalogs
+
+        :param max_memory: limit in bytes (0 = unlimited)
+        :type max_memory: int
+        """
+        with self._lock:
+            self.max_memory = max_memory
+            self._evict()
+
+    def memory_usage(self):
+        """ Returns estimated memory usage of the loaded catalogs
+
+        :returns: language -> size in bytes (least recently used first)
+        :rtype: collections.OrderedDict
+        """
+        with self._lock:
+            return collections.OrderedDict((k, v[1]) for k, v in self._loaded.items())
+
+    def memory_report(self):
+        """ Formats memory usage of the loaded catalogs (e.g. for logging)
+
+        :rtype: str
+        """
+        usage = self.memory_usage()
+        lines = ["  %-8s %8.1f KiB" % (lang, size / 1024) for lang, size in usage.items()]
+        total = "  %-8s %8.1f KiB" % ("total", sum(usage.values()) / 1024)
+        if self.max_memory > 0:
+            total += " (limit %.1f KiB)" % (self.max_memory / 1024)
+        lines.append(total)
+        return "\n".join(lines)
+
+
+translations = CatalogRegistry(translations)
 
 
 class SimpleDelayedTranslator(object):
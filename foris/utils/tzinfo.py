@@ -1,40 +1,321 @@
+""" Timezone database
+
+The database is generated by tools/tztool.py to a compact binary file which is
+memory-mapped when it is used for the first time. All the lookups are performed
+via the hash tables stored in the file, so nothing is parsed or scanned.
+
+Layout of the file (little endian):
+    header      magic and (offset, count) of the following sections
+    strings     utf-8 strings referenced by (offset, length)
+    zones       (tz, country index, city, zoneinfo) - sorted by region, country and tz,
+                so the zones of a country within a region are adjacent
+    countries   (code, name)
+    groups      (country index, first zone, zone count) - countries of a region
+    regions     (name, first group, group count)
+    hash tables (key, index) slots with linear probing - tz -> zone,
+                country code -> country, region -> region, "region/country" -> group
+"""
+
+import collections.abc
+import functools
+import mmap
 import os
-import pickle
+import struct
+import zlib
+
+from foris.utils.startup import report as startup_report
+
+DATABASE_PATH = os.path.join(os.path.dirname(__file__), "tzdb.bin")
+
+MAGIC = b"FTZ\x01"
+SECTIONS = (
+    "strings",
+    "zones",
+    "countries",
+    "groups",
+    "regions",
+    "zone_index",
+    "country_index",
+    "region_index",
+    "group_index",
+)
+HEADER = struct.Struct("<4s" + "II" * len(SECTIONS))
+STRING = "IH"  # offset, length
+ZONE = struct.Struct("<" + STRING + "H" + STRING + STRING)
+COUNTRY = struct.Struct("<" + STRING + STRING)
+GROUP = struct.Struct("<HHH")
+REGION = struct.Struct("<" + STRING + "HH")
+SLOT = struct.Struct("<" + STRING + "H")
+EMPTY_SLOT = 0xFFFF
+
+
+def _slot_number(key, slots):
+    return zlib.crc32(key) & (slots - 1)
+
+
+def build_database(tz_data, countries):
+    """ Builds content of the timezone database
+
+    :param tz_data: (luci_tz, country, city, zoneinfo) records
+    :type tz_data: iterable
+    :param countries: country code -> country name
+    :type countries: dict
+    :rtype: bytes
+    """
+    strings = bytearray()
+    string_refs = {}
+
+    def ref(text):
+        if text not in string_refs:
+            data = text.encode("utf-8")
+            string_refs[text] = (len(strings), len(data))
+            strings.extend(data)
+        return string_refs[text]
+
+    zones = sorted(tz_data, key=lambda e: (e[0].split("/")[0], e[1], e[0]))
+    country_codes = sorted(set(countries) | {e[1] for e in zones})
+    country_indexes = {code: i for i, code in enumerate(country_codes)}
+
+    groups = []  # (region, country) -> first zone, count
+    for i, (luci_tz, country, _, _) in enumerate(zones):
+        key = (luci_tz.split("/")[0], country)
+        if groups and groups[-1][0] == key:
+            groups[-1][2] += 1
+        else:
+            groups.append([key, i, 1])
+
+    regions = []  # region -> first group, count
+    for i, ((region, _), _, _) in enumerate(groups):
+        if regions and regions[-1][0] == region:
+            regions[-1][2] += 1
+        else:
+            regions.append([region, i, 1])
+
+    sections = {
+        "zones": b"".join(
+            ZONE.pack(*ref(tz), country_indexes[country], *ref(city), *ref(zoneinfo))
+            for tz, country, city, zoneinfo in zones
+        ),
+        "countries": b"".join(
+            COUNTRY.pack(*ref(code), *ref(countries.get(code, code))) for code in country_codes
+        ),
+        "groups": b"".join(
+            GROUP.pack(country_indexes[country], first, count)
+            for (_, country), first, count in groups
+        ),
+        "regions": b"".join(
+            REGION.pack(*ref(name), first, count) for name, first, count in regions
+        ),
+    }
+    counts = {"zones": len(zones), "countries": len(country_codes)}
+    counts.update({"groups": len(groups), "regions": len(regions)})
+
+    indexes = {
+        "zone_index": [e[0] for e in zones],
+        "country_index": country_codes,
+        "region_index": [e[0] for e in regions],
+        "group_index": ["%s/%s" % e[0] for e in groups],
+    }
+    for name, keys in indexes.items():
+        slots_count = 1
+        while slots_count < 2 * len(keys):
+            slots_count *= 2
+        slots = [SLOT.pack(0, 0, EMPTY_SLOT)] * slots_count
+        for index, key in enumerate(keys):
+            slot = _slot_number(key.encode("utf-8"), slots_count)
+            while SLOT.unpack(slots[slot])[2] != EMPTY_SLOT:
+                slot = (slot + 1) % slots_count
+            slots[slot] = SLOT.pack(*ref(key), index)
+        sections[name] = b"".join(slots)
+        counts[name] = slots_count
+
+    sections["strings"] = bytes(strings)
+    counts["strings"] = len(strings)
+
+    header = []
+    offset = HEADER.size
+    for name in SECTIONS:
+        header += [offset, counts[name]]
+        offset += len(sections[name])
+    return HEADER.pack(MAGIC, *header) + b"".join(sections[name] for name in SECTIONS)
+
+
+class TimezoneDatabase(object):
+    """ Read-only view of the timezone database
+    """
+
+    def __init__(self, data):
+        """
+        :param data: content of the database (bytes or mmap)
+        """
+        self.data = data
+        header = HEADER.unpack_from(data, 0)
+        if header[0] != MAGIC:
+            raise ValueError("Not a timezone database.")
+        self.sections = {
+            name: (header[1 + 2 * i], header[2 + 2 * i]) for i, name in enumerate(SECTIONS)
+        }
+        self._strings = {}  # decoded strings (only the used ones)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def _string(self, offset, length):
+        try:
+            return self._strings[offset, length]
+        except KeyError:
+            start = self.sections["strings"][0] + offset
+            text = self._strings[offset, length] = self.data[start : start + length].decode("utf-8")
+            return text
+
+    def _record(self, section, record, index):
+        return record.unpack_from(self.data, self.sections[section][0] + index * record.size)
+
+    def _find(self, section, key):
+        """ Returns index of the key in the hash table or None
+        """
+        if not isinstance(key, str):
+            return None
+        offset, slots_count = self.sections[section]
+        key = key.encode("utf-8")
+        strings = self.sections["strings"][0]
+        slot = _slot_number(key, slots_count)
+        while True:
+            key_offset, key_length, index = SLOT.unpack_from(self.data, offset + slot * SLOT.size)
+            if index == EMPTY_SLOT:
+                return None
+            if self.data[strings + key_offset : strings + key_offset + key_length] == key:
+                return index
+            slot = (slot + 1) % slots_count
+
+    def _country_code(self, index):
+        return self._string(*self._record("countries", COUNTRY, index)[:2])
+
+    def zone(self, index):
+        """ Returns (luci_tz, country, city, zoneinfo) record
+        """
+        tz_offset, tz_length, country, city_offset, city_length, *zoneinfo = self._record(
+            "zones", ZONE, index
+        )
+        return (
+            self._string(tz_offset, tz_length),
+            self._country_code(country),
+            self._string(city_offset, city_length),
+            self._string(*zoneinfo),
+        )
+
+    def zones(self):
+        return [self.zone(i) for i in range(self.sections["zones"][1])]
+
+    def regions(self):
+        return {
+            self._string(*self._record("regions", REGION, i)[:2])
+            for i in range(self.sections["regions"][1])
+        }
+
+    def country_name(self, code):
+        index = self._find("country_index", code)
+        if index is None:
+            raise KeyError(code)
+        return self._string(*self._record("countries", COUNTRY, index)[2:])
+
+    def country_codes(self):
+        return [self._country_code(i) for i in range(self.sections["countries"][1])]
+
+    def countries_in_region(self, region):
+        index = self._find("region_index", region)
+        if index is None:
+            return set()
+        _, _, first, count = self._record("regions", REGION, index)
+        return {
+            self._country_code(self._record("groups", GROUP, i)[0])
+            for i in range(first, first + count)
+        }
+
+    def zones_in_region(self, region):
+        index = self._find("region_index", region)
+        if index is None:
+            return []
+        _, _, first, count = self._record("regions", REGION, index)
+        first_zone = self._record("groups", GROUP, first)[1]
+        last_group = self._record("groups", GROUP, first + count - 1)
+        return [self.zone(i) for i in range(first_zone, last_group[1] + last_group[2])]
+
+    def zones_in_region_and_country(self, region, country):
+        index = self._find("group_index", "%s/%s" % (region, country))
+        if index is None:
+            return []
+        _, first, count = self._record("groups", GROUP, index)
+        return [self.zone(i) for i in range(first, first + count)]
+
+    def find_zone(self, tz):
+        index = self._find("zone_index", tz)
+        return None if index is None else self.zone(index)
+
+
+class _Countries(collections.abc.Mapping):
+    """ Directory of countries country_code: country_name
+    """
+
+    def __getitem__(self, code):
+        return _database().country_name(code)
+
+    def __iter__(self):
+        return iter(_database().country_codes())
+
+    def __len__(self):
+        return _database().sections["countries"][1]
+
+
+@functools.lru_cache(maxsize=None)
+def _database():
+    with startup_report.lazy_load("timezone database"):
+        return TimezoneDatabase.open(DATABASE_PATH)
+
 
+@functools.lru_cache(maxsize=None)
+def _regions():
+    # set of existing regions
+    return frozenset(_database().regions())
 
-# Load directory of countries country_code: country_name
-countries = pickle.load(open(os.path.join(os.path.dirname(__file__), "countries.pickle2"), "rb"))
 
-# Load TZ data tuple of tuples: (luci_tz, country, city, zoneinfo)
-tz_data = pickle.load(open(os.path.join(os.path.dirname(__file__), "tzdata.pickle2"), "rb"))
+countries = _Countries()
 
 
-# Set of existing regions
-regions = set(x[0].split("/")[0] for x in tz_data)
+def __getattr__(name):
+    # data are loaded when they are used for the first time
+    if name == "regions":
+        return _regions()
+    elif name == "tz_data":
+        # (luci_tz, country, city, zoneinfo) records
+        return _database().zones()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 def timezones_in_region(region):
     """List timezones in a region. Returns filtered tz_data items."""
-    return [e for e in tz_data if e[0].startswith(region)]
+    return _database().zones_in_region(region)
 
 
 def timezones_in_region_and_country(region, country):
     """List timezones in a region and country. Returns filtered tz_data items."""
-    return [e for e in tz_data if e[0].startswith(region) and e[1] == country]
+    return _database().zones_in_region_and_country(region, country)
 
 
 def countries_in_region(region):
     """List countries in a region. Returns set of country codes."""
-    return {e[1] for e in tz_data if e[0].startswith(region)}
+    return _database().countries_in_region(region)
 
 
 def get_country_for_tz(tz):
     """Get country code for a timezone identifier."""
-    filtered = [e for e in tz_data if e[0] == tz]
-    return filtered[0][1] if filtered else None
+    record = _database().find_zone(tz)
+    return record[1] if record else None
 
 
 def get_zoneinfo_for_tz(tz):
     """Get zoneinfo record for a timezone identifier."""
-    filtered = [e for e in tz_data if e[0] == tz]
-    return filtered[0][3] if filtered else None
+    record = _database().find_zone(tz)
+    return record[3] if record else None
@@ -65,6 +65,26 @@ class BuildCmd(build_py):
         # run original build cmd
         build_py.run(self)
 
+        # precompile templates
+        try:
+            from foris.utils.template_cache import precompile_templates
+
+            precompile_templates(
+                [os.path.join(BASE_DIR, "foris", "templates")],
+                os.path.join(self.build_lib, "foris", "template_cache"),
+                ["foris.utils.translators.i18n"],
+            )
+        except ImportError as e:
+            print("Templates were not precompiled (%s)" % e)
+
+        # precompressed variants of static files (served when the client accepts them)
+        try:
+            from foris.utils.static_files import precompress
+
+            precompress(os.path.join(self.build_lib, "foris", "static"))
+        except ImportError as e:
+            print("Static files were not precompressed (%s)" % e)
+
 
 setup(
     name="Foris",
@@ -82,6 +102,7 @@ setup(
         "flup",
         "ubus @ git+https://gitlab.nic.cz/turris/python-ubus.git",
         "paho-mqtt",
+        'importlib_metadata; python_version < "3.8"',
     ],
     setup_requires=["babel", "jinja2"],
     provides=["foris"],
@@ -96,6 +117,7 @@ setup(
         "foris.plugins",
         "foris.utils",
         "foris.ubus",
+        "foris.sessions",
         "foris.middleware",
         "foris_plugins",
     ],
@@ -106,11 +128,16 @@ setup(
             "templates/**",
             "templates/**/*",
             "static/css/*.css",
+            "static/css/*.css.gz",
+            "static/css/*.css.br",
             "static/fonts/*",
             "static/img/*",
             "static/js/*.js",
+            "static/js/*.js.gz",
+            "static/js/*.js.br",
             "static/js/contrib/*",
-            "utils/*.pickle2",
+            "utils/tzdb.bin",
+            "template_cache/*",
         ]
     },
     namespace_packages=["foris_plugins"],
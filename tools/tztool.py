@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 
 import argparse
-import pickle
+import os
+import sys
 
 import l18n
 import l18n.translation
@@ -482,19 +483,22 @@ def maketzdata():
     return tzdata
 
 
-def gentzdata():
-    tzdata = maketzdata()
-    pickle.dump(tzdata, file("foris/utils/tzdata.pickle2", "wb"), protocol=2)
-
-
-def gencountries():
-    tzdata = maketzdata()
-
+def makecountries(tzdata):
     countries = {}
     l18n.set_language("en")
     for luci_tz, country, city, zoneinfo in tzdata:
         countries[country] = l18n.territories[country]
-    pickle.dump(countries, file("foris/utils/countries.pickle2", "wb"), protocol=2)
+    return countries
+
+
+def gentzdb():
+    # foris package is imported from the root of the repository
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from foris.utils.tzinfo import DATABASE_PATH, build_database
+
+    tzdata = maketzdata()
+    with open(DATABASE_PATH, "wb") as f:
+        f.write(build_database(tzdata, makecountries(tzdata)))
 
 
 if __name__ == "__main__":
@@ -503,14 +507,9 @@ if __name__ == "__main__":
     )
     subparsers = parser.add_subparsers(dest="action")
 
-    gentzdata_parser = subparsers.add_parser(
-        "gentzdata",
-        help="generate pickled tz_data list"
-    )
-
-    gencountries_parser = subparsers.add_parser(
-        "gencountries",
-        help="generate pickled countries dictionary"
+    gentzdb_parser = subparsers.add_parser(
+        "gentzdb",
+        help="generate indexed timezone database (timezones and countries)"
     )
 
     makelocale_parser = subparsers.add_parser(
@@ -524,9 +523,7 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
 
-    if args.action == "gentzdata":
-        gentzdata()
-    elif args.action == "gencountries":
-        gencountries()
+    if args.action == "gentzdb":
+        gentzdb()
     elif args.action == "makelocale":
         makelocale(args.lang, plural_forms=args.plural_forms)